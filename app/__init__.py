@@ -1,15 +1,64 @@
 from flask import Flask
-import logging
+from sqlalchemy import event
+from config import Config
 from .config import config_manager
+from .extensions import db, login_manager, socketio, executor, cache
+from .services.history_writer import history_writer
+from .services.transcoder import transcoder
+from .services.scheduler import scheduler
+from .services.usage import usage_tracker
+from .services.task_leases import task_leases
+from .services.eta import estimator
+from .services.webhooks import webhooks
+from .services.cache import layered_cache
+from .services.warmup import warmup_job
 from .routes import main
-from .logging_config import JSONFormatter
+from .auth import bp as auth_bp
+from .logging_config import setup_logging
+from . import tracing
 
-def create_app():
-    # Configure logging
-    handler = logging.StreamHandler()
-    handler.setFormatter(JSONFormatter())
-    logging.basicConfig(level=logging.INFO, handlers=[handler])
+def _configure_sqlite(busy_timeout_ms):
+    def on_connect(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets the poll tasks write while requests keep reading
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.close()
+    return on_connect
 
+def create_app(config_class=Config):
     app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    # Configure logging
+    setup_logging(
+        level=app.config['LOG_LEVEL'],
+        queue_size=app.config['LOG_QUEUE_SIZE'],
+        poll_debug_sample_every=app.config['LOG_POLL_DEBUG_SAMPLE_EVERY']
+    )
+
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _configure_sqlite(app.config['SQLITE_BUSY_TIMEOUT_MS']))
+    login_manager.init_app(app)
+    socketio.init_app(app)
+    executor.init_app(app)
+    cache.init_app(app)
+    layered_cache.init_app(app)
+    history_writer.init_app(app)
+    transcoder.init_app(app)
+    scheduler.init_app(app)
+    usage_tracker.init_app(app)
+    task_leases.init_app(app)
+    estimator.init_app(app)
+    webhooks.init_app(app)
+
+    tracing.init_app(app)
+
     app.register_blueprint(main)
+    app.register_blueprint(auth_bp)
+
+    # Last, so a startup warmup runs against a fully configured app
+    warmup_job.init_app(app)
     return app
@@ -0,0 +1,128 @@
+"""
+Text extractors for uploaded documents, looked up by file extension or
+mimetype. An extractor is a generator function
+
+    extract(stream, progress=None) -> Iterator[str]
+
+that yields the document's text as blocks (paragraphs, pages or chapters)
+in reading order, so callers can process a document piece by piece.
+progress(done, total), if given, is called as sections (chapters, pages)
+are parsed.
+
+Extractors are registered by import path and only imported on first use:
+parsers for formats nobody uploads, and their optional dependencies,
+cost nothing at startup.
+"""
+import codecs
+import importlib
+import importlib.util
+import os
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Progress = Optional[Callable[[int, int], None]]
+
+@dataclass
+class Extractor:
+    name: str
+    target: str  # "module:function"
+    extensions: Tuple[str, ...] = ()
+    mimetypes: Tuple[str, ...] = ()
+    requires: Optional[str] = None  # importable module the extractor needs, e.g. "pypdf"
+    _function: Optional[Callable[..., Iterator[str]]] = field(default=None, repr=False)
+
+    def available(self) -> bool:
+        return self.requires is None or importlib.util.find_spec(self.requires) is not None
+
+    def load(self) -> Callable[..., Iterator[str]]:
+        if self._function is None:
+            module, _, function = self.target.partition(':')
+            self._function = getattr(importlib.import_module(module), function)
+        return self._function
+
+    def extract(self, stream: BinaryIO, progress: Progress = None) -> Iterator[str]:
+        return self.load()(stream, progress)
+
+class ExtractorRegistry:
+    def __init__(self) -> None:
+        self._extractors: Dict[str, Extractor] = {}
+        self._by_extension: Dict[str, Extractor] = {}
+        self._by_mimetype: Dict[str, Extractor] = {}
+
+    def register(self, name: str, target: str, extensions: Iterable[str] = (), mimetypes: Iterable[str] = (),
+                 requires: Optional[str] = None) -> Extractor:
+        extractor = Extractor(name, target, tuple(extensions), tuple(mimetypes), requires)
+        self._extractors[name] = extractor
+        for extension in extractor.extensions:
+            self._by_extension[extension.lower()] = extractor
+        for mimetype in extractor.mimetypes:
+            self._by_mimetype[mimetype.lower()] = extractor
+        return extractor
+
+    def get(self, name: str) -> Optional[Extractor]:
+        return self._extractors.get(name)
+
+    def find(self, filename: Optional[str] = None, mimetype: Optional[str] = None) -> Optional[Extractor]:
+        """Extractor for a file: by extension, then by mimetype (browsers often send a generic one)."""
+        extension = os.path.splitext(filename or '')[1].lstrip('.').lower()
+        extractor = self._by_extension.get(extension)
+        if extractor is None and mimetype:
+            extractor = self._by_mimetype.get(mimetype.split(';', 1)[0].strip().lower())
+        return extractor
+
+    def extensions(self) -> List[str]:
+        return sorted(self._by_extension)
+
+    def names(self) -> List[str]:
+        return list(self._extractors)
+
+registry = ExtractorRegistry()
+registry.register('text', 'app.extractors.text:extract', ('txt',), ('text/plain',))
+registry.register('markdown', 'app.extractors.markdown:extract', ('md', 'markdown'), ('text/markdown',))
+registry.register('html', 'app.extractors.html:extract', ('html', 'htm', 'xhtml'),
+                  ('text/html', 'application/xhtml+xml'))
+registry.register('epub', 'app.extractors.epub:extract', ('epub',), ('application/epub+zip',))
+registry.register('docx', 'app.extractors.docx:extract', ('docx',),
+                  ('application/vnd.openxmlformats-officedocument.wordprocessingml.document',))
+registry.register('pdf', 'app.extractors.pdf:extract', ('pdf',), ('application/pdf',), requires='pypdf')
+
+def get_extractor(filename: Optional[str] = None, mimetype: Optional[str] = None) -> Optional[Extractor]:
+    return registry.find(filename, mimetype)
+
+def decoded_chunks(stream: BinaryIO, chunk_size: int = 64 * 1024, encoding: str = 'utf-8-sig') -> Iterator[str]:
+    """`stream` decoded incrementally; undecodable bytes are replaced."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Lines (without line endings) of a text arriving in chunks."""
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines(keepends=True)
+        # A trailing '\r' may be the first half of a '\r\n' split across chunks
+        pending = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+        for line in lines:
+            yield line.rstrip('\r\n')
+    if pending:
+        yield pending
+
+def paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """Runs of non-blank lines, joined by newlines."""
+    block: List[str] = []
+    for line in lines:
+        if line.strip():
+            block.append(line)
+        elif block:
+            yield '\n'.join(block)
+            block = []
+    if block:
+        yield '\n'.join(block)
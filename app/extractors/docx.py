@@ -0,0 +1,35 @@
+"""
+Paragraph text of a Word document, read straight from word/document.xml
+with the standard library. The XML is parsed incrementally and each
+paragraph is released once yielded, so large documents stream.
+"""
+import zipfile
+from typing import BinaryIO, Iterator, List
+from xml.etree import ElementTree
+from app.extractors import Progress
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+def extract(stream: BinaryIO, progress: Progress = None) -> Iterator[str]:
+    with zipfile.ZipFile(stream) as archive, archive.open('word/document.xml') as document:
+        parts: List[str] = []
+        depth = 0
+        for event, element in ElementTree.iterparse(document, events=('start', 'end')):
+            if element.tag == f'{W}p':
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 0:
+                    text = ''.join(parts).strip()
+                    parts = []
+                    if text:
+                        yield text
+                element.clear()
+            elif event == 'end' and depth:
+                if element.tag == f'{W}t':
+                    parts.append(element.text or '')
+                elif element.tag == f'{W}tab':
+                    parts.append('\t')
+                elif element.tag in (f'{W}br', f'{W}cr'):
+                    parts.append('\n')
@@ -0,0 +1,10 @@
+from typing import BinaryIO, Iterator
+from ebooklib import epub
+from app.extractors import Progress
+from app.utils import document_text, spine_documents
+
+def extract(stream: BinaryIO, progress: Progress = None) -> Iterator[str]:
+    """Text of each spine document, in reading order; progress counts spine documents."""
+    book = epub.read_epub(stream)
+    for _item, soup in spine_documents(book, progress):
+        yield document_text(soup)
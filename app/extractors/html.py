@@ -0,0 +1,21 @@
+from typing import BinaryIO, Iterator
+from bs4 import BeautifulSoup
+from app.extractors import Progress, iter_lines, paragraphs
+
+# Elements whose text is never read aloud
+SKIPPED_TAGS = ('script', 'style', 'noscript', 'template', 'head', 'nav', 'svg')
+# Elements that start a paragraph of their own
+BLOCK_TAGS = ('p', 'div', 'section', 'article', 'main', 'header', 'footer', 'aside', 'blockquote', 'pre',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'dt', 'dd', 'tr', 'table', 'figure', 'figcaption')
+
+def extract(stream: BinaryIO, progress: Progress = None) -> Iterator[str]:
+    """Paragraphs of an HTML page, without scripts, styles and navigation."""
+    soup = BeautifulSoup(stream.read(), 'html.parser')
+    for tag in soup(SKIPPED_TAGS):
+        tag.decompose()
+    for tag in soup(BLOCK_TAGS):
+        tag.insert_before('\n\n')
+        tag.insert_after('\n\n')
+    for tag in soup('br'):
+        tag.replace_with('\n')
+    return paragraphs(line.strip() for line in iter_lines([soup.get_text()]))
@@ -0,0 +1,80 @@
+"""
+Markdown to plain text with the syntax dropped and the words kept:
+headings, emphasis, links (their text), images (their alt text), list and
+quote markers, tables and front matter. Fenced code blocks are skipped,
+since nobody wants them read aloud. Line based, so it streams.
+"""
+import re
+from typing import BinaryIO, Iterator, List
+from app.extractors import Progress, decoded_chunks, iter_lines, paragraphs
+
+_FENCE = re.compile(r'^\s{0,3}(```|~~~)')
+_HEADING = re.compile(r'^\s{0,3}#{1,6}\s+(.*?)\s*#*\s*$')
+_SETEXT_UNDERLINE = re.compile(r'^\s{0,3}(=+|-+)\s*$')
+_RULE = re.compile(r'^\s{0,3}([-*_])(\s*\1){2,}\s*$')
+_QUOTE = re.compile(r'^\s{0,3}(>\s?)+')
+_LIST_ITEM = re.compile(r'^\s*(?:[-*+]|\d{1,9}[.)])\s+(?:\[[ xX]\]\s+)?')
+_TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$')
+_IMAGE = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+_LINK = re.compile(r'\[([^\]]+)\]\([^)]*\)|\[([^\]]+)\]\[[^\]]*\]')
+_LINK_DEFINITION = re.compile(r'^\s{0,3}\[[^\]]+\]:\s+\S+')
+_AUTOLINK = re.compile(r'<(https?://[^>]+)>')
+# Delimiters need whitespace or punctuation on their outer side (CommonMark flanking),
+# so foo_bar_baz and 2*3*4 keep their underscores and asterisks
+_EMPHASIS = re.compile(r'(?<![^\W_])(\*{1,3}|_{1,3}|~~)(?=\S)(.+?)(?<=\S)\1(?![^\W_])')
+_CODE_SPAN = re.compile(r'`+([^`]+)`+')
+
+def _inline(line: str) -> str:
+    line = _IMAGE.sub(r'\1', line)
+    line = _LINK.sub(lambda m: m.group(1) or m.group(2), line)
+    line = _AUTOLINK.sub(r'\1', line)
+    line = _CODE_SPAN.sub(r'\1', line)
+    return _EMPHASIS.sub(r'\2', line)
+
+def _plain_lines(lines: Iterator[str]) -> Iterator[str]:
+    in_fence = None
+    front_matter = False
+    for number, line in enumerate(lines):
+        if number == 0 and line.strip() == '---':
+            front_matter = True
+            continue
+        if front_matter:
+            front_matter = line.strip() not in ('---', '...')
+            continue
+
+        fence = _FENCE.match(line)
+        if in_fence:
+            if fence and fence.group(1) == in_fence:
+                in_fence = None
+            continue
+        if fence:
+            in_fence = fence.group(1)
+            yield ''
+            continue
+
+        if _TABLE_SEPARATOR.match(line):
+            continue
+        if _RULE.match(line) or _LINK_DEFINITION.match(line):
+            yield ''
+            continue
+        if _SETEXT_UNDERLINE.match(line):
+            # Underlines a heading; the heading line itself was already yielded
+            yield ''
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            # Headings are paragraphs of their own
+            yield ''
+            yield _inline(heading.group(1))
+            yield ''
+            continue
+
+        line = _QUOTE.sub('', line)
+        line = _LIST_ITEM.sub('', line)
+        if '|' in line and line.strip().startswith('|'):
+            cells: List[str] = [cell.strip() for cell in line.strip().strip('|').split('|')]
+            line = ', '.join(cell for cell in cells if cell)
+        yield _inline(line).strip()
+
+def extract(stream: BinaryIO, progress: Progress = None) -> Iterator[str]:
+    return paragraphs(_plain_lines(iter_lines(decoded_chunks(stream))))
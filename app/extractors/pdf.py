@@ -0,0 +1,15 @@
+from typing import BinaryIO, Iterator
+from app.extractors import Progress
+
+def extract(stream: BinaryIO, progress: Progress = None) -> Iterator[str]:
+    """Text of each page; needs the optional pypdf package. progress counts pages."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(stream)
+    total = len(reader.pages)
+    for number, page in enumerate(reader.pages, 1):
+        text = page.extract_text() or ''
+        if text.strip():
+            yield text
+        if progress:
+            progress(number, total)
@@ -0,0 +1,6 @@
+from typing import BinaryIO, Iterator
+from app.extractors import Progress, decoded_chunks, iter_lines, paragraphs
+
+def extract(stream: BinaryIO, progress: Progress = None) -> Iterator[str]:
+    """Paragraphs of a UTF-8 text file."""
+    return paragraphs(iter_lines(decoded_chunks(stream)))
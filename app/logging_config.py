@@ -1,11 +1,40 @@
 import logging
+import logging.handlers
+import atexit
 import json
 import datetime
+import queue
+import threading
+from typing import Any, Dict, Optional
+from app.tracing import current_trace_id
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used otherwise
+    orjson = None
 
 class JSONFormatter(logging.Formatter):
+    def __init__(self, use_orjson: bool = True) -> None:
+        super().__init__()
+        self.use_orjson = use_orjson and orjson is not None
+        # Most records in a burst share the same second, so only format it once
+        self._cached_second: Optional[int] = None
+        self._cached_prefix = ''
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._cached_second:
+            self._cached_prefix = datetime.datetime.fromtimestamp(second).strftime('%Y-%m-%dT%H:%M:%S')
+            self._cached_second = second
+        micros = round((created - second) * 1_000_000)
+        if micros >= 1_000_000:
+            return datetime.datetime.fromtimestamp(created).isoformat()
+        # Same output as datetime.isoformat(), which omits zero microseconds
+        return f"{self._cached_prefix}.{micros:06d}" if micros else self._cached_prefix
+
     def format(self, record):
-        log_record = {
-            'timestamp': datetime.datetime.fromtimestamp(record.created).isoformat(),
+        log_record: Dict[str, Any] = {
+            'timestamp': self._timestamp(record.created),
             'level': record.levelname,
             'message': record.getMessage(),
             'logger': record.name,
@@ -13,7 +42,87 @@ class JSONFormatter(logging.Formatter):
             'line': record.lineno
         }
 
+        # Set by QueueLogHandler, since the listener thread has no trace context
+        trace_id = getattr(record, 'trace_id', None) or current_trace_id()
+        if trace_id:
+            log_record['trace_id'] = trace_id
+
+        trace = getattr(record, 'trace', None)
+        if trace:
+            log_record['trace_id'] = trace['trace_id']
+            log_record['spans'] = trace['spans']
+
         if record.exc_info:
             log_record['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_record['exception'] = record.exc_text
+
+        if self.use_orjson:
+            return orjson.dumps(log_record, default=str).decode('utf-8')
+        return json.dumps(log_record, ensure_ascii=False, default=str)
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background QueueListener so request threads never
+    block on the output stream. When the bounded queue is full, records are
+    dropped (and counted) instead of blocking.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike QueueHandler.prepare, don't copy or pre-format the record: the JSON
+        # formatter needs its fields, and copying dominates the cost on the caller.
+        # Only resolve what may change before the listener gets to it.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if not getattr(record, 'trace_id', None):
+            record.trace_id = current_trace_id()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class SamplingFilter(logging.Filter):
+    """Lets through one in every `every` records at or below `level`; higher levels always pass."""
+
+    def __init__(self, every: int, level: int = logging.DEBUG) -> None:
+        super().__init__()
+        self.every = max(1, int(every))
+        self.level = level
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level:
+            return True
+        with self._lock:
+            self._count += 1
+            return (self._count - 1) % self.every == 0
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(level: str = 'INFO', queue_size: int = 10000, poll_debug_sample_every: int = 10) -> None:
+    """Configure root logging once per process; later calls (e.g. from background tasks) are no-ops."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JSONFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logging.basicConfig(level=level, handlers=[QueueLogHandler(log_queue)])
 
-        return json.dumps(log_record, ensure_ascii=False)
+    # Per-task status polls are by far the noisiest debug source
+    logging.getLogger('app.tasks.poll').addFilter(SamplingFilter(poll_debug_sample_every))
@@ -0,0 +1,170 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds; synthesis calls can legitimately take a minute
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry: List['_Metric'] = []
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> float:
+        state = self._values.get(self._key(labels))
+        return state[-2] if state else 0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, state in self._values.items():
+                for i, bound in enumerate(self.buckets):
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f'{self.name}_bucket{labels} {state[i]}')
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f'{self.name}_bucket{labels} {state[-2]}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_count{labels} {state[-2]}')
+                lines.append(f'{self.name}_sum{labels} {state[-1]}')
+        return lines
+
+def render() -> str:
+    """Prometheus text exposition format (0.0.4) for every registered metric."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+PROVIDER_LATENCY = Histogram(
+    'tts_provider_request_seconds', 'Latency of provider API calls.', ('provider', 'method'))
+PROVIDER_REQUESTS = Counter(
+    'tts_provider_requests_total', 'Provider API calls by outcome (ok, HTTP status or exception).',
+    ('provider', 'method', 'status'))
+PROVIDER_BYTES_SENT = Counter(
+    'tts_provider_bytes_sent_total', 'Text bytes sent to providers.', ('provider', 'method'))
+PROVIDER_BYTES_RECEIVED = Counter(
+    'tts_provider_bytes_received_total', 'Audio bytes received from providers.', ('provider', 'method'))
+AUDIO_CACHE_REQUESTS = Counter(
+    'tts_audio_cache_requests_total', 'Sync generation requests served from stored audio (hit) or upstream (miss).',
+    ('result',))
+ASYNC_TASKS_IN_FLIGHT = Gauge(
+    'tts_async_tasks_in_flight', 'Async tasks currently being polled.')
+POLL_LOOP_LAG = Histogram(
+    'tts_poll_loop_lag_seconds', 'How late each async poll ran relative to its schedule.',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30))
+TEXT_NORMALIZATION_CHARS = Counter(
+    'tts_text_normalization_chars_total', 'Characters before (input) and after (output) text normalization.',
+    ('stage',))
+SENTENCE_MEMO_SEGMENTS = Counter(
+    'tts_sentence_memo_segments_total', 'Sentence segments reused from the memo (hit) or synthesized (miss).',
+    ('result',))
+HEDGED_REQUESTS = Counter(
+    'tts_hedged_requests_total', 'Hedged sync calls by outcome (not_hedged, primary_won, hedge_won, budget_exhausted, failed).',
+    ('provider', 'result'))
+SCHEDULER_WAIT_SECONDS = Histogram(
+    'tts_scheduler_wait_seconds', 'Time provider calls waited for a scheduler slot.', ('priority',),
+    buckets=(0, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60))
+SCHEDULER_QUEUED = Gauge(
+    'tts_scheduler_queued', 'Provider calls waiting for a scheduler slot.', ('priority',))
+CACHE_REQUESTS = Counter(
+    'tts_cache_requests_total', 'Layered cache lookups by tier (local, shared) and result (hit, miss).',
+    ('tier', 'result'))
+CACHE_LOCK_WAIT_SECONDS = Histogram(
+    'tts_cache_lock_wait_seconds', 'Time spent waiting for a cache stampede lock.',
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60))
+VOICE_CATALOG_FETCHES = Counter(
+    'tts_voice_catalog_fetches_total', 'Voice listing requests by outcome (fetched, not_modified, error).',
+    ('provider', 'result'))
+INGESTION_JOBS = Counter(
+    'tts_ingestion_jobs_total', 'Background upload ingestion jobs by outcome (success, failed).',
+    ('status',))
+EXTRACTION_SECONDS = Histogram(
+    'tts_extraction_seconds', 'Time spent extracting text from uploaded documents.', ('format',))
+WEBHOOK_DELIVERIES = Counter(
+    'tts_webhook_deliveries_total', 'Webhook delivery attempts by outcome (delivered, retry, failed, refused).',
+    ('result',))
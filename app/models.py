@@ -22,8 +22,27 @@ class History(db.Model):
     voice_name = db.Column(db.String(64))
     text_preview = db.Column(db.String(100))
     file_path = db.Column(db.String(256)) # Path to saved audio file
+    file_size = db.Column(db.Integer) # Size of the local artifact in bytes
+    content_hash = db.Column(db.String(64)) # SHA-256 of the audio, also its artifact id
+    lease_owner = db.Column(db.String(128)) # Node currently polling a processing task
+    lease_expires_at = db.Column(db.DateTime) # Other nodes may take the task over after this
+    provider = db.Column(db.String(32)) # Provider NAME the task was submitted to
+    characters = db.Column(db.Integer) # Length of the synthesized text, if known
+    eta = db.Column(db.DateTime) # Expected completion of a processing task
+    completed_at = db.Column(db.DateTime) # Completion estimates are learned from completed_at - created_at
+    callback_url = db.Column(db.String(512)) # Notified through the webhook outbox when the task finishes
+    audio_format = db.Column(db.String(8)) # Format the provider produces the audio in; mp3 if unset
     created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Serves the per-user history listing, which pages by (created_at, id)
+        db.Index('ix_history_user_id_created_at', 'user_id', 'created_at'),
+        # Serves the scan for processing tasks whose lease has expired
+        db.Index('ix_history_status_lease_expires_at', 'status', 'lease_expires_at'),
+        # Serves the scan for recently completed tasks that completion estimates are fitted on
+        db.Index('ix_history_status_completed_at', 'status', 'completed_at'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -31,5 +50,111 @@ class History(db.Model):
             'status': self.status,
             'voice_name': self.voice_name,
             'text_preview': self.text_preview,
+            'file_size': self.file_size,
+            'content_hash': self.content_hash,
+            'eta': self.eta.isoformat() if self.eta else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'created_at': self.created_at.isoformat()
+        }
+
+class Audiobook(db.Model):
+    """An EPUB synthesized chapter by chapter; assembled into one file once every chapter is done."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    title = db.Column(db.String(256))
+    voice_id = db.Column(db.String(64))
+    voice_name = db.Column(db.String(64))
+    params = db.Column(db.Text) # JSON of the synthesis options shared by all chapters
+    status = db.Column(db.String(20)) # processing, assembling, success, failed
+    file_path = db.Column(db.String(256))
+    file_size = db.Column(db.Integer)
+    content_hash = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    lease_owner = db.Column(db.String(128)) # Node currently running an unfinished audiobook
+    lease_expires_at = db.Column(db.DateTime) # Other nodes may resume the audiobook after this
+
+    chapters = db.relationship('AudiobookChapter', backref='audiobook', lazy='select',
+                               order_by='AudiobookChapter.position', cascade='all, delete-orphan')
+
+    def to_dict(self, chapters=True):
+        data = {
+            'id': self.id,
+            'title': self.title,
+            'voice_name': self.voice_name,
+            'status': self.status,
+            'file_size': self.file_size,
+            'content_hash': self.content_hash,
             'created_at': self.created_at.isoformat()
         }
+        if chapters:
+            data['chapters'] = [chapter.to_dict() for chapter in self.chapters]
+        return data
+
+class AudiobookChapter(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    audiobook_id = db.Column(db.Integer, db.ForeignKey('audiobook.id'), index=True)
+    position = db.Column(db.Integer)
+    title = db.Column(db.String(256))
+    text = db.Column(db.Text) # Kept so failed chapters can be resubmitted
+    task_id = db.Column(db.String(64)) # Provider task of the current attempt
+    status = db.Column(db.String(20)) # pending, processing, success, failed
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.String(256))
+    duration_ms = db.Column(db.Integer)
+    content_hash = db.Column(db.String(64))
+
+    def to_dict(self):
+        return {
+            'position': self.position,
+            'title': self.title,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'duration_ms': self.duration_ms,
+            'content_hash': self.content_hash
+        }
+
+class UsageCounter(db.Model):
+    """Characters and requests sent to a provider by one user in one quota period."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, index=True) # 0 for anonymous requests
+    provider = db.Column(db.String(32))
+    period = db.Column(db.String(10)) # YYYY-MM or YYYY-MM-DD, see QUOTA_PERIOD
+    characters = db.Column(db.BigInteger, default=0)
+    requests = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'period', 'provider', name='uq_usage_user_period_provider'),
+    )
+
+class WebhookDelivery(db.Model):
+    """Outbox entry: one completion callback, retried until it is delivered or runs out of attempts."""
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.String(64), index=True)
+    url = db.Column(db.String(512))
+    event = db.Column(db.String(32)) # task.succeeded, task.failed
+    payload = db.Column(db.Text) # JSON body, signed as sent
+    status = db.Column(db.String(20), default='pending') # pending, delivered, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.String(256))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Serves the delivery worker's scan for due entries
+        db.Index('ix_webhook_delivery_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task_id': self.task_id,
+            'event': self.event,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'delivered_at': self.delivered_at.isoformat() if self.delivered_at else None
+        }
@@ -1,32 +1,64 @@
-from flask import Blueprint, render_template, request, jsonify, send_file, Response
-import io
-import tempfile
+from flask import Blueprint, render_template, request, jsonify, send_file, Response, current_app
 import os
 import binascii
-from typing import Any, Dict, Union, Tuple
+import mimetypes
+import base64
+from datetime import datetime
+from typing import Any, Dict, Union, Tuple, List, Optional
+from flask_login import current_user, login_required, login_user
 from app.config import config_manager
 from app.services.factory import get_provider
 from app.services.minimax import MinimaxProvider
 from app.services.volcengine_tts import VolcengineProvider
-from app.utils import extract_text_from_epub
+from app.services.artifact_store import get_artifact_store
+from app.services.transcoder import transcoder, TranscodeError, AUDIO_FORMATS
+from app.services.text_normalizer import get_text_normalizer
+from app.services.synthesis import request_key, synthesize
+from app.services.warmup import warmup_job
+from app.services.voice_catalog import get_voice_catalog
+from app.services.scheduler import scheduling
+from app.services.usage import usage_tracker
+from app.services.cache import layered_cache
+from app.services.webhooks import webhooks
+from app import metrics
+from app.services.uploads import spool, spool_text
+from app.extractors import get_extractor
+from app.utils import extract_chapters_from_epub
+from app.utils.validators import validate_input
+from app.extensions import db
+from app.models import History, Audiobook, User
 
 main = Blueprint('main', __name__)
 
 @main.route('/')
 def index() -> str:
     provider = get_provider()
-    voices = provider.get_voices()
+    voices = get_voice_catalog().voices(provider)
     return render_template('index.html', voices=voices)
 
+@main.route('/history')
+@login_required
+def history_page() -> str:
+    items, _next_cursor = _history_page(current_user.id, limit=HISTORY_PAGE_SIZE)
+    return render_template('history.html', items=items)
+
 @main.route('/admin')
 def admin_page() -> str:
     return render_template('admin.html')
 
+@main.route('/metrics')
+def metrics_endpoint() -> Response:
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @main.route('/api/admin/login', methods=['POST'])
 def admin_login() -> Tuple[Response, int] | Response:
     data: Dict[str, Any] = request.json or {}
     password = data.get('password')
     if password == config_manager.get('admin_password', 'admin'):
+        # The admin account (scripts/migrate_admin.py) is what the admin APIs check for
+        admin = User.query.filter_by(username='admin').first()
+        if admin is not None:
+            login_user(admin)
         return jsonify({'status': 'success'})
     return jsonify({'status': 'failed', 'message': 'Invalid password'}), 401
 
@@ -38,10 +70,45 @@ def admin_config() -> Response:
     if request.method == 'POST':
         new_config: Dict[str, Any] = request.json or {}
         config_manager.update(new_config)
+        # Provider, credentials or configured voices may have changed
+        get_voice_catalog().invalidate()
         return jsonify({'status': 'success'})
 
     return jsonify({'error': 'Method not allowed'}), 405
 
+def _admin_error() -> Optional[Tuple[Response, int]]:
+    """401/403 response unless the caller is logged in as one of ADMIN_USERNAMES."""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Login required'}), 401
+    if current_user.username not in current_app.config.get('ADMIN_USERNAMES', ()):
+        return jsonify({'error': 'Admin access required'}), 403
+    return None
+
+@main.route('/api/admin/warmup', methods=['GET', 'POST', 'DELETE'])
+def admin_warmup() -> Tuple[Response, int] | Response:
+    # Warmup spends provider credit
+    admin_error = _admin_error()
+    if admin_error:
+        return admin_error
+    if request.method == 'POST':
+        if not warmup_job.start():
+            return jsonify({'error': 'Warmup already running', **warmup_job.progress()}), 409
+        return jsonify(warmup_job.progress()), 202
+
+    if request.method == 'DELETE':
+        warmup_job.cancel()
+    progress = warmup_job.progress()
+    progress['phrases'] = len(warmup_job.phrases())
+    return jsonify(progress)
+
+@main.route('/api/admin/usage', methods=['GET'])
+def admin_usage() -> Tuple[Response, int] | Response:
+    admin_error = _admin_error()
+    if admin_error:
+        return admin_error
+    return jsonify({'period': request.args.get('period') or usage_tracker.current_period(),
+                    'users': usage_tracker.report(request.args.get('period'))})
+
 @main.route('/api/check_connection', methods=['POST'])
 def check_connection() -> Tuple[Response, int] | Response:
     # Helper to check connection for current or tested config
@@ -105,41 +172,90 @@ def upload_file() -> Tuple[Response, int] | Response:
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
+    errors = validate_input(file=file)
+    if errors:
+        return jsonify({'error': ' '.join(errors)}), 400
+
+    config = current_app.config
     filename: str = file.filename.lower() if file.filename else ''
-    file_stream = file.stream
+    normalize = request.form.get('normalize', '1') != '0'
     mimetype = file.mimetype
-
-    if filename.endswith('.epub'):
+    # Hashed, measured and character-counted while it is copied, never read whole
+    upload = spool(file.stream, config['UPLOAD_MAX_SIZE'], config['UPLOAD_SPOOL_THRESHOLD'],
+                   config['UPLOAD_CHUNK_SIZE'])
+    try:
+        errors = validate_input(size=upload.size)
+        if errors:
+            return jsonify({'error': ' '.join(errors)}), 413
+
+        extractor = get_extractor(filename, mimetype)
+        if extractor is not None and extractor.name != 'text':
+            if not extractor.available():
+                return jsonify({'error': f'{extractor.name.upper()} uploads need the {extractor.requires} package'}), 400
+            # Parsing a document can take longer than a proxy waits: answer now and report
+            # progress and the file_id through upload_update events
+            from app.tasks import submit_ingestion
+            job = submit_ingestion(upload, extractor.name, os.path.splitext(filename)[0] + '.txt', normalize,
+                                   _current_user_id(), getattr(current_user, 'username', None))
+            upload = None  # closed by the job
+            return jsonify(job), 202
+
+        # Text files are uploaded as they are, only normalized
+
+        if normalize and upload.is_text:
+            # Document passes look at the whole text (e.g. headers repeated throughout a book)
+            text_content = get_text_normalizer(document=True)(upload.text())
+            upload.close()
+            upload = spool_text(text_content, config['UPLOAD_SPOOL_THRESHOLD'], config['UPLOAD_CHUNK_SIZE'])
+
+        # Async requests only carry the file id, so uploads are counted against the quota.
+        # Unknown encodings are uploaded as-is and counted by size.
+        characters = upload.characters if upload.is_text else upload.size
+        quota_error = _quota_error(characters)
+        if quota_error:
+            return quota_error
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.epub') as temp_file:
-                file.save(temp_file.name)
-                temp_path = temp_file.name
-
-            try:
-                text_content = extract_text_from_epub(temp_path)
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-
-            if not text_content:
-                return jsonify({'error': 'Failed to extract text from EPUB'}), 400
-
-            file_stream = io.BytesIO(text_content.encode('utf-8'))
-            filename = filename.replace('.epub', '.txt')
-            mimetype = 'text/plain'
-
+            # Provider specific upload
+            result = provider.upload_file(filename, upload.file, mimetype, size=upload.size)
+            usage_tracker.record(_current_user_id(), provider.NAME, characters, requests=0)
+            from app.tasks import remember_file_characters
+            remember_file_characters(provider.NAME, (result.get('file') or {}).get('file_id'), characters)
+            current_app.logger.info(f"Uploaded {filename}: {upload.size} bytes, sha256 {upload.digest}")
+            return jsonify(result)
         except Exception as e:
-            return jsonify({'error': f'EPUB processing failed: {str(e)}'}), 500
-
-    try:
-        # Provider specific upload
-        result = provider.upload_file(filename, file_stream, mimetype)
-        return jsonify(result)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            return jsonify({'error': str(e)}), 500
+    finally:
+        if upload is not None:
+            upload.close()
+
+@main.route('/api/uploads/<job_id>', methods=['GET'])
+def upload_status(job_id: str) -> Tuple[Response, int] | Response:
+    """State of a background EPUB ingestion job, for clients that missed its events."""
+    from app.tasks import ingestion_status
+    job = ingestion_status(job_id)
+    if job is None:
+        return jsonify({'error': 'Upload job not found'}), 404
+    return jsonify(job)
+
+def _current_user_id() -> Optional[int]:
+    return current_user.id if current_user.is_authenticated else None
+
+def _quota_error(characters: int) -> Optional[Tuple[Response, int]]:
+    """429 response if sending `characters` upstream would exceed the user's quota."""
+    message = usage_tracker.check(_current_user_id(), getattr(current_user, 'username', None), characters)
+    return (jsonify({'error': message}), 429) if message else None
+
+def _scheduling_user() -> Any:
+    # Anonymous users are told apart by address for fair queuing
+    return current_user.id if current_user.is_authenticated else request.remote_addr
 
 @main.route('/api/generate', methods=['POST'])
 def generate() -> Tuple[Response, int] | Response:
+    # Someone is waiting on this response: its provider calls get the reserved slots
+    with scheduling('interactive', _scheduling_user()):
+        return _generate()
+
+def _generate() -> Tuple[Response, int] | Response:
     data: Dict[str, Any] = request.json or {}
     provider = get_provider()
 
@@ -148,33 +264,96 @@ def generate() -> Tuple[Response, int] | Response:
 
     if not voice_id:
          return jsonify({'error': 'Missing voice_id'}), 400
+    if not get_voice_catalog().is_known(provider, voice_id):
+        return jsonify({'error': f'Unknown voice_id: {voice_id}'}), 400
+
+    fmt = data.get('format') or 'mp3'
+    if fmt not in AUDIO_FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+
+    normalize = data.get('normalize', True) is not False
+    incremental = bool(data.get('incremental', current_app.config.get('SENTENCE_MEMO_DEFAULT', False)))
 
     if mode == 'sync':
         text = data.get('text')
+        if text and normalize:
+            text = get_text_normalizer()(text)
         if not text:
              return jsonify({'error': 'Missing text'}), 400
         try:
             # Remove keys that are passed explicitly to avoid multiple values error
-            cleaned_data = {k: v for k, v in data.items() if k not in ['text', 'voice_id']}
-            audio_data = provider.generate_sync(text, voice_id, **cleaned_data)
-            return send_file(
-                io.BytesIO(audio_data),
-                mimetype='audio/mpeg',
+            cleaned_data = {k: v for k, v in data.items() if k not in ['text', 'voice_id', 'normalize', 'incremental']}
+
+            store = get_artifact_store()
+            key = request_key(provider, text, voice_id, cleaned_data, incremental)
+            artifact = store.resolve(key)
+            if artifact and artifact.digest in request.if_none_match:
+                response = Response(status=304)
+                response.set_etag(artifact.digest)
+                return response
+
+            metrics.AUDIO_CACHE_REQUESTS.inc(result='hit' if artifact else 'miss')
+            billing: Dict[str, str] = {'X-Total-Characters': str(len(text)), 'X-Billed-Characters': '0'}
+            if not artifact:
+                quota_error = _quota_error(len(text))
+                if quota_error:
+                    return quota_error
+                # Identical requests arriving together synthesize once; the others wait and reuse it
+                with layered_cache.lock(f"synthesize:{key}"):
+                    artifact = store.resolve(key)
+                    if not artifact:
+                        artifact, billing = synthesize(provider, store, text, voice_id, cleaned_data, incremental,
+                                                       memo_workers=current_app.config.get('SENTENCE_MEMO_WORKERS', 4))
+                        usage_tracker.record(_current_user_id(), provider.NAME, int(billing['X-Billed-Characters']))
+
+            response = send_file(
+                artifact.path,
+                mimetype=AUDIO_FORMATS[fmt]['mimetype'],
                 as_attachment=True,
-                download_name='generated_audio.mp3'
+                download_name=f'generated_audio.{fmt}',
+                etag=artifact.digest
             )
+            # Players can seek/resume against the GET endpoint, which supports ranges
+            response.headers['Content-Location'] = f"/api/audio/{artifact.digest}"
+            response.headers.update(billing)
+            return response
+        except TranscodeError as e:
+            return jsonify({'error': str(e)}), 503
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     else:
         text = data.get('text')
+        if text and normalize:
+            text = get_text_normalizer()(text)
         text_file_id = data.get('text_file_id')
         if not text and not text_file_id:
             return jsonify({'error': 'Missing text or file_id'}), 400
+        callback_url = data.get('callback_url')
+        callback_error = webhooks.check_url(callback_url) if callback_url is not None else None
+        if callback_error:
+            return jsonify({'error': callback_error}), 400
+        # Uploaded files were counted when they were uploaded
+        quota_error = _quota_error(len(text or ''))
+        if quota_error:
+            return quota_error
 
         try:
             # Remove keys that are passed explicitly
-            cleaned_data = {k: v for k, v in data.items() if k not in ['text', 'text_file_id', 'voice_id']}
-            result = provider.submit_async(text, text_file_id, voice_id, **cleaned_data)
+            cleaned_data = {k: v for k, v in data.items()
+                            if k not in ['text', 'text_file_id', 'voice_id', 'normalize', 'incremental', 'callback_url']}
+            if provider.supports_format(fmt, async_mode=True):
+                # The poller stores the result in this format (History.audio_format)
+                cleaned_data['format'] = fmt
+            else:
+                # Result is stored as mp3; other formats are available from /api/audio/<id>?format=
+                cleaned_data['format'] = 'mp3'
+            # app.tasks imports create_app, so it can't be imported while the app package loads
+            from app.tasks import submit_async_generation
+
+            voices = get_voice_catalog().voices(provider)
+            voice_name = next((v.get('name') for v in voices if v.get('id') == voice_id), voice_id)
+            result = submit_async_generation(provider, text, text_file_id, voice_id, voice_name,
+                                             _current_user_id(), callback_url=callback_url, **cleaned_data)
             return jsonify(result)
         except Exception as e:
             return jsonify({'error': str(e)}), 500
@@ -185,13 +364,29 @@ def query() -> Tuple[Response, int] | Response:
     if not task_id:
         return jsonify({'error': 'Missing task_id'}), 400
 
+    # app.tasks imports create_app, so it can't be imported while the app package loads
+    from app.tasks import query_task
+
     provider = get_provider()
     try:
-        result = provider.query_async(task_id)
+        result = query_task(provider, task_id)
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@main.route('/api/webhooks', methods=['GET'])
+def webhook_deliveries() -> Tuple[Response, int] | Response:
+    """Delivery state of a task's completion callbacks, for integrators debugging their receiver."""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Login required'}), 401
+    task_id = request.args.get('task_id')
+    if not task_id:
+        return jsonify({'error': 'Missing task_id'}), 400
+    deliveries = webhooks.status(task_id, current_user.id)
+    if deliveries is None:
+        return jsonify({'error': 'Task not found'}), 404
+    return jsonify({'task_id': task_id, 'deliveries': deliveries})
+
 @main.route('/api/retrieve', methods=['GET'])
 def retrieve() -> Tuple[Response, int] | Response:
     file_id = request.args.get('file_id')
@@ -204,3 +399,199 @@ def retrieve() -> Tuple[Response, int] | Response:
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@main.route('/api/audio/<artifact_id>', methods=['GET'])
+def get_audio(artifact_id: str) -> Tuple[Response, int] | Response:
+    store = get_artifact_store()
+    artifact = store.get(artifact_id)
+    if not artifact:
+        return jsonify({'error': 'Audio not found'}), 404
+
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt not in AUDIO_FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        try:
+            artifact = transcoder.transcode(store, artifact, fmt,
+                                            bitrate=request.args.get('bitrate', type=int),
+                                            sample_rate=request.args.get('sample_rate', type=int))
+        except TranscodeError as e:
+            return jsonify({'error': str(e)}), 503
+
+    if artifact.ext in AUDIO_FORMATS:
+        mimetype = AUDIO_FORMATS[artifact.ext]['mimetype']
+    else:
+        mimetype = mimetypes.guess_type(artifact.path)[0] or 'application/octet-stream'
+
+    accel_prefix = current_app.config.get('ARTIFACT_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        # nginx serves the bytes (including ranges) from its internal location
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{store.relpath(artifact)}"
+        response.set_etag(artifact.digest)
+        return response
+
+    # Artifacts are content-addressed, so they never change once written
+    return send_file(
+        artifact.path,
+        mimetype=mimetype,
+        download_name=f"{artifact.digest}.{artifact.ext}",
+        conditional=True,
+        etag=artifact.digest,
+        max_age=31536000
+    )
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+# Only what the listing needs, so rows come straight from the query without ORM objects
+HISTORY_LIST_COLUMNS = (
+    History.id, History.task_id, History.status, History.voice_name,
+    History.text_preview, History.file_path, History.content_hash, History.created_at
+)
+
+def _encode_cursor(created_at: datetime, history_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{history_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    created_at, history_id = raw.split('|', 1)
+    return datetime.fromisoformat(created_at), int(history_id)
+
+def _history_page(user_id: int, limit: int, cursor: Optional[str] = None,
+                  status: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    Keyset pagination over (created_at, id), newest first.
+    Uses ix_history_user_id_created_at, so cost does not grow with page depth.
+    """
+    query = db.select(*HISTORY_LIST_COLUMNS).where(History.user_id == user_id)
+    if status:
+        query = query.where(History.status == status)
+    if cursor:
+        created_at, history_id = _decode_cursor(cursor)
+        # Row-value comparison lets the index seek straight to the cursor position
+        query = query.where(db.tuple_(History.created_at, History.id) < (created_at, history_id))
+
+    query = query.order_by(History.created_at.desc(), History.id.desc()).limit(limit + 1)
+    rows = db.session.execute(query).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+@main.route('/api/history', methods=['GET'])
+def history_list() -> Tuple[Response, int] | Response:
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Login required'}), 401
+
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        rows, next_cursor = _history_page(
+            current_user.id,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            status=request.args.get('status')
+        )
+    except (ValueError, binascii.Error):
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+
+    items = [{
+        'id': row.id,
+        'task_id': row.task_id,
+        'status': row.status,
+        'voice_name': row.voice_name,
+        'text_preview': row.text_preview,
+        # Rows without a local artifact still point at the provider URL
+        'download_url': f"/api/audio/{row.content_hash}" if row.content_hash else row.file_path,
+        'created_at': row.created_at.isoformat()
+    } for row in rows]
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
+AUDIOBOOK_PARAMS = ('speed', 'vol', 'pitch')
+
+def _user_audiobook(audiobook_id: int) -> Optional[Audiobook]:
+    book = db.session.get(Audiobook, audiobook_id)
+    if book is None or book.user_id != current_user.id:
+        return None
+    return book
+
+def _audiobook_response(book: Audiobook) -> Dict[str, Any]:
+    data = book.to_dict()
+    data['download_url'] = f"/api/audio/{book.content_hash}" if book.content_hash else None
+    return data
+
+@main.route('/api/audiobooks', methods=['POST'])
+def create_audiobook() -> Tuple[Response, int] | Response:
+    """Audiobook mode: synthesize an EPUB chapter by chapter into one chaptered MP3."""
+    # app.tasks imports create_app, so it can't be imported while the app package loads
+    from app.tasks import submit_audiobook
+
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Login required'}), 401
+
+    file = request.files.get('file')
+    if not file or not (file.filename or '').lower().endswith('.epub'):
+        return jsonify({'error': 'An .epub file is required'}), 400
+    voice_id = request.form.get('voice_id')
+    if not voice_id:
+        return jsonify({'error': 'Missing voice_id'}), 400
+    provider = get_provider()
+    if not get_voice_catalog().is_known(provider, voice_id):
+        return jsonify({'error': f'Unknown voice_id: {voice_id}'}), 400
+
+    config = current_app.config
+    with spool(file.stream, config['UPLOAD_MAX_SIZE'], config['UPLOAD_SPOOL_THRESHOLD'],
+               config['UPLOAD_CHUNK_SIZE']) as upload:
+        errors = validate_input(size=upload.size)
+        if errors:
+            return jsonify({'error': ' '.join(errors)}), 413
+        chapters = extract_chapters_from_epub(upload.file)
+    if chapters is None:
+        return jsonify({'error': 'Failed to extract text from EPUB'}), 400
+
+    if request.form.get('normalize', '1') != '0':
+        normalizer = get_text_normalizer(document=True)
+        chapters = [(title, normalizer(text)) for title, text in chapters]
+    chapters = [(title, text) for title, text in chapters if text.strip()]
+    if not chapters:
+        return jsonify({'error': 'No text found in EPUB'}), 400
+    quota_error = _quota_error(sum(len(text) for _title, text in chapters))
+    if quota_error:
+        return quota_error
+
+    try:
+        voices = get_voice_catalog().voices(provider)
+        voice_name = next((v.get('name') for v in voices if v.get('id') == voice_id), voice_id)
+        params = {k: request.form[k] for k in AUDIOBOOK_PARAMS if request.form.get(k)}
+        title = request.form.get('title') or os.path.splitext(os.path.basename(file.filename))[0]
+        book = submit_audiobook(title, chapters, voice_id, voice_name, current_user.id, **params)
+        return jsonify(_audiobook_response(book)), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@main.route('/api/audiobooks/<int:audiobook_id>', methods=['GET'])
+def audiobook_status(audiobook_id: int) -> Tuple[Response, int] | Response:
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Login required'}), 401
+    book = _user_audiobook(audiobook_id)
+    if book is None:
+        return jsonify({'error': 'Audiobook not found'}), 404
+    return jsonify(_audiobook_response(book))
+
+@main.route('/api/audiobooks/<int:audiobook_id>/retry', methods=['POST'])
+def retry_audiobook(audiobook_id: int) -> Tuple[Response, int] | Response:
+    from app.tasks import retry_audiobook as retry_failed_chapters
+
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Login required'}), 401
+    book = _user_audiobook(audiobook_id)
+    if book is None:
+        return jsonify({'error': 'Audiobook not found'}), 404
+    if book.status != 'failed':
+        return jsonify({'error': f'Audiobook is {book.status}'}), 409
+
+    retry_failed_chapters(book)
+    return jsonify(_audiobook_response(book)), 202
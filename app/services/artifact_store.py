@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import requests
+from flask import current_app
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+@dataclass
+class Artifact:
+    digest: str
+    path: str
+    size: int
+    ext: str
+
+class ArtifactStore:
+    """
+    Content-addressed store for generated audio.
+    Files live at <root>/<digest[:2]>/<digest>.<ext>, so the same audio is
+    only ever written once and the digest doubles as a strong ETag.
+    """
+
+    def __init__(self, root: str, chunk_size: int = 64 * 1024) -> None:
+        self.root = root
+        self.chunk_size = chunk_size
+
+    def _dir_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2])
+
+    def relpath(self, artifact: Artifact) -> str:
+        return f"{artifact.digest[:2]}/{artifact.digest}.{artifact.ext}"
+
+    def get(self, digest: str) -> Optional[Artifact]:
+        if not DIGEST_PATTERN.match(digest or ''):
+            return None
+
+        directory = self._dir_for(digest)
+        if not os.path.isdir(directory):
+            return None
+
+        prefix = digest + '.'
+        for name in os.listdir(directory):
+            if name.startswith(prefix):
+                path = os.path.join(directory, name)
+                return Artifact(digest, path, os.path.getsize(path), name[len(prefix):])
+        return None
+
+    def put_stream(self, chunks: Iterable[bytes], ext: str = 'mp3',
+                   before_commit: Optional[Callable[[], None]] = None) -> Artifact:
+        """
+        Store `chunks` under their digest. `before_commit` runs once all chunks
+        are written; if it raises, the spooled file is discarded and nothing
+        enters the store.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        sha = hashlib.sha256()
+        size = 0
+
+        # Spool into the store root first so the final rename stays on one filesystem
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            if before_commit is not None:
+                before_commit()
+
+            digest = sha.hexdigest()
+            directory = self._dir_for(digest)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{digest}.{ext}")
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return Artifact(digest, path, size, ext)
+
+    def link(self, key: str, artifact: Artifact) -> None:
+        """Remember that a generation request (see cache_key) produced this artifact."""
+        directory = os.path.join(self.root, 'keys', key[:2])
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        with os.fdopen(fd, 'w') as f:
+            f.write(artifact.digest)
+        os.replace(temp_path, os.path.join(directory, key))
+
+    def resolve(self, key: str) -> Optional[Artifact]:
+        if not DIGEST_PATTERN.match(key or ''):
+            return None
+        try:
+            with open(os.path.join(self.root, 'keys', key[:2], key), 'r') as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return self.get(digest)
+
+    def put_bytes(self, data: bytes, ext: str = 'mp3') -> Artifact:
+        return self.put_stream([data], ext)
+
+    def download(self, url: str, ext: str = 'mp3', timeout: float = 60) -> Artifact:
+        with requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            return self.put_stream(response.iter_content(chunk_size=self.chunk_size), ext)
+
+# Provider defaults; a request that leaves these out gets the same audio
+DEFAULT_PARAMS: Dict[str, Any] = {'format': 'mp3', 'speed': 1.0, 'vol': 1.0, 'pitch': 0.0}
+NUMERIC_PARAMS = ('speed', 'vol', 'pitch', 'bitrate', 'sample_rate')
+# Request fields that don't affect the audio
+IGNORED_PARAMS = ('mode',)
+
+def canonical_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Params as they affect the audio: "1.0" and 1 are the same speed, defaults can be left out."""
+    result = {}
+    for name, value in params.items():
+        if name in IGNORED_PARAMS or value is None or value == '':
+            continue
+        if name in NUMERIC_PARAMS:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                pass
+        if DEFAULT_PARAMS.get(name) == value:
+            continue
+        result[name] = value
+    return result
+
+def cache_key(provider_name: str, text: str, voice_id: str, params: Dict[str, Any]) -> str:
+    """Stable id for a synthesis request: same provider, text, voice and params give the same audio."""
+    payload = json.dumps([provider_name, text, voice_id, canonical_params(params)],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get_artifact_store() -> ArtifactStore:
+    return ArtifactStore(
+        current_app.config['ARTIFACT_FOLDER'],
+        chunk_size=current_app.config.get('ARTIFACT_CHUNK_SIZE', 64 * 1024)
+    )
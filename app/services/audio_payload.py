@@ -0,0 +1,59 @@
+import json
+import re
+from typing import Any, Dict, Optional, Tuple, Union
+
+import requests
+
+READ_CHUNK_SIZE = 256 * 1024
+
+def read_body(response: requests.Response, chunk_size: int = READ_CHUNK_SIZE) -> bytearray:
+    """
+    Read a (streamed) response body into a single bytearray.
+    Preallocated from Content-Length when the body isn't content-encoded, so
+    there is no list of chunks to join and no second full-size copy.
+    """
+    length = response.headers.get('Content-Length')
+    if length and not response.headers.get('Content-Encoding'):
+        buf = bytearray(int(length))
+        view = memoryview(buf)
+        pos = 0
+        for chunk in response.iter_content(chunk_size):
+            end = pos + len(chunk)
+            if end > len(buf):
+                # Server sent more than announced; fall back to growing
+                view.release()
+                buf[pos:] = chunk
+                pos = len(buf)
+                view = memoryview(buf)
+                continue
+            view[pos:end] = chunk
+            pos = end
+        view.release()
+        del buf[pos:]
+        return buf
+
+    buf = bytearray()
+    for chunk in response.iter_content(chunk_size):
+        buf += chunk
+    return buf
+
+def split_string_field(body: bytearray, key: str) -> Tuple[Optional[Union[memoryview, str]], Dict[str, Any]]:
+    """
+    Pull one large JSON string value (the audio payload) out of a raw JSON body.
+
+    Returns a memoryview over the value's bytes inside `body` and the rest of
+    the document parsed with that value replaced by "". Only the small
+    remainder is decoded by the json module, so the payload never exists as
+    a Python str. Falls back to a full parse if the value uses JSON escapes.
+    """
+    match = re.search(rb'"' + re.escape(key.encode('utf-8')) + rb'"\s*:\s*"', body)
+    if match:
+        start = match.end()
+        end = body.find(b'"', start)
+        if end != -1 and body.find(b'\\', start, end) == -1:
+            rest = json.loads(bytes(body[:start]) + bytes(body[end:]))
+            return memoryview(body)[start:end], rest
+
+    # Value missing, null or escaped: take the slow path
+    parsed = json.loads(body)
+    return None, parsed
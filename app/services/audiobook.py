@@ -0,0 +1,154 @@
+"""
+Joining MP3 segments: chapters into one audiobook file, sentences into
+one clip.
+
+MPEG audio frames are self-contained, so files are joined by
+concatenating their frames (minus each file's ID3 tags and Xing/Info
+header). Audiobooks get a single ID3v2.4 tag whose CHAP/CTOC frames carry
+the chapter markers. No decoding or ffmpeg is involved.
+"""
+import struct
+from dataclasses import dataclass
+from typing import Iterator, List, Sequence, Tuple
+
+from app.services.artifact_store import Artifact, ArtifactStore
+
+# Layer III bitrates in kbps by bitrate index, for MPEG-1 and MPEG-2/2.5
+_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# The CTOC entry count is a single byte
+MAX_TOC_ENTRIES = 255
+
+@dataclass
+class ChapterMarker:
+    title: str
+    start_ms: int
+    end_ms: int
+
+    def to_dict(self) -> dict:
+        return {'title': self.title, 'start_ms': self.start_ms, 'end_ms': self.end_ms}
+
+def _frame_info(data: bytes, pos: int) -> Tuple[int, int, int]:
+    """(frame length, samples, sample rate) of the MP3 frame header at pos, or (0, 0, 0)."""
+    if data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return 0, 0, 0
+    version = (data[pos + 1] >> 3) & 0x03  # 3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5
+    layer = (data[pos + 1] >> 1) & 0x03  # 1: Layer III
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return 0, 0, 0
+
+    padding = (data[pos + 2] >> 1) & 0x01
+    bitrate = _BITRATES[3 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    if version == 3:
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+def mp3_audio_span(data: bytes) -> Tuple[int, int, int]:
+    """
+    Locate the audio frames of an MP3 file.
+    Returns (start, end, duration_ms) with ID3v2/ID3v1 tags and a leading
+    Xing/Info frame excluded, since those describe the single file only.
+    """
+    start, end = 0, len(data)
+    if data[:3] == b'ID3' and end >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - 128 >= start and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+
+    pos, audio_start, audio_end = start, None, start
+    seconds = 0.0
+    while pos + 4 <= end:
+        length, samples, sample_rate = _frame_info(data, pos)
+        if not length:
+            # Junk between frames: resynchronise on the next header
+            pos += 1
+            continue
+        if pos + length > end:
+            break
+        if audio_start is None:
+            audio_start = pos
+            header = data[pos + 4:pos + min(length, 64)]
+            if b'Xing' in header or b'Info' in header:
+                audio_start = pos + length
+                pos += length
+                continue
+        seconds += samples / sample_rate
+        pos += length
+        audio_end = pos
+
+    if audio_start is None or audio_end <= audio_start:
+        raise ValueError("No MP3 audio frames found")
+    return audio_start, audio_end, int(round(seconds * 1000))
+
+def _syncsafe(n: int) -> bytes:
+    return bytes(((n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F))
+
+def _id3_frame(frame_id: str, body: bytes) -> bytes:
+    return frame_id.encode('ascii') + _syncsafe(len(body)) + b'\x00\x00' + body
+
+def _text_frame(frame_id: str, text: str) -> bytes:
+    return _id3_frame(frame_id, b'\x03' + text.encode('utf-8'))  # 3: UTF-8
+
+def chapter_tag(title: str, markers: Sequence[ChapterMarker]) -> bytes:
+    """ID3v2.4 tag with the book title, a table of contents and one CHAP frame per chapter."""
+    element_ids = [f"chp{i}".encode('ascii') for i in range(len(markers))]
+    toc_ids = element_ids[:MAX_TOC_ENTRIES]
+    # Flags 0x03: top-level, ordered
+    toc = (b'toc\x00\x03' + bytes((len(toc_ids),)) + b''.join(i + b'\x00' for i in toc_ids)
+           + _text_frame('TIT2', title))
+    frames = [_text_frame('TIT2', title), _id3_frame('CTOC', toc)]
+    for element_id, marker in zip(element_ids, markers):
+        # Byte offsets are unset (0xFFFFFFFF); players seek by time
+        body = (element_id + b'\x00' + struct.pack('>IIII', marker.start_ms, marker.end_ms, 0xFFFFFFFF, 0xFFFFFFFF)
+                + _text_frame('TIT2', marker.title))
+        frames.append(_id3_frame('CHAP', body))
+    payload = b''.join(frames)
+    return b'ID3\x04\x00\x00' + _syncsafe(len(payload)) + payload
+
+def _audio_spans(artifacts: Sequence[Artifact]) -> List[Tuple[str, int, int, int]]:
+    """(path, start, end, duration_ms) of the audio frames in each artifact."""
+    spans = []
+    for artifact in artifacts:
+        with open(artifact.path, 'rb') as f:
+            start, end, duration_ms = mp3_audio_span(f.read())
+        spans.append((artifact.path, start, end, duration_ms))
+    return spans
+
+def _stream_spans(spans: Sequence[Tuple[str, int, int, int]], chunk_size: int, header: bytes = b'') -> Iterator[bytes]:
+    if header:
+        yield header
+    for path, start, end, _duration_ms in spans:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+def concat_mp3(store: ArtifactStore, artifacts: Sequence[Artifact]) -> Artifact:
+    """Join MP3 artifacts into one, without tags."""
+    spans = _audio_spans(artifacts)
+    return store.put_stream(_stream_spans(spans, store.chunk_size), 'mp3')
+
+def assemble_mp3(store: ArtifactStore, title: str,
+                 chapters: Sequence[Tuple[str, Artifact]]) -> Tuple[Artifact, List[ChapterMarker]]:
+    """Join chapter MP3s from the artifact store into one chaptered MP3 artifact."""
+    spans = _audio_spans([artifact for _title, artifact in chapters])
+    markers: List[ChapterMarker] = []
+    position = 0
+    for (chapter_title, _artifact), (_path, _start, _end, duration_ms) in zip(chapters, spans):
+        markers.append(ChapterMarker(chapter_title, position, position + duration_ms))
+        position += duration_ms
+
+    chunks = _stream_spans(spans, store.chunk_size, header=chapter_tag(title, markers))
+    return store.put_stream(chunks, 'mp3'), markers
@@ -1,13 +1,79 @@
 from abc import ABC, abstractmethod
+import functools
 import io
-from typing import List, Dict, Any, Union, Optional
+import time
+import requests
+from typing import List, Dict, Any, Union, Optional, Tuple, Callable
+from app import tracing
+from app.metrics import PROVIDER_LATENCY, PROVIDER_REQUESTS, PROVIDER_BYTES_SENT, PROVIDER_BYTES_RECEIVED
+from app.services.scheduler import scheduler
+
+# Methods whose first argument is the text being synthesized
+_TEXT_METHODS = {'generate_sync', 'submit_async'}
+
+def instrumented(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Record latency, outcome and payload sizes of a provider API method.
+    Each call first waits for a provider scheduler slot.
+    """
+    method = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self: 'TTSProvider', *args: Any, **kwargs: Any) -> Any:
+        labels = {'provider': self.NAME, 'method': method}
+        if method in _TEXT_METHODS:
+            text = args[0] if args else kwargs.get('text')
+            if text:
+                PROVIDER_BYTES_SENT.inc(len(text.encode('utf-8')), **labels)
+
+        with tracing.span('scheduler.wait'):
+            scheduler.acquire()
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            with tracing.span(f"{self.NAME}.{method}"):
+                result = func(self, *args, **kwargs)
+        except requests.HTTPError as e:
+            status = str(e.response.status_code) if e.response is not None else 'HTTPError'
+            raise
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            scheduler.release()
+            PROVIDER_LATENCY.observe(time.perf_counter() - start, **labels)
+            PROVIDER_REQUESTS.inc(status=status, **labels)
+
+        if isinstance(result, (bytes, bytearray)):
+            PROVIDER_BYTES_RECEIVED.inc(len(result), **labels)
+        return result
+
+    return wrapper
 
 class TTSProvider(ABC):
+    NAME: str = 'base'
+
+    # Output formats the upstream API can produce itself; others are transcoded from mp3
+    SUPPORTED_FORMATS: Tuple[str, ...] = ('mp3',)
+    ASYNC_SUPPORTED_FORMATS: Tuple[str, ...] = ('mp3',)
+
+    def supports_format(self, fmt: str, async_mode: bool = False) -> bool:
+        formats = self.ASYNC_SUPPORTED_FORMATS if async_mode else self.SUPPORTED_FORMATS
+        return fmt in formats
+
     @abstractmethod
     def get_voices(self) -> List[Dict[str, str]]:
         """Return a list of dicts with 'name' and 'id'."""
         pass
 
+    def fetch_voices(self, etag: Optional[str] = None) -> Optional[Tuple[List[Dict[str, str]], Optional[str]]]:
+        """
+        Voices available upstream as ([{'name', 'id'}], etag), or None when
+        the listing is unchanged since `etag`. Providers without a voice
+        listing API return their configured voices.
+        """
+        return self.get_voices(), None
+
     @abstractmethod
     def generate_sync(self, text: str, voice_id: str, **kwargs: Any) -> bytes:
         """
@@ -23,8 +89,8 @@ class TTSProvider(ABC):
         pass
 
     @abstractmethod
-    def upload_file(self, filename: str, file_stream: Any, mimetype: str) -> Dict[str, Any]:
-        """Upload a file for async processing."""
+    def upload_file(self, filename: str, file_stream: Any, mimetype: str, size: Optional[int] = None) -> Dict[str, Any]:
+        """Upload a file for async processing; `size` lets providers stream a seekable file_stream."""
         pass
 
     @abstractmethod
@@ -0,0 +1,170 @@
+"""
+Two-tier cache: a small in-process LRU in front of the shared
+Flask-Caching backend (FileSystemCache by default, RedisCache for
+multi-host deployments), so every worker process sees the same entries
+and they survive restarts.
+
+Local entries live at most CACHE_LOCAL_TTL seconds, which bounds how long
+a worker can serve a value another worker has replaced. get_or_set() and
+lock() keep concurrent misses for the same key from all hitting
+upstream: within a process through a per-key lock, across processes
+through a lock entry added to the shared backend.
+"""
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from app import metrics
+
+class LRUCache:
+    """Thread-safe LRU mapping with a per-entry expiry."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._data: 'OrderedDict[Any, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+class LayeredCache:
+    def __init__(self, app: Any = None) -> None:
+        self.backend: Any = None
+        self.local = LRUCache()
+        self.local_ttl: float = 5.0
+        self.lock_timeout: float = 60.0
+        self.lock_poll_interval: float = 0.05
+        # key -> [lock, number of threads holding or waiting for it]
+        self._key_locks: Dict[str, List[Any]] = {}
+        self._key_locks_guard = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        from app.extensions import cache
+        self.backend = app.extensions['cache'][cache]
+        # create_app also runs in background tasks; keep the entries this process already has
+        self.local.maxsize = app.config.get('CACHE_LOCAL_SIZE', 1024)
+        self.local_ttl = app.config.get('CACHE_LOCAL_TTL', 5.0)
+        self.lock_timeout = app.config.get('CACHE_LOCK_TIMEOUT', 60.0)
+
+    def get(self, key: str) -> Any:
+        value = self.local.get(key)
+        if value is not None:
+            metrics.CACHE_REQUESTS.inc(tier='local', result='hit')
+            return value
+        value = self.backend.get(key) if self.backend is not None else None
+        metrics.CACHE_REQUESTS.inc(tier='shared', result='miss' if value is None else 'hit')
+        if value is not None:
+            self.local.set(key, value, self.local_ttl)
+        return value
+
+    def set(self, key: str, value: Any, timeout: Optional[float] = None) -> None:
+        local_ttl = self.local_ttl if not timeout else min(self.local_ttl, timeout)
+        self.local.set(key, value, local_ttl)
+        if self.backend is not None:
+            # Rounded up: cachelib reads a timeout of 0 as "never expires"
+            self.backend.set(key, value, timeout=math.ceil(timeout) if timeout else None)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    @contextmanager
+    def _local_lock(self, key: str) -> Iterator[None]:
+        with self._key_locks_guard:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._key_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def _acquire_shared(self, lock_key: str, token: str) -> bool:
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            if self.backend.add(lock_key, token, timeout=int(self.lock_timeout)):
+                return True
+            if self.backend.get(lock_key) is None:
+                # Expired but not yet removed (FileSystemCache.add only checks the file exists)
+                self.backend.delete(lock_key)
+                continue
+            if time.monotonic() >= deadline:
+                # The holder is probably gone; go ahead rather than wait forever
+                return False
+            time.sleep(self.lock_poll_interval)
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """
+        Hold the stampede lock of `key` across threads and processes.
+        Callers re-check their cache inside the lock before producing.
+        """
+        with self._local_lock(key):
+            if self.backend is None:
+                yield
+                return
+            lock_key = f"lock:{key}"
+            token = uuid.uuid4().hex
+            start = time.perf_counter()
+            acquired = self._acquire_shared(lock_key, token)
+            metrics.CACHE_LOCK_WAIT_SECONDS.observe(time.perf_counter() - start)
+            try:
+                yield
+            finally:
+                # Don't remove a lock that expired and was taken over by someone else
+                if acquired and self.backend.get(lock_key) == token:
+                    self.backend.delete(lock_key)
+
+    def get_or_set(self, key: str, producer: Callable[[], Any],
+                   timeout: Union[float, Callable[[Any], float], None] = None) -> Any:
+        """
+        Cached value of `key`, or producer()'s result stored for `timeout`
+        seconds (a number, or a function of the value). Concurrent misses
+        wait for a single producer. None results are not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self.lock(key):
+            value = self.get(key)
+            if value is None:
+                value = producer()
+                if value is not None:
+                    self.set(key, value, timeout(value) if callable(timeout) else timeout)
+            return value
+
+layered_cache = LayeredCache()
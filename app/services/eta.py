@@ -0,0 +1,155 @@
+"""
+Completion estimates for async tasks. Synthesis time grows with text
+length, so per provider (and per provider and voice, once there are
+enough samples) the duration of recently completed tasks is fitted as
+overhead + seconds_per_character * characters. Poll loops use the
+estimate to sleep until the task should be done instead of polling on a
+fixed interval, and clients get it as an ETA.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class Model:
+    """duration = overhead + rate * characters, fitted from `samples` completed tasks."""
+
+    def __init__(self, overhead: float, rate: float, mean_characters: float = 0.0, samples: int = 0) -> None:
+        self.overhead = overhead
+        self.rate = rate
+        self.mean_characters = mean_characters
+        self.samples = samples
+
+    @classmethod
+    def fit(cls, points: Iterable[Tuple[int, float]], default: 'Model') -> 'Model':
+        """Least-squares fit of (characters, seconds) points, clamped to non-negative terms."""
+        points = list(points)
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        if var_x > 0:
+            rate = max(sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x, 0.0)
+        elif mean_x > 0:
+            # All texts the same length; keep the default overhead and put the rest on the rate
+            rate = max(mean_y - default.overhead, 0.0) / mean_x
+        else:
+            rate = default.rate
+        return cls(max(mean_y - rate * mean_x, 0.0), rate, mean_x, n)
+
+    def predict(self, characters: Optional[int]) -> float:
+        if characters is None:
+            # Uploaded files of unknown length count as an average task
+            characters = self.mean_characters
+        return self.overhead + self.rate * characters
+
+class CompletionEstimator:
+    """
+    Learns async task durations from successful History rows (created_at
+    to completed_at) and turns them into ETAs and poll delays. Fitted
+    models are cached per process and refitted every
+    ASYNC_ETA_REFRESH_INTERVAL seconds.
+    """
+
+    def __init__(self, app: Any = None) -> None:
+        self.app = app
+        self.default = Model(20.0, 0.01)
+        self.min_samples = 5
+        self.window = 500
+        self.refresh_interval = 300.0
+        self.min_interval = 2.0
+        self.max_interval = 30.0
+        self.eta_fraction = 0.5
+        self._models: Dict[Tuple[str, Optional[str]], Model] = {}
+        self._fitted_at: Optional[float] = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        self.app = app
+        config = app.config
+        self.default = Model(config.get('ASYNC_ETA_DEFAULT_OVERHEAD', 20.0), config.get('ASYNC_ETA_DEFAULT_RATE', 0.01))
+        self.min_samples = config.get('ASYNC_ETA_MIN_SAMPLES', 5)
+        self.window = config.get('ASYNC_ETA_WINDOW', 500)
+        self.refresh_interval = config.get('ASYNC_ETA_REFRESH_INTERVAL', 300.0)
+        self.min_interval = config.get('ASYNC_POLL_MIN_INTERVAL', 2.0)
+        self.eta_fraction = config.get('ASYNC_POLL_ETA_FRACTION', 0.5)
+        # Every poll renews the task lease, so a poll must come well before it expires
+        self.max_interval = min(config.get('ASYNC_POLL_MAX_INTERVAL', 30.0), config.get('TASK_LEASE_TTL', 60) / 2)
+
+    def refresh(self) -> Dict[Tuple[str, Optional[str]], Model]:
+        """Refit the models from the most recent completed tasks; needs an app context."""
+        from app.models import History
+        rows = History.query \
+            .with_entities(History.provider, History.voice_name, History.characters,
+                           History.created_at, History.completed_at) \
+            .filter(History.status == 'success', History.provider.isnot(None),
+                    History.characters.isnot(None), History.completed_at.isnot(None)) \
+            .order_by(History.completed_at.desc()) \
+            .limit(self.window).all()
+
+        groups: Dict[Tuple[str, Optional[str]], list] = {}
+        for provider, voice, characters, created_at, completed_at in rows:
+            point = (characters, max((completed_at - created_at).total_seconds(), 0.0))
+            groups.setdefault((provider, None), []).append(point)
+            groups.setdefault((provider, voice), []).append(point)
+        models = {key: Model.fit(points, self.default) for key, points in groups.items()
+                  if len(points) >= self.min_samples}
+
+        with self._lock:
+            self._models = models
+            self._fitted_at = time.monotonic()
+        logger.debug(f"Fitted {len(models)} completion models from {len(rows)} tasks")
+        return models
+
+    def model(self, provider: str, voice: Optional[str] = None) -> Model:
+        """The most specific model with enough samples: provider and voice, provider, then the defaults."""
+        with self._lock:
+            stale = self._fitted_at is None or time.monotonic() - self._fitted_at >= self.refresh_interval
+        if stale:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Estimates are advisory; polling carries on with what we have
+                logger.warning(f"Could not fit completion models: {e}")
+                with self._lock:
+                    self._fitted_at = time.monotonic()
+        with self._lock:
+            return self._models.get((provider, voice)) or self._models.get((provider, None)) or self.default
+
+    def estimate(self, provider: str, voice: Optional[str], characters: Optional[int]) -> float:
+        """Expected seconds from submission to completion."""
+        return self.model(provider, voice).predict(characters)
+
+    def eta(self, history: Any, now: Optional[datetime] = None, progress: Optional[float] = None) -> datetime:
+        """
+        Expected completion time of a processing task. Progress reported by
+        the provider (0-1), when there is some, extrapolates the time spent
+        so far; otherwise the learned duration is added to created_at.
+        """
+        now = now or datetime.utcnow()
+        started = history.created_at or now
+        if progress is not None and 0 < progress < 1:
+            elapsed = (now - started).total_seconds()
+            return now + timedelta(seconds=elapsed * (1 - progress) / progress)
+        seconds = self.estimate(history.provider, history.voice_name, history.characters)
+        return started + timedelta(seconds=seconds)
+
+    def next_delay(self, eta: datetime, now: Optional[datetime] = None) -> float:
+        """
+        Seconds to sleep before the next poll: ASYNC_POLL_ETA_FRACTION of
+        the time left while the ETA is ahead, then backing off in
+        proportion to how late the task is. Polls close in on the ETA
+        instead of landing on it, so tasks that finish early are seen
+        early and the fit can learn that they got faster.
+        """
+        now = now or datetime.utcnow()
+        remaining = (eta - now).total_seconds()
+        delay = remaining * self.eta_fraction if remaining > 0 else -remaining / 2
+        return min(max(delay, self.min_interval), self.max_interval)
+
+estimator = CompletionEstimator()
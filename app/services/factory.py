@@ -1,18 +1,25 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from app.config import config_manager
 from app.services.minimax import MinimaxProvider
 from app.services.volcengine_tts import VolcengineProvider
 from app.services.base import TTSProvider
+from app import tracing
 
-def get_provider() -> TTSProvider:
+def get_provider(name: Optional[str] = None) -> TTSProvider:
+    """The active provider, or the provider called `name`."""
+    with tracing.span('provider.construct'):
+        return _build_provider(name)
+
+def _build_provider(name: Optional[str] = None) -> TTSProvider:
     config: Dict[str, Any] = config_manager.get_all()
-    provider_name: str = config.get('active_provider', 'minimax')
+    provider_name: str = name or config.get('active_provider', 'minimax')
 
     if provider_name == 'minimax':
         return MinimaxProvider(
             api_key=config['minimax'].get('api_key'),
             group_id=config['minimax'].get('group_id'),
-            voices=config['voices'].get('minimax', [])
+            voices=config['voices'].get('minimax', []),
+            base_url=config['minimax'].get('base_url')
         )
     elif provider_name == 'volcengine':
         return VolcengineProvider(
@@ -20,7 +27,8 @@ def get_provider() -> TTSProvider:
             access_token=config['volcengine'].get('access_token'),
             secret_key=config['volcengine'].get('secret_key'),
             cluster=config['volcengine'].get('cluster'),
-            voices=config['voices'].get('volcengine', [])
+            voices=config['voices'].get('volcengine', []),
+            base_url=config['volcengine'].get('base_url')
         )
     else:
         raise ValueError(f"Unknown provider: {provider_name}")
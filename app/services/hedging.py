@@ -0,0 +1,176 @@
+"""
+Hedged sync synthesis for tail latency.
+
+When a sync call hasn't returned after the HEDGE_PERCENTILE latency of
+recent calls with similar text length, an identical second request is
+sent, to the same provider or to HEDGE_ALTERNATE_PROVIDER, and whichever
+finishes first wins. Hedges are paid from a budget that grows with every
+primary call, so extra upstream spend stays below HEDGE_BUDGET_RATIO.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+from app import metrics
+from app.services.base import TTSProvider
+from app.services.factory import get_provider
+
+class LatencyTracker:
+    """Recent successful call latencies per provider and text-length bucket."""
+
+    def __init__(self, window: int = 200) -> None:
+        self.window = window
+        self._samples: Dict[Tuple[str, int], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(text: str) -> int:
+        # Latency grows with text length; powers of two keep similar requests together
+        return len(text).bit_length()
+
+    def record(self, provider_name: str, text: str, seconds: float) -> None:
+        key = (provider_name, self._bucket(text))
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, provider_name: str, text: str, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get((provider_name, self._bucket(text)), ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+class HedgeBudget:
+    """Token bucket: every primary call earns `ratio` tokens (up to `burst`), every hedge spends one."""
+
+    def __init__(self, ratio: float = 0.05, burst: float = 5.0) -> None:
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+class Hedger:
+    def __init__(self, percentile: float = 95, initial_delay: float = 2.0, min_samples: int = 20,
+                 budget_ratio: float = 0.05, budget_burst: float = 5.0, workers: int = 32,
+                 alternate_provider: Optional[str] = None, voice_map: Optional[Dict[str, str]] = None) -> None:
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.alternate_provider = alternate_provider
+        self.voice_map = voice_map or {}
+        self.latency = LatencyTracker()
+        self.budget = HedgeBudget(budget_ratio, budget_burst)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hedge')
+
+    def delay(self, provider: TTSProvider, text: str) -> float:
+        """Seconds to wait for the primary call before hedging."""
+        observed = self.latency.percentile(provider.NAME, text, self.percentile, self.min_samples)
+        return self.initial_delay if observed is None else observed
+
+    def _hedge_target(self, provider: TTSProvider, voice_id: str, params: Dict[str, Any]) -> Tuple[TTSProvider, str]:
+        # The alternate provider is only used for voices mapped to one of its own
+        if self.alternate_provider and self.alternate_provider != provider.NAME and voice_id in self.voice_map:
+            alternate = get_provider(self.alternate_provider)
+            if alternate.supports_format(params.get('format') or 'mp3'):
+                return alternate, self.voice_map[voice_id]
+        return provider, voice_id
+
+    def _call(self, provider: TTSProvider, text: str, voice_id: str, params: Dict[str, Any]) -> bytes:
+        start = time.perf_counter()
+        audio = provider.generate_sync(text, voice_id, **params)
+        self.latency.record(provider.NAME, text, time.perf_counter() - start)
+        return audio
+
+    def _submit(self, provider: TTSProvider, text: str, voice_id: str, params: Dict[str, Any]) -> Future:
+        # A copy of the request context, so the call's spans join the request trace
+        return self._pool.submit(contextvars.copy_context().run, self._call, provider, text, voice_id, params)
+
+    def generate_sync(self, provider: TTSProvider, text: str, voice_id: str, params: Dict[str, Any]) -> bytes:
+        return self.generate_with_source(provider, text, voice_id, params)[0]
+
+    def generate_with_source(self, provider: TTSProvider, text: str, voice_id: str,
+                             params: Dict[str, Any]) -> Tuple[bytes, TTSProvider, str]:
+        """
+        Audio plus the provider and voice that produced it, which differ from
+        the requested ones when a hedge to the alternate provider wins.
+        """
+        self.budget.deposit()
+        primary = self._submit(provider, text, voice_id, params)
+        try:
+            audio = primary.result(timeout=self.delay(provider, text))
+            metrics.HEDGED_REQUESTS.inc(provider=provider.NAME, result='not_hedged')
+            return audio, provider, voice_id
+        except FutureTimeout:
+            pass
+
+        if not self.budget.withdraw():
+            metrics.HEDGED_REQUESTS.inc(provider=provider.NAME, result='budget_exhausted')
+            return primary.result(), provider, voice_id
+
+        target, target_voice = self._hedge_target(provider, voice_id, params)
+        hedge = self._submit(target, text, target_voice, params)
+        roles = {primary: 'primary_won', hedge: 'hedge_won'}
+        sources = {primary: (provider, voice_id), hedge: (target, target_voice)}
+        pending = set(roles)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # A loser that is already running can't be interrupted; it
+                    # finishes in the background and its audio is discarded
+                    for loser in pending:
+                        loser.cancel()
+                    metrics.HEDGED_REQUESTS.inc(provider=provider.NAME, result=roles[future])
+                    return (future.result(),) + sources[future]
+
+        metrics.HEDGED_REQUESTS.inc(provider=provider.NAME, result='failed')
+        return primary.result(), provider, voice_id
+
+def get_hedger() -> Optional[Hedger]:
+    """Hedger of the current app, or None when hedging is disabled."""
+    if not has_app_context() or not current_app.config.get('HEDGE_ENABLED'):
+        return None
+    hedger = current_app.extensions.get('hedger')
+    if hedger is None:
+        config = current_app.config
+        hedger = current_app.extensions.setdefault('hedger', Hedger(
+            percentile=config.get('HEDGE_PERCENTILE', 95),
+            initial_delay=config.get('HEDGE_INITIAL_DELAY', 2.0),
+            min_samples=config.get('HEDGE_MIN_SAMPLES', 20),
+            budget_ratio=config.get('HEDGE_BUDGET_RATIO', 0.05),
+            alternate_provider=config.get('HEDGE_ALTERNATE_PROVIDER'),
+            voice_map=config.get('HEDGE_VOICE_MAP'),
+        ))
+    return hedger
+
+def generate_sync(provider: TTSProvider, text: str, voice_id: str, params: Dict[str, Any], hedge: bool = True) -> bytes:
+    """provider.generate_sync(text, voice_id, **params), hedged when HEDGE_ENABLED is set."""
+    return generate_with_source(provider, text, voice_id, params, hedge)[0]
+
+def generate_with_source(provider: TTSProvider, text: str, voice_id: str, params: Dict[str, Any],
+                         hedge: bool = True) -> Tuple[bytes, TTSProvider, str]:
+    """
+    Like generate_sync, plus the provider and voice the audio came from.
+    Callers caching the audio must key it by those: with
+    HEDGE_ALTERNATE_PROVIDER set they may not be the requested ones.
+    """
+    hedger = get_hedger() if hedge else None
+    if hedger is None:
+        return provider.generate_sync(text, voice_id, **params), provider, voice_id
+    return hedger.generate_with_source(provider, text, voice_id, params)
@@ -0,0 +1,103 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple, List
+
+from sqlalchemy import update, bindparam
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+class HistoryWriter:
+    """
+    Coalesces History status transitions from the poll tasks and writes them
+    with one bulk UPDATE per column set, in a single transaction per interval.
+    Set HISTORY_FLUSH_INTERVAL to 0 to write every transition immediately.
+    """
+
+    def __init__(self, app: Any = None) -> None:
+        self.app = app
+        self.interval: float = 1.0
+        self.max_batch: int = 500
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        self.app = app
+        self.interval = app.config.get('HISTORY_FLUSH_INTERVAL', 1.0)
+        self.max_batch = app.config.get('HISTORY_FLUSH_MAX_BATCH', 500)
+
+    def enqueue(self, task_id: str, **fields: Any) -> None:
+        with self._lock:
+            # Later transitions for the same task win
+            self._pending.setdefault(str(task_id), {}).update(fields)
+            pending = len(self._pending)
+
+        if self.interval <= 0:
+            self.flush()
+            return
+
+        self._ensure_thread()
+        if pending >= self.max_batch:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        # Group by the set of columns touched so each group is one executemany
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+        for task_id, fields in pending.items():
+            row = {'b_task_id': task_id}
+            row.update({f'b_{column}': value for column, value in fields.items()})
+            groups[tuple(sorted(fields))].append(row)
+
+        from app.models import History
+        table = History.__table__
+
+        try:
+            with self.app.app_context():
+                for columns, rows in groups.items():
+                    stmt = (
+                        update(table)
+                        .where(table.c.task_id == bindparam('b_task_id'))
+                        .values({column: bindparam(f'b_{column}') for column in columns})
+                    )
+                    db.session.execute(stmt, rows)
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Failed to flush {len(pending)} history updates, will retry: {e}")
+            with self._lock:
+                for task_id, fields in pending.items():
+                    # Don't overwrite transitions that arrived while we were flushing
+                    merged = dict(fields)
+                    merged.update(self._pending.get(task_id, {}))
+                    self._pending[task_id] = merged
+            return 0
+
+        return len(pending)
+
+    def _ensure_thread(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+history_writer = HistoryWriter()
@@ -1,24 +1,62 @@
 import requests
 import binascii
-from .base import TTSProvider
-from typing import List, Dict, Any, Optional
+from .base import TTSProvider, instrumented
+from .audio_payload import read_body, split_string_field
+from .uploads import MultipartBody
+from app import tracing
+from typing import List, Dict, Any, Optional, Tuple
 
 class MinimaxProvider(TTSProvider):
+    NAME = "minimax"
     API_BASE_URL = "https://api.minimaxi.com"
+    SUPPORTED_FORMATS = ('mp3', 'pcm', 'flac', 'wav')
+    ASYNC_SUPPORTED_FORMATS = ('mp3', 'pcm', 'flac')
 
-    def __init__(self, api_key: str, group_id: Optional[str] = None, voices: Optional[List[Dict[str, str]]] = None) -> None:
+    def __init__(self, api_key: str, group_id: Optional[str] = None, voices: Optional[List[Dict[str, str]]] = None,
+                 base_url: Optional[str] = None) -> None:
         self.api_key = api_key
         self.group_id = group_id
         self.voices = voices or []
+        self.base_url = (base_url or self.API_BASE_URL).rstrip('/')
 
     def get_voices(self) -> List[Dict[str, str]]:
         return self.voices
 
+    @instrumented
+    def fetch_voices(self, etag: Optional[str] = None) -> Optional[Tuple[List[Dict[str, str]], Optional[str]]]:
+        if not self.api_key:
+            return self.voices, None
+
+        url = f"{self.base_url}/v1/get_voice"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        if etag:
+            headers["If-None-Match"] = etag
+
+        response = requests.post(url, json={"voice_type": "all"}, headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        resp_json = response.json()
+        if resp_json.get('base_resp', {}).get('status_code', 0) != 0:
+            raise Exception(f"MiniMax API Error: {resp_json.get('base_resp', {}).get('status_msg')}")
+
+        voices = []
+        # System voices plus the account's cloned and designed voices
+        for group in ('system_voice', 'voice_cloning', 'voice_generation'):
+            for voice in resp_json.get(group) or []:
+                if voice.get('voice_id'):
+                    voices.append({'name': voice.get('voice_name') or voice['voice_id'], 'id': voice['voice_id']})
+        return voices, response.headers.get('ETag')
+
+    @instrumented
     def generate_sync(self, text: str, voice_id: str, **kwargs: Any) -> bytes:
         if not self.api_key:
              raise ValueError("Missing API Key for MiniMax")
 
-        url = f"{self.API_BASE_URL}/v1/t2a_v2"
+        url = f"{self.base_url}/v1/t2a_v2"
         if self.group_id:
              url += f"?GroupId={self.group_id}"
 
@@ -41,42 +79,66 @@ class MinimaxProvider(TTSProvider):
                 "speed": speed, "vol": vol, "pitch": pitch
             },
             "audio_setting": {
-                "sample_rate": 32000, "bitrate": 128000, "format": "mp3", "channel": 1
+                "sample_rate": int(kwargs.get('sample_rate') or 32000),
+                "bitrate": int(kwargs.get('bitrate') or 128000),
+                "format": kwargs.get('format') or "mp3",
+                "channel": 1
             }
         }
 
-        response = requests.post(url, json=payload, headers=headers)
+        headers["X-Request-ID"] = tracing.child_request_id()
+
+        with tracing.span('upstream') as span:
+            response = requests.post(url, json=payload, headers=headers, stream=True)
+            if span:
+                # Time to response headers; the body transfer is the read_body span
+                span.attrs['headers_ms'] = round(response.elapsed.total_seconds() * 1000, 3)
         response.raise_for_status()
-        resp_json = response.json()
+        with tracing.span('read_body'):
+            body = read_body(response)
+        with tracing.span('parse_json'):
+            # The hex audio stays a view into the body instead of becoming a str
+            hex_audio, resp_json = split_string_field(body, 'audio')
+        tracing.set_attribute('minimax_trace_id', resp_json.get('trace_id'))
 
         if resp_json.get('base_resp', {}).get('status_code') != 0:
              raise Exception(f"MiniMax API Error: {resp_json.get('base_resp', {}).get('status_msg')}")
 
-        hex_audio = resp_json.get('data', {}).get('audio')
+        if hex_audio is None:
+            hex_audio = resp_json.get('data', {}).get('audio')
         if not hex_audio:
             raise Exception("No audio data received")
 
-        return binascii.unhexlify(hex_audio)
+        with tracing.span('decode'):
+            return binascii.unhexlify(hex_audio)
 
-    def upload_file(self, filename: str, file_stream: Any, mimetype: str) -> Dict[str, Any]:
-        url = f"{self.API_BASE_URL}/v1/files/upload"
+    @instrumented
+    def upload_file(self, filename: str, file_stream: Any, mimetype: str, size: Optional[int] = None) -> Dict[str, Any]:
+        url = f"{self.base_url}/v1/files/upload"
         headers = {
             "Authorization": f"Bearer {self.api_key}"
         }
 
-        files = {
-            'file': (filename, file_stream, mimetype)
-        }
         data = {
             'purpose': 't2a_async_input'
         }
 
-        response = requests.post(url, headers=headers, files=files, data=data)
+        if size is None:
+            files = {
+                'file': (filename, file_stream, mimetype)
+            }
+            response = requests.post(url, headers=headers, files=files, data=data)
+        else:
+            # requests would build a files= body in memory; stream it instead
+            body = MultipartBody(data, 'file', filename, file_stream, size, mimetype)
+            headers["Content-Type"] = body.content_type
+            response = requests.post(url, headers=headers, data=body)
         response.raise_for_status()
         return response.json()
 
+    @instrumented
     def submit_async(self, text: Optional[str], text_file_id: Optional[str], voice_id: str, **kwargs: Any) -> Dict[str, Any]:
-        url = f"{self.API_BASE_URL}/v1/t2a_async_v2"
+        url = f"{self.base_url}/v1/t2a_async_v2"
         if self.group_id:
              url += f"?GroupId={self.group_id}"
 
@@ -97,7 +159,10 @@ class MinimaxProvider(TTSProvider):
                 "speed": speed, "vol": vol, "pitch": pitch
             },
             "audio_setting": {
-                "audio_sample_rate": 32000, "bitrate": 128000, "format": "mp3", "channel": 1
+                "audio_sample_rate": int(kwargs.get('sample_rate') or 32000),
+                "bitrate": int(kwargs.get('bitrate') or 128000),
+                "format": kwargs.get('format') or "mp3",
+                "channel": 1
             }
         }
 
@@ -110,8 +175,9 @@ class MinimaxProvider(TTSProvider):
         response.raise_for_status()
         return response.json() # Returns {'task_id': ..., ...}
 
+    @instrumented
     def query_async(self, task_id: str) -> Dict[str, Any]:
-        url = f"{self.API_BASE_URL}/v1/query/t2a_async_query_v2"
+        url = f"{self.base_url}/v1/query/t2a_async_query_v2"
         if self.group_id:
              url += f"?GroupId={self.group_id}"
 
@@ -124,8 +190,9 @@ class MinimaxProvider(TTSProvider):
         response.raise_for_status()
         return response.json()
 
+    @instrumented
     def retrieve_file(self, file_id: str) -> Dict[str, Any]:
-        url = f"{self.API_BASE_URL}/v1/files/retrieve"
+        url = f"{self.base_url}/v1/files/retrieve"
         params = {'file_id': file_id}
         headers = {
             "Authorization": f"Bearer {self.api_key}"
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Hashable, Iterator, Optional
+
+from app import metrics
+
+# Highest priority first
+PRIORITIES = ('interactive', 'standard', 'bulk')
+
+_priority: ContextVar[str] = ContextVar('schedule_priority', default='standard')
+_user: ContextVar[Optional[Hashable]] = ContextVar('schedule_user', default=None)
+
+@contextmanager
+def scheduling(priority: str, user: Optional[Hashable] = None) -> Iterator[None]:
+    """Provider calls made in this context (and contexts copied from it) run at `priority` for `user`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {priority}")
+    priority_token = _priority.set(priority)
+    user_token = _user.set(user)
+    try:
+        yield
+    finally:
+        _user.reset(user_token)
+        _priority.reset(priority_token)
+
+class ProviderScheduler:
+    """
+    Admission control for upstream provider calls, which share one quota.
+
+    At most `max_concurrency` calls run at once and the last
+    `interactive_reserved` slots only admit interactive calls, so bulk work
+    (audiobooks, warmup) can never take every slot from users waiting on a
+    preview. Waiting calls are admitted strictly by priority class and,
+    within a class, round-robin across users: a user with 500 queued
+    chapters gets one slot in turn like everybody else.
+    """
+
+    def __init__(self, app: Any = None) -> None:
+        self.max_concurrency = 8
+        self.interactive_reserved = 2
+        self._lock = threading.Lock()
+        self._active = 0
+        # Per class: user -> waiting events in arrival order; users are served round-robin
+        self._queues: Dict[str, 'OrderedDict[Optional[Hashable], Deque[threading.Event]]'] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        # Limits only: calls already admitted or queued are unaffected
+        self.max_concurrency = max(1, app.config.get('SCHEDULER_MAX_CONCURRENCY', 8))
+        self.interactive_reserved = min(self.max_concurrency - 1, app.config.get('SCHEDULER_INTERACTIVE_RESERVED', 2))
+
+    def _limit(self, priority: str) -> int:
+        return self.max_concurrency if priority == 'interactive' else self.max_concurrency - self.interactive_reserved
+
+    def _queued_ahead(self, priority: str) -> bool:
+        rank = PRIORITIES.index(priority)
+        return any(self._queues[p] for p in PRIORITIES[:rank + 1])
+
+    def _dispatch(self) -> None:
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and self._active < self._limit(priority):
+                user, waiters = next(iter(queue.items()))
+                event = waiters.popleft()
+                del queue[user]
+                if waiters:
+                    queue[user] = waiters  # to the back of the line
+                self._active += 1
+                event.set()
+            if queue:
+                # Lower classes have lower limits: nothing more can be admitted
+                return
+
+    def acquire(self, priority: Optional[str] = None, user: Optional[Hashable] = None) -> None:
+        priority = priority or _priority.get()
+        user = user if user is not None else _user.get()
+        with self._lock:
+            if not self._queued_ahead(priority) and self._active < self._limit(priority):
+                self._active += 1
+                metrics.SCHEDULER_WAIT_SECONDS.observe(0, priority=priority)
+                return
+            event = threading.Event()
+            self._queues[priority].setdefault(user, deque()).append(event)
+            metrics.SCHEDULER_QUEUED.inc(priority=priority)
+
+        start = time.perf_counter()
+        event.wait()
+        metrics.SCHEDULER_QUEUED.dec(priority=priority)
+        metrics.SCHEDULER_WAIT_SECONDS.observe(time.perf_counter() - start, priority=priority)
+
+    def release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None, user: Optional[Hashable] = None) -> Iterator[None]:
+        """Hold one provider call slot; priority and user default to the current scheduling() context."""
+        self.acquire(priority, user)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'active': self._active,
+                'queued': {p: sum(len(w) for w in self._queues[p].values()) for p in PRIORITIES},
+            }
+
+scheduler = ProviderScheduler()
@@ -0,0 +1,108 @@
+"""
+Sentence-level synthesis memo for incremental re-rendering.
+
+Each sentence is synthesized on its own and stored under the same
+cache_key a one-sentence request would use. Regenerating an edited
+document then only sends the sentences that changed to the provider, and
+the clip is spliced together from stored MP3 segments.
+"""
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import metrics
+from app.services.artifact_store import Artifact, ArtifactStore, cache_key
+from app.services.audiobook import concat_mp3
+from app.services.base import TTSProvider
+from app.services.hedging import generate_with_source
+
+# A sentence ends after terminal punctuation plus any closing quotes/brackets
+# (followed by whitespace, except for CJK punctuation) or at a line break
+_SENTENCE_END = re.compile(r'[.!?…]+["\'”’)\]」』]*(?=\s|$)|[。！？]+["\'”’)\]」』]*|\n')
+# Fragments shorter than this are joined to the next sentence, so "Dr." or
+# "1." don't become segments of their own
+MIN_SENTENCE_CHARS = 12
+
+@dataclass
+class RenderReport:
+    total_characters: int = 0
+    billed_characters: int = 0
+    segments: int = 0
+    reused_segments: int = 0
+    # Segments a winning hedge to the alternate provider produced
+    substituted_segments: int = 0
+
+    def to_headers(self) -> Dict[str, str]:
+        return {
+            'X-Total-Characters': str(self.total_characters),
+            'X-Billed-Characters': str(self.billed_characters),
+            'X-Segments': str(self.segments),
+            'X-Reused-Segments': str(self.reused_segments),
+        }
+
+def _collapse(text: str) -> str:
+    # Whitespace inside a sentence doesn't change the audio
+    return ' '.join(text.split())
+
+def split_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS) -> List[str]:
+    bounds: List[Tuple[int, int]] = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if len(_collapse(text[start:match.end()])) >= min_chars:
+            bounds.append((start, match.end()))
+            start = match.end()
+    if text[start:].strip():
+        if bounds and len(_collapse(text[start:])) < min_chars:
+            bounds[-1] = (bounds[-1][0], len(text))
+        else:
+            bounds.append((start, len(text)))
+    return [_collapse(text[s:e]) for s, e in bounds]
+
+def render_incremental(provider: TTSProvider, store: ArtifactStore, text: str, voice_id: str,
+                       params: Dict[str, Any], workers: int = 4, hedge: bool = True) -> Tuple[Artifact, RenderReport]:
+    """
+    Synthesize text as MP3 sentence by sentence, reusing stored segments.
+    Missing sentences are synthesized concurrently, up to `workers` at a time.
+    """
+    params = dict(params, format='mp3')
+    provider_name = type(provider).__name__
+    sentences = split_sentences(text)
+    if not sentences:
+        raise ValueError("No text to synthesize")
+
+    report = RenderReport(total_characters=sum(len(s) for s in sentences), segments=len(sentences))
+    segments: List[Optional[Artifact]] = []
+    missing: Dict[str, List[int]] = {}
+    for i, sentence in enumerate(sentences):
+        artifact = store.resolve(cache_key(provider_name, sentence, voice_id, params))
+        segments.append(artifact)
+        if artifact:
+            report.reused_segments += 1
+        else:
+            # Repeated sentences are only synthesized once
+            missing.setdefault(sentence, []).append(i)
+    metrics.SENTENCE_MEMO_SEGMENTS.inc(report.reused_segments, result='hit')
+    metrics.SENTENCE_MEMO_SEGMENTS.inc(report.segments - report.reused_segments, result='miss')
+
+    def synthesize(sentence: str) -> Tuple[Artifact, bool]:
+        audio, source, source_voice = generate_with_source(provider, sentence, voice_id, params, hedge)
+        artifact = store.put_bytes(audio, 'mp3')
+        # Keyed by whoever produced it, which is the alternate provider when its hedge won
+        store.link(cache_key(type(source).__name__, sentence, source_voice, params), artifact)
+        return artifact, source is not provider or source_voice != voice_id
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing)))) as pool:
+            # Each call gets a copy of the request context so its spans join the request trace
+            futures = {sentence: pool.submit(contextvars.copy_context().run, synthesize, sentence)
+                       for sentence in missing}
+            for sentence, future in futures.items():
+                artifact, substituted = future.result()
+                report.billed_characters += len(sentence)
+                report.substituted_segments += substituted
+                for i in missing[sentence]:
+                    segments[i] = artifact
+
+    return concat_mp3(store, [segment for segment in segments if segment is not None]), report
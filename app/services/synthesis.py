@@ -0,0 +1,56 @@
+from typing import Any, Dict, Tuple
+
+from app.services.artifact_store import Artifact, ArtifactStore, cache_key
+from app.services.base import TTSProvider
+from app.services.hedging import generate_with_source
+from app.services.sentence_memo import render_incremental
+from app.services.transcoder import transcoder
+
+def request_key(provider: TTSProvider, text: str, voice_id: str, params: Dict[str, Any],
+                incremental: bool = False) -> str:
+    """Artifact store key of a sync generation request."""
+    if incremental:
+        # Spliced sentence audio differs from a single synthesis of the whole text
+        params = dict(params, incremental=True)
+    return cache_key(type(provider).__name__, text, voice_id, params)
+
+def synthesize(provider: TTSProvider, store: ArtifactStore, text: str, voice_id: str, params: Dict[str, Any],
+               incremental: bool = False, memo_workers: int = 4, hedge: bool = True) -> Tuple[Artifact, Dict[str, str]]:
+    """
+    Synthesize a sync request into the artifact store and link it under its
+    request_key. Formats the provider can't produce are synthesized as MP3
+    and transcoded. Provider calls are hedged when HEDGE_ENABLED is set and
+    `hedge` is true. Returns the artifact and billing headers.
+    """
+    fmt = params.get('format') or 'mp3'
+    bitrate, sample_rate = params.get('bitrate'), params.get('sample_rate')
+
+    if incremental:
+        # Only sentences not synthesized before are sent to the provider
+        artifact, report = render_incremental(provider, store, text, voice_id, params, workers=memo_workers,
+                                              hedge=hedge)
+        billing = report.to_headers()
+        if fmt != 'mp3':
+            artifact = transcoder.transcode(store, artifact, fmt, bitrate=bitrate, sample_rate=sample_rate)
+        if report.substituted_segments:
+            # Part of it is in the alternate provider's voice: serve it, but don't replay it
+            return artifact, billing
+    else:
+        if provider.supports_format(fmt):
+            audio_data, source, source_voice = generate_with_source(provider, text, voice_id, params, hedge)
+            artifact = store.put_bytes(audio_data, fmt)
+        else:
+            # Synthesize mp3 and convert it ourselves
+            audio_data, source, source_voice = generate_with_source(provider, text, voice_id,
+                                                                    dict(params, format='mp3'), hedge)
+            artifact = transcoder.transcode(store, store.put_bytes(audio_data, 'mp3'), fmt,
+                                            bitrate=bitrate, sample_rate=sample_rate)
+        billing = {'X-Total-Characters': str(len(text)), 'X-Billed-Characters': str(len(text))}
+        # A hedge to the alternate provider may have won: the audio is that
+        # provider's voice, so it must not answer later requests for this one
+        if source is not provider or source_voice != voice_id:
+            store.link(request_key(source, text, source_voice, params), artifact)
+            return artifact, billing
+
+    store.link(request_key(provider, text, voice_id, params, incremental), artifact)
+    return artifact, billing
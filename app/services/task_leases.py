@@ -0,0 +1,161 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
+
+from sqlalchemy import or_, update
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Audiobook statuses a runner is still working on
+AUDIOBOOK_ACTIVE = ('processing', 'assembling')
+
+def default_node_id() -> str:
+    # The random suffix keeps a restarted process from inheriting its predecessor's leases
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class TaskLeases:
+    """
+    Ownership of async tasks (processing History rows) across app
+    instances sharing one database, so each task is polled by exactly
+    one node.
+
+    A node polls a task only while it holds the task's lease, and renews
+    it on every poll (the heartbeat). Claims are a single conditional
+    UPDATE, which the database serializes, so only one of several racing
+    nodes gets the row. Every TASK_RECOVERY_INTERVAL seconds each node
+    claims processing tasks whose lease expired, e.g. because their node
+    died, and resumes polling them. Unfinished audiobooks are leased and
+    recovered the same way.
+    """
+
+    def __init__(self, app: Any = None) -> None:
+        self.app = app
+        self.node_id: str = default_node_id()
+        self.ttl: float = 60.0
+        self.interval: float = 30.0
+        self.batch: int = 50
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        self.app = app
+        self.node_id = app.config.get('NODE_ID') or self.node_id
+        self.ttl = app.config.get('TASK_LEASE_TTL', 60.0)
+        self.interval = app.config.get('TASK_RECOVERY_INTERVAL', 30.0)
+        self.batch = app.config.get('TASK_RECOVERY_BATCH', 50)
+        # create_app also runs in background tasks; one recovery loop per process
+        if self.interval > 0:
+            self._ensure_thread()
+
+    def expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.ttl)
+
+    def claim(self, task_id: str) -> bool:
+        """Take or renew the lease of a processing task unless another node holds a live one."""
+        from app.models import History
+        return self._claim(History, History.task_id == str(task_id), History.status == 'processing')
+
+    def renew(self, task_id: str) -> bool:
+        """Extend this node's lease; False once another node has taken the task over."""
+        from app.models import History
+        return self._renew(History, History.task_id == str(task_id))
+
+    def claim_audiobook(self, audiobook_id: int) -> bool:
+        """claim() for an unfinished audiobook."""
+        from app.models import Audiobook
+        return self._claim(Audiobook, Audiobook.id == audiobook_id, Audiobook.status.in_(AUDIOBOOK_ACTIVE))
+
+    def renew_audiobook(self, audiobook_id: int) -> bool:
+        """renew() for an audiobook."""
+        from app.models import Audiobook
+        return self._renew(Audiobook, Audiobook.id == audiobook_id)
+
+    def _claim(self, model: Any, *conditions: Any) -> bool:
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(model)
+            .where(*conditions,
+                   or_(model.lease_owner.is_(None), model.lease_owner == self.node_id,
+                       model.lease_expires_at.is_(None), model.lease_expires_at < now))
+            .values(lease_owner=self.node_id, lease_expires_at=now + timedelta(seconds=self.ttl))
+            .execution_options(synchronize_session=False))
+        db.session.commit()
+        return result.rowcount > 0
+
+    def _renew(self, model: Any, *conditions: Any) -> bool:
+        result = db.session.execute(
+            update(model)
+            .where(*conditions, model.lease_owner == self.node_id)
+            .values(lease_expires_at=self.expiry())
+            .execution_options(synchronize_session=False))
+        db.session.commit()
+        return result.rowcount > 0
+
+    def orphans(self, limit: Optional[int] = None) -> List[Any]:
+        """Processing tasks without a live lease, oldest first."""
+        from app.models import History
+        return History.query \
+            .filter(History.status == 'processing',
+                    or_(History.lease_expires_at.is_(None), History.lease_expires_at < datetime.utcnow())) \
+            .order_by(History.created_at) \
+            .limit(limit or self.batch).all()
+
+    def orphan_audiobooks(self, limit: Optional[int] = None) -> List[Any]:
+        """Unfinished audiobooks without a live lease, oldest first."""
+        from app.models import Audiobook
+        return Audiobook.query \
+            .filter(Audiobook.status.in_(AUDIOBOOK_ACTIVE),
+                    or_(Audiobook.lease_expires_at.is_(None), Audiobook.lease_expires_at < datetime.utcnow())) \
+            .order_by(Audiobook.created_at) \
+            .limit(limit or self.batch).all()
+
+    def recover(self) -> List[str]:
+        """Claim orphaned tasks and resume polling them on this node; returns the claimed task ids."""
+        from app.tasks import resume_async_task
+        claimed = []
+        for history in self.orphans():
+            previous_owner = history.lease_owner
+            if self.claim(history.task_id):
+                logger.info(f"Took over task {history.task_id} from {previous_owner or 'no owner'}")
+                resume_async_task(history)
+                claimed.append(history.task_id)
+        return claimed
+
+    def recover_audiobooks(self) -> List[int]:
+        """Claim orphaned audiobooks and resume them on this node; returns the claimed audiobook ids."""
+        from app.tasks import resume_audiobook
+        claimed = []
+        for book in self.orphan_audiobooks():
+            previous_owner = book.lease_owner
+            if self.claim_audiobook(book.id):
+                logger.info(f"Took over audiobook {book.id} from {previous_owner or 'no owner'}")
+                resume_audiobook(book)
+                claimed.append(book.id)
+        return claimed
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='task-recovery', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self.app.app_context():
+                    self.recover()
+                    self.recover_audiobooks()
+            except Exception as e:
+                logger.error(f"Task recovery failed: {e}", exc_info=True)
+
+task_leases = TaskLeases()
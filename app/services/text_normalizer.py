@@ -0,0 +1,252 @@
+"""
+Clean-up of input text before it is sent to a provider.
+
+Providers bill per character and synthesis time grows with input length,
+so whitespace runs, markup leftovers and repeated page furniture from
+EPUB/text uploads cost money without producing any speech. Each pass is
+a precompiled regex substitution; passes always run in PASS_ORDER so that
+escaping happens last regardless of how they are configured.
+"""
+import html
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Match, Optional, Sequence
+
+from flask import current_app
+
+from app import metrics
+
+PASS_ORDER = ('markup', 'boilerplate', 'running_headers', 'whitespace', 'abbreviations', 'numbers', 'ssml')
+# Typed text is taken as meant: a line that is only "42" or "Page 3" is content,
+# so page furniture is only stripped from uploaded documents
+DEFAULT_PASSES = ('markup', 'whitespace')
+DEFAULT_DOCUMENT_PASSES = ('markup', 'boilerplate', 'running_headers', 'whitespace')
+
+# Lines that are only page furniture: page numbers and copyright notices
+DEFAULT_BOILERPLATE_PATTERNS = (
+    r'^[ \t]*(?:page[ \t]+)?[-–—]?[ \t]*\d{1,4}[ \t]*[-–—]?[ \t]*$',
+    r'^[ \t]*(?:copyright[ \t]*)?(?:©|\(c\))[ \t]*\d{4}\b.*$',
+    r'^[ \t]*all rights reserved\.?[ \t]*$',
+)
+
+DEFAULT_ABBREVIATIONS: Dict[str, str] = {
+    'Mr.': 'Mister',
+    'Mrs.': 'Missus',
+    'Ms.': 'Miz',
+    'Dr.': 'Doctor',
+    'Prof.': 'Professor',
+    'Jr.': 'Junior',
+    'Sr.': 'Senior',
+    'St.': 'Saint',
+    'vs.': 'versus',
+    'etc.': 'et cetera',
+    'e.g.': 'for example',
+    'i.e.': 'that is',
+    'approx.': 'approximately',
+}
+
+_TAG = re.compile(r'</?[A-Za-z][\w:-]*(?:\s[^<>]{0,200})?/?>')
+_ENTITY = re.compile(r'&(?:#\d{1,7}|#[xX][0-9a-fA-F]{1,6}|[a-zA-Z][a-zA-Z0-9]{1,31});')
+# Zero-width characters and soft hyphens are invisible but still billed
+_INVISIBLE = re.compile('[\u00ad\u200b\u200c\u200d\u2060\ufeff]')
+_NBSP = re.compile('[\u00a0\u2007\u202f]')
+
+_LINE_BREAK = re.compile(r'\r\n?')
+# Written so every match needs replacing: single spaces are never visited twice
+_SPACE_RUN = re.compile(r' [ \t\f\v]+|[\t\f\v][ \t\f\v]*')
+_LINE_EDGE_SPACE = re.compile(r' \n ?|\n ')
+_BLANK_LINES = re.compile(r'\n{3,}')
+# Spaces between CJK characters are layout artefacts, not word breaks
+_CJK_GAP = re.compile(r'([\u3000-\u30ff\u4e00-\u9fff\uff00-\uffef])[ \t]+(?=[\u3000-\u30ff\u4e00-\u9fff\uff00-\uffef])')
+
+_SENTENCE_END = re.compile(r'[.!?;:,。！？；…"\'”’)\]]$')
+RUNNING_HEADER_MAX_LENGTH = 80
+
+# ASCII numbers not glued to other word characters (so CJK "第3章" is left alone)
+# The leading lookahead lets the regex engine skip to candidate characters
+_NUMBER = re.compile(
+    r'(?=[$€£\d])(?<![\w.,])([$€£])?(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+)(?![\d,]))?(?:(%)|(st|nd|rd|th)\b)?(?![\w])'
+)
+_CURRENCIES = {'$': ('dollars', 'cents'), '€': ('euros', 'cents'), '£': ('pounds', 'pence')}
+_SSML_SPECIAL = re.compile(r'[&<>"\']')
+_SSML_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&apos;'}
+
+_ONES = ('zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten',
+         'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen')
+_TENS = ('', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety')
+_SCALES = ((10 ** 12, 'trillion'), (10 ** 9, 'billion'), (10 ** 6, 'million'), (1000, 'thousand'))
+_ORDINAL_IRREGULAR = {'one': 'first', 'two': 'second', 'three': 'third', 'five': 'fifth',
+                      'eight': 'eighth', 'nine': 'ninth', 'twelve': 'twelfth'}
+
+def number_to_words(n: int) -> str:
+    """Spell out a non-negative integer below 10**15 in English."""
+    if n < 20:
+        return _ONES[n]
+    if n < 100:
+        tens, ones = divmod(n, 10)
+        return _TENS[tens] + (f"-{_ONES[ones]}" if ones else '')
+    if n < 1000:
+        hundreds, rest = divmod(n, 100)
+        return f"{_ONES[hundreds]} hundred" + (f" {number_to_words(rest)}" if rest else '')
+    for scale, name in _SCALES:
+        if n >= scale:
+            head, rest = divmod(n, scale)
+            return f"{number_to_words(head)} {name}" + (f" {number_to_words(rest)}" if rest else '')
+    raise ValueError(n)
+
+def _ordinal(words: str) -> str:
+    head, sep, last = words.rpartition(' ')
+    prefix, dash, unit = last.rpartition('-')
+    if unit in _ORDINAL_IRREGULAR:
+        unit = _ORDINAL_IRREGULAR[unit]
+    elif unit.endswith('y'):
+        unit = unit[:-1] + 'ieth'
+    else:
+        unit += 'th'
+    return head + sep + prefix + dash + unit
+
+def _year_to_words(n: int) -> str:
+    century, rest = divmod(n, 100)
+    if rest == 0:
+        return f"{number_to_words(century)} hundred"
+    if 2000 <= n < 2010:
+        return number_to_words(n)
+    if rest < 10:
+        return f"{number_to_words(century)} oh {_ONES[rest]}"
+    return f"{number_to_words(century)} {number_to_words(rest)}"
+
+def _expand_number(match: Match[str]) -> str:
+    currency, digits, fraction, percent, suffix = match.groups()
+    n = int(digits.replace(',', ''))
+    if n >= 10 ** 15:
+        return match.group(0)
+
+    if currency:
+        unit, subunit = _CURRENCIES[currency]
+        words = f"{number_to_words(n)} {unit}"
+        if fraction is not None and len(fraction) == 2 and not percent and not suffix:
+            return words + (f" and {number_to_words(int(fraction))} {subunit}" if int(fraction) else '')
+        if fraction is None and not percent and not suffix:
+            return words
+        # Anything else ("$1.5%") is too odd to guess at
+        return match.group(0)
+    if suffix:
+        return _ordinal(number_to_words(n))
+    if ',' not in digits and fraction is None and not percent and len(digits) == 4 and 1100 <= n < 2100:
+        words = _year_to_words(n)
+    else:
+        words = number_to_words(n)
+    if fraction is not None:
+        words += ' point ' + ' '.join(_ONES[int(d)] for d in fraction)
+    if percent:
+        words += ' percent'
+    return words
+
+class TextNormalizer:
+    """
+    Configurable chain of text passes:
+
+    - markup: strip leftover HTML tags/entities and invisible characters
+    - boilerplate: drop lines matching the boilerplate patterns (page numbers etc.)
+    - running_headers: drop short unpunctuated lines repeated throughout a document
+    - whitespace: collapse space runs and blank lines, trim lines
+    - abbreviations: expand common abbreviations (English)
+    - numbers: spell out numbers, ordinals, years and percentages (English)
+    - ssml: escape characters that are special in SSML/XML
+    """
+
+    def __init__(self, passes: Iterable[str] = DEFAULT_PASSES,
+                 boilerplate_patterns: Sequence[str] = DEFAULT_BOILERPLATE_PATTERNS,
+                 abbreviations: Optional[Dict[str, str]] = None,
+                 running_header_min_repeats: int = 3) -> None:
+        passes = set(passes)
+        unknown = passes - set(PASS_ORDER)
+        if unknown:
+            raise ValueError(f"Unknown normalization passes: {', '.join(sorted(unknown))}")
+        self.passes = tuple(name for name in PASS_ORDER if name in passes)
+        self.running_header_min_repeats = running_header_min_repeats
+
+        self._boilerplate_pattern = None
+        if boilerplate_patterns:
+            combined = '|'.join(f'(?:{pattern})' for pattern in boilerplate_patterns)
+            self._boilerplate_pattern = re.compile(combined, re.I | re.M)
+
+        self._abbreviation_map = dict(DEFAULT_ABBREVIATIONS)
+        self._abbreviation_map.update(abbreviations or {})
+        # Longest first so "Mrs." wins over "Mr."
+        keys = sorted(self._abbreviation_map, key=len, reverse=True)
+        self._abbreviation_pattern = re.compile(
+            r'(?<![\w.])(?:' + '|'.join(re.escape(key) for key in keys) + r')(?!\w)'
+        )
+
+        self._steps: List[Callable[[str], str]] = [getattr(self, f'_{name}') for name in self.passes]
+
+    def __call__(self, text: str) -> str:
+        if not text:
+            return text
+        metrics.TEXT_NORMALIZATION_CHARS.inc(len(text), stage='input')
+        for step in self._steps:
+            text = step(text)
+        metrics.TEXT_NORMALIZATION_CHARS.inc(len(text), stage='output')
+        return text
+
+    def _markup(self, text: str) -> str:
+        if '<' in text:
+            text = _TAG.sub(' ', text)
+        if '&' in text:
+            text = _ENTITY.sub(lambda m: html.unescape(m.group(0)), text)
+        text = _INVISIBLE.sub('', text)
+        return _NBSP.sub(' ', text)
+
+    def _boilerplate(self, text: str) -> str:
+        if self._boilerplate_pattern is None:
+            return text
+        return self._boilerplate_pattern.sub('', text)
+
+    def _running_headers(self, text: str) -> str:
+        lines = text.split('\n')
+        counts = Counter(
+            stripped for stripped in (line.strip() for line in lines)
+            if stripped and len(stripped) <= RUNNING_HEADER_MAX_LENGTH
+        )
+        repeated = {
+            line for line, count in counts.items()
+            if count >= self.running_header_min_repeats and not _SENTENCE_END.search(line)
+        }
+        if not repeated:
+            return text
+        return '\n'.join(line for line in lines if line.strip() not in repeated)
+
+    def _whitespace(self, text: str) -> str:
+        if '\r' in text:
+            text = _LINE_BREAK.sub('\n', text)
+        text = _SPACE_RUN.sub(' ', text)
+        text = _LINE_EDGE_SPACE.sub('\n', text)
+        text = _CJK_GAP.sub(r'\1', text)
+        text = _BLANK_LINES.sub('\n\n', text)
+        return text.strip()
+
+    def _abbreviations(self, text: str) -> str:
+        return self._abbreviation_pattern.sub(lambda m: self._abbreviation_map[m.group(0)], text)
+
+    def _numbers(self, text: str) -> str:
+        return _NUMBER.sub(_expand_number, text)
+
+    def _ssml(self, text: str) -> str:
+        return _SSML_SPECIAL.sub(lambda m: _SSML_ESCAPES[m.group(0)], text)
+
+def get_text_normalizer(document: bool = False) -> TextNormalizer:
+    """Normalizer for the current app; `document` selects the passes for uploaded files."""
+    key = 'document' if document else 'text'
+    normalizers = current_app.extensions.setdefault('text_normalizers', {})
+    if key not in normalizers:
+        config = current_app.config
+        passes = config.get('TEXT_NORMALIZATION_DOCUMENT_PASSES' if document else 'TEXT_NORMALIZATION_PASSES',
+                            DEFAULT_DOCUMENT_PASSES if document else DEFAULT_PASSES)
+        normalizers[key] = TextNormalizer(
+            passes,
+            boilerplate_patterns=config.get('TEXT_BOILERPLATE_PATTERNS', DEFAULT_BOILERPLATE_PATTERNS),
+            abbreviations=config.get('TEXT_ABBREVIATIONS'),
+            running_header_min_repeats=config.get('TEXT_RUNNING_HEADER_MIN_REPEATS', 3),
+        )
+    return normalizers[key]
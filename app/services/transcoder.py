@@ -0,0 +1,126 @@
+import hashlib
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from app.services.artifact_store import Artifact, ArtifactStore
+
+# Output formats we can serve: mimetype plus the ffmpeg muxer/codec arguments
+AUDIO_FORMATS: Dict[str, Dict[str, Any]] = {
+    'mp3': {'mimetype': 'audio/mpeg', 'ffmpeg': ['-f', 'mp3', '-codec:a', 'libmp3lame']},
+    'wav': {'mimetype': 'audio/wav', 'ffmpeg': ['-f', 'wav']},
+    'flac': {'mimetype': 'audio/flac', 'ffmpeg': ['-f', 'flac']},
+    'pcm': {'mimetype': 'audio/L16', 'ffmpeg': ['-f', 's16le', '-codec:a', 'pcm_s16le']},
+    'opus': {'mimetype': 'audio/ogg', 'ffmpeg': ['-f', 'ogg', '-codec:a', 'libopus']},
+}
+
+class TranscodeError(Exception):
+    pass
+
+def variant_key(digest: str, fmt: str, bitrate: Optional[int] = None, sample_rate: Optional[int] = None) -> str:
+    raw = f"{digest}|{fmt}|{bitrate or ''}|{sample_rate or ''}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class Transcoder:
+    """
+    Bounded ffmpeg worker pool for formats a provider can't produce natively.
+    Variants are stored in the artifact store and linked from their source
+    digest, so each (source, format, bitrate) is only transcoded once.
+    """
+
+    def __init__(self, app: Any = None) -> None:
+        self.ffmpeg_path = 'ffmpeg'
+        self.max_workers = 2
+        self.max_pending = 16
+        self.timeout = 300
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._slots_size = self.max_pending
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        self.ffmpeg_path = app.config.get('FFMPEG_PATH', 'ffmpeg')
+        self.max_workers = app.config.get('TRANSCODE_WORKERS', 2)
+        self.max_pending = app.config.get('TRANSCODE_MAX_PENDING', 16)
+        self.timeout = app.config.get('TRANSCODE_TIMEOUT', 300)
+        # create_app also runs in background tasks; keep the semaphore in-flight transcodes hold
+        if self.max_pending != self._slots_size:
+            self._slots = threading.BoundedSemaphore(self.max_pending)
+            self._slots_size = self.max_pending
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='transcode')
+        return self._executor
+
+    def transcode(self, store: ArtifactStore, source: Artifact, fmt: str,
+                  bitrate: Optional[int] = None, sample_rate: Optional[int] = None) -> Artifact:
+        if fmt not in AUDIO_FORMATS:
+            raise TranscodeError(f"Unsupported format: {fmt}")
+        if fmt == source.ext and not bitrate and not sample_rate:
+            return source
+
+        key = variant_key(source.digest, fmt, bitrate, sample_rate)
+        cached = store.resolve(key)
+        if cached:
+            return cached
+
+        # Released into the semaphore it came from, even if init_app swaps it meanwhile
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise TranscodeError("Transcoding queue is full, try again later")
+        try:
+            procs: List[subprocess.Popen] = []
+            future = self._get_executor().submit(self._run, store, source, fmt, bitrate, sample_rate, procs)
+            try:
+                artifact = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                # The killed ffmpeg fails the run, which then discards its partial output
+                for proc in procs:
+                    proc.kill()
+                raise TranscodeError(f"Transcoding took longer than {self.timeout} s")
+        finally:
+            slots.release()
+
+        store.link(key, artifact)
+        return artifact
+
+    def _command(self, source: Artifact, fmt: str, bitrate: Optional[int], sample_rate: Optional[int]) -> List[str]:
+        cmd = [self.ffmpeg_path, '-nostdin', '-loglevel', 'error', '-i', source.path]
+        if sample_rate:
+            cmd += ['-ar', str(int(sample_rate))]
+        if bitrate and fmt in ('mp3', 'opus'):
+            cmd += ['-b:a', str(int(bitrate))]
+        cmd += AUDIO_FORMATS[fmt]['ffmpeg'] + ['pipe:1']
+        return cmd
+
+    def _run(self, store: ArtifactStore, source: Artifact, fmt: str, bitrate: Optional[int],
+             sample_rate: Optional[int], procs: List[subprocess.Popen]) -> Artifact:
+        # stderr goes to a file: while stdout is being read, a full stderr pipe would block ffmpeg
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                proc = subprocess.Popen(
+                    self._command(source, fmt, bitrate, sample_rate),
+                    stdout=subprocess.PIPE, stderr=stderr
+                )
+            except FileNotFoundError:
+                raise TranscodeError(f"ffmpeg not found at '{self.ffmpeg_path}'")
+            # Lets transcode() kill ffmpeg when it gives up waiting
+            procs.append(proc)
+
+            def check_exit() -> None:
+                if proc.wait() != 0:
+                    stderr.seek(0)
+                    raise TranscodeError(f"ffmpeg failed: {stderr.read().decode('utf-8', 'replace').strip()}")
+
+            # Stream ffmpeg's output into the store; a failed run never replaces or
+            # removes a stored file, which other requests may share by digest
+            with proc.stdout:
+                return store.put_stream(iter(lambda: proc.stdout.read(store.chunk_size), b''), fmt,
+                                        before_commit=check_exit)
+
+transcoder = Transcoder()
@@ -0,0 +1,147 @@
+"""
+Streaming upload pipeline. Uploads are copied chunk by chunk into a
+spooled temporary file (memory below UPLOAD_SPOOL_THRESHOLD, disk above),
+hashed, measured and character-counted on the way, and forwarded upstream
+as a streamed multipart body, so the memory an upload takes does not
+grow with its size.
+"""
+import codecs
+import hashlib
+import tempfile
+import uuid
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional
+
+class SpooledUpload:
+    """Bytes spooled to memory or disk, with their SHA-256, size and UTF-8 character count."""
+
+    def __init__(self, threshold: int = 1024 * 1024, chunk_size: int = 64 * 1024) -> None:
+        self.file = tempfile.SpooledTemporaryFile(max_size=threshold)
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.characters = 0
+        # False once the bytes turn out not to be UTF-8
+        self.is_text = True
+        # More bytes were offered than the spool() limit allowed
+        self.truncated = False
+        self._sha = hashlib.sha256()
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+
+    @property
+    def digest(self) -> str:
+        return self._sha.hexdigest()
+
+    def write(self, chunk: bytes) -> None:
+        self._sha.update(chunk)
+        self.file.write(chunk)
+        self.size += len(chunk)
+        self._count(chunk)
+
+    def _count(self, chunk: bytes, final: bool = False) -> None:
+        if not self.is_text:
+            return
+        try:
+            self.characters += len(self._decoder.decode(chunk, final))
+        except UnicodeDecodeError:
+            self.is_text = False
+
+    def finish(self) -> 'SpooledUpload':
+        self._count(b'', final=True)
+        self.file.seek(0)
+        return self
+
+    def text(self) -> Optional[str]:
+        """The whole upload decoded, or None if it isn't UTF-8."""
+        if not self.is_text:
+            return None
+        self.file.seek(0)
+        text = self.file.read().decode('utf-8-sig')
+        self.file.seek(0)
+        return text
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> 'SpooledUpload':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+class ProgressReader:
+    """Read-through wrapper that reports how far into `file` reading has got."""
+
+    def __init__(self, file: BinaryIO, callback: Callable[[int], None]) -> None:
+        self.file = file
+        self.callback = callback
+        self.position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.file.read(size)
+        self.position += len(chunk)
+        self.callback(self.position)
+        return chunk
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        self.position = self.file.seek(offset, whence)
+        return self.position
+
+def spool(stream: BinaryIO, limit: Optional[int] = None, threshold: int = 1024 * 1024,
+          chunk_size: int = 64 * 1024) -> SpooledUpload:
+    """Copy `stream` into a SpooledUpload, reading at most one chunk past `limit` bytes."""
+    upload = SpooledUpload(threshold, chunk_size)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        upload.write(chunk)
+        if limit is not None and upload.size > limit:
+            upload.truncated = True
+            break
+    return upload.finish()
+
+def spool_text(text: str, threshold: int = 1024 * 1024, chunk_size: int = 64 * 1024) -> SpooledUpload:
+    """`text` UTF-8 encoded into a SpooledUpload, without holding the whole encoding in memory."""
+    upload = SpooledUpload(threshold, chunk_size)
+    for start in range(0, len(text), chunk_size):
+        upload.write(text[start:start + chunk_size].encode('utf-8'))
+    return upload.finish()
+
+class MultipartBody:
+    """
+    multipart/form-data body with form fields and one file part read from
+    `stream` in chunks. It knows its length, so requests streams it with a
+    Content-Length header instead of buffering it like files= does.
+    """
+
+    def __init__(self, fields: Dict[str, str], name: str, filename: str, stream: BinaryIO, size: int,
+                 mimetype: str, chunk_size: int = 64 * 1024) -> None:
+        self.boundary = uuid.uuid4().hex
+        self.stream = stream
+        self.size = size
+        self.chunk_size = chunk_size
+        parts = [f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(key)}"\r\n\r\n{value}\r\n'
+                 for key, value in fields.items()]
+        parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"; '
+                     f'filename="{_quote(filename)}"\r\nContent-Type: {mimetype}\r\n\r\n')
+        self._head = ''.join(parts).encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self) -> int:
+        return len(self._head) + self.size + len(self._tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        self.stream.seek(0)
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield self._tail
+
+def _quote(value: str) -> str:
+    return value.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
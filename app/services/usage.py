@@ -0,0 +1,269 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, update
+from app.config import config_manager
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+PERIOD_FORMATS = {'month': '%Y-%m', 'day': '%Y-%m-%d'}
+
+class UsageTracker:
+    """
+    Per-user character and request accounting with quota checks.
+
+    Usage is counted in memory and written to UsageCounter rows every
+    QUOTA_FLUSH_INTERVAL seconds, one transaction per flush. Quota checks
+    only read the in-memory totals; a user's totals are loaded from the
+    database once per process and period. Every flush re-reads the totals
+    of the users active in this process, so usage recorded by other worker
+    processes sharing the database is seen within one interval.
+
+    Limits default to QUOTA_CHARACTERS / QUOTA_REQUESTS and can be set per
+    username under "quotas" in config.json; None means unlimited.
+    """
+
+    def __init__(self, app: Any = None) -> None:
+        self.app = app
+        self.interval: float = 5.0
+        self.period: str = 'month'
+        self.default_characters: Optional[int] = None
+        self.default_requests: Optional[int] = None
+        # (user_id, period) -> [characters, requests], including unflushed usage
+        self._totals: Dict[Tuple[int, str], List[int]] = {}
+        # (user_id, period, provider) -> [characters, requests] not yet in the database
+        self._pending: Dict[Tuple[int, str, str], List[int]] = {}
+        self._lock = threading.Lock()
+        # Held while database and pending counts are being reconciled
+        self._flush_lock = threading.Lock()
+        # Lets _load tell that a flush moved pending usage into the database while it read
+        self._flushing = False
+        self._flush_generation = 0
+        # (QUOTA_PERIOD, database) the totals were loaded for
+        self._source: Optional[Tuple[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        self.app = app
+        self.interval = app.config.get('QUOTA_FLUSH_INTERVAL', 5.0)
+        self.period = app.config.get('QUOTA_PERIOD', 'month')
+        if self.period not in PERIOD_FORMATS:
+            raise ValueError(f"Unknown QUOTA_PERIOD: {self.period}")
+        self.default_characters = app.config.get('QUOTA_CHARACTERS')
+        self.default_requests = app.config.get('QUOTA_REQUESTS')
+        # create_app also runs in background tasks; keep the totals unless they'd be counted differently
+        source = (self.period, app.config.get('SQLALCHEMY_DATABASE_URI'))
+        if source != self._source:
+            self._source = source
+            self.reset()
+
+    def reset(self) -> None:
+        """Forget the in-memory totals; they are only a cache of the database (plus pending usage)."""
+        with self._lock:
+            self._totals = {}
+
+    def current_period(self) -> str:
+        return datetime.utcnow().strftime(PERIOD_FORMATS[self.period])
+
+    def limits(self, username: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+        """(character limit, request limit) per period for a user."""
+        overrides = config_manager.get('quotas', {}).get(username, {}) if username else {}
+        return (overrides.get('characters', self.default_characters),
+                overrides.get('requests', self.default_requests))
+
+    def usage(self, user_id: Optional[int]) -> Tuple[int, int]:
+        """(characters, requests) used by a user in the current period."""
+        key = (user_id or 0, self.current_period())
+        totals = self._totals.get(key)
+        if totals is None:
+            totals = self._load(key)
+        return totals[0], totals[1]
+
+    def check(self, user_id: Optional[int], username: Optional[str], characters: int) -> Optional[str]:
+        """Why a request for `characters` more characters would exceed the user's quota, or None."""
+        character_limit, request_limit = self.limits(username)
+        if character_limit is None and request_limit is None:
+            return None
+        used_characters, used_requests = self.usage(user_id)
+        if character_limit is not None and used_characters + characters > character_limit:
+            return (f"Character quota exceeded: {used_characters} of {character_limit} used this {self.period}, "
+                    f"request needs {characters}")
+        if request_limit is not None and used_requests >= request_limit:
+            return f"Request quota exceeded: {used_requests} of {request_limit} used this {self.period}"
+        return None
+
+    def record(self, user_id: Optional[int], provider: str, characters: int, requests: int = 1) -> None:
+        """Count usage sent to `provider`."""
+        if not characters and not requests:
+            return
+        period = self.current_period()
+        with self._lock:
+            pending = self._pending.setdefault((user_id or 0, period, str(provider)), [0, 0])
+            pending[0] += characters
+            pending[1] += requests
+            totals = self._totals.get((user_id or 0, period))
+            if totals is not None:
+                totals[0] += characters
+                totals[1] += requests
+
+        if self.interval <= 0:
+            self.flush()
+            return
+        self._ensure_thread()
+
+    def _pending_totals(self, user_id: int, period: str) -> List[int]:
+        totals = [0, 0]
+        for (pending_user, pending_period, _provider), (characters, requests) in self._pending.items():
+            if pending_user == user_id and pending_period == period:
+                totals[0] += characters
+                totals[1] += requests
+        return totals
+
+    def _load(self, key: Tuple[int, str], attempts: int = 3) -> List[int]:
+        """
+        Load a user's totals without waiting for a running flush. A flush
+        that moves pending usage into the database during the read would
+        get it counted twice or not at all, so such reads are retried;
+        only if flushes keep overlapping does the load wait for one.
+        """
+        for _ in range(attempts):
+            with self._lock:
+                generation = None if self._flushing else self._flush_generation
+            row = self._stored_totals(*key)
+            with self._lock:
+                if generation is not None and not self._flushing and generation == self._flush_generation:
+                    return self._store_totals(key, row)
+        with self._flush_lock:
+            row = self._stored_totals(*key)
+            with self._lock:
+                return self._store_totals(key, row)
+
+    def _stored_totals(self, user_id: int, period: str) -> Tuple[int, int]:
+        from app.models import UsageCounter
+        row = db.session.query(func.coalesce(func.sum(UsageCounter.characters), 0),
+                               func.coalesce(func.sum(UsageCounter.requests), 0)) \
+            .filter(UsageCounter.user_id == user_id, UsageCounter.period == period).one()
+        return int(row[0]), int(row[1])
+
+    def _store_totals(self, key: Tuple[int, str], stored: Tuple[int, int]) -> List[int]:
+        # Called with self._lock held
+        pending = self._pending_totals(*key)
+        totals = self._totals[key] = [stored[0] + pending[0], stored[1] + pending[1]]
+        return totals
+
+    def flush(self) -> int:
+        """Write pending usage and refresh the totals of active users; returns the rows written."""
+        from app.models import UsageCounter
+        table = UsageCounter.__table__
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._flushing = True
+            try:
+                with self.app.app_context():
+                    now = datetime.utcnow()
+                    for (user_id, period, provider), (characters, requests) in pending.items():
+                        match = ((table.c.user_id == user_id) & (table.c.period == period)
+                                 & (table.c.provider == provider))
+                        result = db.session.execute(update(table).where(match).values(
+                            characters=table.c.characters + characters,
+                            requests=table.c.requests + requests,
+                            updated_at=now))
+                        if result.rowcount == 0:
+                            db.session.execute(insert(table).values(
+                                user_id=user_id, period=period, provider=provider,
+                                characters=characters, requests=requests, updated_at=now))
+                    db.session.commit()
+            except Exception as e:
+                logger.error(f"Failed to flush {len(pending)} usage counters, will retry: {e}")
+                with self._lock:
+                    for key, (characters, requests) in pending.items():
+                        merged = self._pending.setdefault(key, [0, 0])
+                        merged[0] += characters
+                        merged[1] += requests
+                    self._flushing = False
+                    self._flush_generation += 1
+                return 0
+            with self._lock:
+                self._flushing = False
+                self._flush_generation += 1
+
+            try:
+                with self.app.app_context():
+                    self._refresh()
+            except Exception as e:
+                logger.warning(f"Failed to refresh usage totals: {e}")
+        return len(pending)
+
+    def _refresh(self) -> None:
+        """Reload the totals of users seen this period, picking up other processes' usage."""
+        from app.models import UsageCounter
+        period = self.current_period()
+        with self._lock:
+            user_ids = [user_id for user_id, key_period in self._totals if key_period == period]
+        if not user_ids:
+            self._totals = {}
+            return
+
+        rows = db.session.query(UsageCounter.user_id, func.sum(UsageCounter.characters),
+                                func.sum(UsageCounter.requests)) \
+            .filter(UsageCounter.period == period, UsageCounter.user_id.in_(user_ids)) \
+            .group_by(UsageCounter.user_id).all()
+        stored = {user_id: (int(characters or 0), int(requests or 0)) for user_id, characters, requests in rows}
+        with self._lock:
+            # Drops totals of past periods as well
+            totals = {}
+            for user_id in user_ids:
+                pending = self._pending_totals(user_id, period)
+                characters, requests = stored.get(user_id, (0, 0))
+                totals[(user_id, period)] = [characters + pending[0], requests + pending[1]]
+            self._totals = totals
+
+    def report(self, period: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Usage per user for the admin view, with a per-provider breakdown."""
+        from app.models import UsageCounter, User
+        self.flush()
+        period = period or self.current_period()
+        rows = db.session.query(UsageCounter, User.username) \
+            .outerjoin(User, User.id == UsageCounter.user_id) \
+            .filter(UsageCounter.period == period).all()
+
+        users: Dict[int, Dict[str, Any]] = {}
+        for counter, username in rows:
+            entry = users.get(counter.user_id)
+            if entry is None:
+                character_limit, request_limit = self.limits(username)
+                entry = users[counter.user_id] = {
+                    'user_id': counter.user_id, 'username': username, 'period': period,
+                    'characters': 0, 'requests': 0, 'providers': {},
+                    'character_limit': character_limit, 'request_limit': request_limit,
+                }
+            entry['characters'] += counter.characters
+            entry['requests'] += counter.requests
+            entry['providers'][counter.provider] = {'characters': counter.characters, 'requests': counter.requests}
+        return sorted(users.values(), key=lambda entry: entry['characters'], reverse=True)
+
+    def _ensure_thread(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='usage-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+usage_tracker = UsageTracker()
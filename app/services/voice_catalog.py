@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from flask import current_app
+
+from app import metrics
+from app.services.base import TTSProvider
+from app.services.cache import layered_cache
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _Entry:
+    voices: List[Dict[str, str]]
+    etag: Optional[str]
+    fetched_at: float
+    expires_at: float
+    ids: FrozenSet[str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.ids = frozenset(voice['id'] for voice in self.voices)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'voices': self.voices, 'etag': self.etag, 'fetched_at': self.fetched_at, 'expires_at': self.expires_at}
+
+class VoiceCatalog:
+    """
+    Voices offered by each provider, fetched from its API and cached.
+
+    Entries are fresh for `ttl` seconds and then revalidated with the
+    listing's ETag, so an unchanged catalogue costs one 304. Voices
+    configured in config.json are listed first (admins name and order
+    them) and are always accepted. While one request revalidates, others
+    are served the stale entry; a failed fetch keeps serving the last
+    known voices and is retried after `retry_interval` seconds.
+
+    With a `shared` cache, entries are also published there, so one worker
+    process's fetch serves the others.
+    """
+
+    # Shared entries outlive the TTL so their ETag can still be revalidated
+    SHARED_TIMEOUT = 7 * 24 * 3600
+
+    def __init__(self, ttl: float = 3600, retry_interval: float = 60, shared: Any = None) -> None:
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.shared = shared
+        self._entries: Dict[Tuple[str, Optional[str]], _Entry] = {}
+        self._refresh_locks: Dict[Tuple[str, Optional[str]], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(provider: TTSProvider) -> Tuple[str, Optional[str]]:
+        return type(provider).__name__, getattr(provider, 'base_url', None)
+
+    @staticmethod
+    def _shared_key(key: Tuple[str, Optional[str]]) -> str:
+        return f"voices:{key[0]}:{key[1]}"
+
+    def voices(self, provider: TTSProvider) -> List[Dict[str, str]]:
+        return self._entry(provider).voices
+
+    def is_known(self, provider: TTSProvider, voice_id: str) -> bool:
+        """
+        Whether voice_id can be synthesized. Unknown ids trigger at most one
+        revalidation per retry interval, so voices created upstream since
+        the last fetch are picked up without waiting for the TTL.
+        """
+        entry = self._entry(provider)
+        if not entry.ids or voice_id in entry.ids:
+            # Nothing to validate against: leave the decision to the provider
+            return True
+        if time.time() - entry.fetched_at >= self.retry_interval:
+            entry = self._entry(provider, force=True)
+        return voice_id in entry.ids
+
+    def invalidate(self) -> None:
+        """Drop all entries, e.g. after the provider configuration changed."""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+        if self.shared is not None:
+            for key in keys:
+                self.shared.delete(self._shared_key(key))
+
+    def _entry(self, provider: TTSProvider, force: bool = False) -> _Entry:
+        key = self._key(provider)
+        entry = self._entries.get(key)
+        if entry and not force and entry.expires_at > time.time():
+            return entry
+        if self.shared is not None and not force:
+            # Another process may have refreshed it already
+            stored = self.shared.get(self._shared_key(key))
+            if stored:
+                entry = self._entries[key] = _Entry(**stored)
+                if entry.expires_at > time.time():
+                    return entry
+
+        with self._lock:
+            refresh_lock = self._refresh_locks.setdefault(key, threading.Lock())
+        # Someone else is already revalidating: the stale entry will do
+        if not refresh_lock.acquire(blocking=entry is None):
+            return entry
+        try:
+            current = self._entries.get(key)
+            if current is not entry and current is not None:
+                return current
+            entry = self._refresh(provider, entry)
+            self._entries[key] = entry
+            if self.shared is not None:
+                self.shared.set(self._shared_key(key), entry.to_dict(), timeout=self.SHARED_TIMEOUT)
+            return entry
+        finally:
+            refresh_lock.release()
+
+    def _refresh(self, provider: TTSProvider, entry: Optional[_Entry]) -> _Entry:
+        configured = list(provider.get_voices() or [])
+        now = time.time()
+        try:
+            result = provider.fetch_voices(entry.etag if entry else None)
+            fetched, etag = result if result is not None else (None, None)
+        except Exception as e:
+            logger.warning(f"Voice catalogue fetch for {provider.NAME} failed: {e}")
+            metrics.VOICE_CATALOG_FETCHES.inc(provider=provider.NAME, result='error')
+            voices = entry.voices if entry else configured
+            return _Entry(voices, entry.etag if entry else None, now, now + self.retry_interval)
+
+        if fetched is None and entry is not None:
+            metrics.VOICE_CATALOG_FETCHES.inc(provider=provider.NAME, result='not_modified')
+            return _Entry(entry.voices, entry.etag, now, now + self.ttl)
+
+        metrics.VOICE_CATALOG_FETCHES.inc(provider=provider.NAME, result='fetched')
+        configured_ids = {voice['id'] for voice in configured}
+        voices = configured + [voice for voice in fetched or [] if voice['id'] not in configured_ids]
+        return _Entry(voices, etag, now, now + self.ttl)
+
+def get_voice_catalog() -> VoiceCatalog:
+    """Voice catalogue of the current app."""
+    catalog = current_app.extensions.get('voice_catalog')
+    if catalog is None:
+        catalog = current_app.extensions.setdefault('voice_catalog', VoiceCatalog(
+            ttl=current_app.config.get('VOICE_CATALOG_TTL', 3600),
+            retry_interval=current_app.config.get('VOICE_CATALOG_RETRY_INTERVAL', 60),
+            shared=layered_cache,
+        ))
+    return catalog
@@ -1,13 +1,18 @@
 import requests
 import json
 import base64
+import binascii
 import uuid
 import time
-from .base import TTSProvider
+from urllib.parse import urlsplit
+from .base import TTSProvider, instrumented
 from .volcengine_lib import SignerV4, Credentials, Request
+from .audio_payload import read_body, split_string_field
+from app import tracing
 from typing import List, Dict, Any, Optional
 
 class VolcengineProvider(TTSProvider):
+    NAME = "volcengine"
     # Standard Speech API endpoint (Sync)
     SYNC_API_URL = "https://openspeech.bytedance.com/api/v1/tts"
     # Async API endpoint (Offline Speech Synthesis)
@@ -15,9 +20,15 @@ class VolcengineProvider(TTSProvider):
     SYNC_PATH = "/api/v1/tts"
     ASYNC_SUBMIT_PATH = "/api/v1/tts_async"
     ASYNC_QUERY_PATH = "/api/v1/tts_async"
+    # Our format names -> Volcengine 'encoding'
+    ENCODINGS = {'mp3': 'mp3', 'wav': 'wav', 'pcm': 'pcm', 'opus': 'ogg_opus'}
+    SUPPORTED_FORMATS = tuple(ENCODINGS)
+    ASYNC_SUPPORTED_FORMATS = tuple(ENCODINGS)
 
-    def __init__(self, app_id: str, access_token: str, secret_key: Optional[str] = None, cluster: str = "volcano_tts", voices: Optional[List[Dict[str, str]]] = None) -> None:
+    def __init__(self, app_id: str, access_token: str, secret_key: Optional[str] = None, cluster: str = "volcano_tts", voices: Optional[List[Dict[str, str]]] = None,
+                 base_url: Optional[str] = None) -> None:
         self.app_id = app_id
+        self.base_url = (base_url or f"https://{self.HOST}").rstrip('/')
         # In Volcengine terminology:
         # Access Token usually = AccessKey (AK)
         # Secret Key = SecretKey (SK)
@@ -31,33 +42,39 @@ class VolcengineProvider(TTSProvider):
     def get_voices(self) -> List[Dict[str, str]]:
         return self.voices
 
-    def _sign_and_send(self, method: str, path: str, payload: Dict[str, Any]) -> requests.Response:
+    def _sign_and_send(self, method: str, path: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
         if not self.secret_key:
              headers = {
                 "Authorization": f"Bearer; {self.access_key}",
                 "Content-Type": "application/json"
             }
-             url = f"https://{self.HOST}{path}"
-             response = requests.request(method, url, json=payload, headers=headers)
+             url = f"{self.base_url}{path}"
+             with tracing.span('upstream'):
+                 response = requests.request(method, url, json=payload, headers=headers, stream=stream)
              return response
 
         # Signing logic
         creds = Credentials(self.access_key, self.secret_key, self.service, self.region)
         req = Request()
         req.set_method(method)
-        req.set_host(self.HOST)
+        req.set_host(urlsplit(self.base_url).netloc)
         req.set_path(path)
         req.set_headers({'Content-Type': 'application/json'})
         req.set_body(json.dumps(payload))
 
-        SignerV4.sign(req, creds)
+        with tracing.span('sign'):
+            SignerV4.sign(req, creds)
 
-        url = f"https://{self.HOST}{path}"
-        response = requests.request(method, url, data=req.body, headers=req.headers)
+        url = f"{self.base_url}{path}"
+        with tracing.span('upstream'):
+            response = requests.request(method, url, data=req.body, headers=req.headers, stream=stream)
         return response
 
+    @instrumented
     def generate_sync(self, text: str, voice_id: str, **kwargs: Any) -> bytes:
-        req_id = str(uuid.uuid4())
+        # Correlates the upstream call with our request id in logs
+        req_id = tracing.child_request_id()
+        tracing.set_attribute('reqid', req_id)
 
         speed = int(float(kwargs.get('speed', 1.0)) * 10)
         vol = int(float(kwargs.get('vol', 1.0)) * 10)
@@ -65,7 +82,7 @@ class VolcengineProvider(TTSProvider):
         if float(kwargs.get('pitch', 0)) == 0:
             pitch = 10
 
-        payload = {
+        payload: Dict[str, Any] = {
             "app": {
                 "appid": self.app_id,
                 "token": "access_token",
@@ -76,7 +93,7 @@ class VolcengineProvider(TTSProvider):
             },
             "audio": {
                 "voice_type": voice_id,
-                "encoding": "mp3",
+                "encoding": self.ENCODINGS.get(kwargs.get('format') or 'mp3', 'mp3'),
                 "speed": speed,
                 "volume": vol,
                 "pitch": pitch
@@ -90,24 +107,35 @@ class VolcengineProvider(TTSProvider):
             }
         }
 
-        response = self._sign_and_send("POST", self.SYNC_PATH, payload)
+        if kwargs.get('sample_rate'):
+            payload["audio"]["rate"] = int(kwargs['sample_rate'])
+
+        response = self._sign_and_send("POST", self.SYNC_PATH, payload, stream=True)
         response.raise_for_status()
-        resp_json = response.json()
+        with tracing.span('read_body'):
+            body = read_body(response)
+        with tracing.span('parse_json'):
+            # The base64 audio stays a view into the body instead of becoming a str
+            audio_b64, resp_json = split_string_field(body, 'data')
 
         if resp_json.get("code") != 3000:
              raise Exception(f"Volcengine Error: {resp_json}")
 
-        if "data" not in resp_json:
-             raise Exception(f"Volcengine Error (No Data): {resp_json}")
+        if audio_b64 is None:
+            if "data" not in resp_json:
+                 raise Exception(f"Volcengine Error (No Data): {resp_json}")
+            audio_b64 = resp_json["data"]
 
-        audio_b64 = resp_json["data"]
-        return base64.b64decode(audio_b64)
+        with tracing.span('decode'):
+            return binascii.a2b_base64(audio_b64)
 
-    def upload_file(self, filename: str, file_stream: Any, mimetype: str) -> Dict[str, Any]:
+    @instrumented
+    def upload_file(self, filename: str, file_stream: Any, mimetype: str, size: Optional[int] = None) -> Dict[str, Any]:
         # Return content as virtual file ID
         content = file_stream.read().decode('utf-8')
         return {"file_id": "RAW_TEXT:" + base64.b64encode(content.encode('utf-8')).decode('utf-8')}
 
+    @instrumented
     def submit_async(self, text: Optional[str], text_file_id: Optional[str], voice_id: str, **kwargs: Any) -> Dict[str, Any]:
         if text_file_id and text_file_id.startswith("RAW_TEXT:"):
             text = base64.b64decode(text_file_id.split(":", 1)[1]).decode('utf-8')
@@ -126,13 +154,13 @@ class VolcengineProvider(TTSProvider):
             "user": {"uid": "user_default"},
             "audio": {
                 "voice_type": voice_id,
-                "encoding": "mp3",
+                "encoding": self.ENCODINGS.get(kwargs.get('format') or 'mp3', 'mp3'),
                 "speed": speed,
                 "volume": vol,
                 "pitch": pitch
             },
             "request": {
-                "reqid": str(uuid.uuid4()),
+                "reqid": tracing.child_request_id(),
                 "text": text,
                 "operation": "submit",
             }
@@ -148,6 +176,7 @@ class VolcengineProvider(TTSProvider):
         task_id = resp_json.get("data", {}).get("task_id")
         return {"task_id": task_id, "base_resp": {"status_code": 0}} # Normalize return if needed
 
+    @instrumented
     def query_async(self, task_id: str) -> Dict[str, Any]:
         payload = {
              "app": {"appid": self.app_id, "token": "access_token", "cluster": self.cluster},
@@ -188,6 +217,7 @@ class VolcengineProvider(TTSProvider):
 
         return result
 
+    @instrumented
     def retrieve_file(self, file_id: str) -> Dict[str, Any]:
         if file_id.startswith("http"):
             return {"file": {"download_url": file_id}}
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import config_manager
+from app.services.artifact_store import get_artifact_store
+from app.services.factory import get_provider
+from app.services.synthesis import request_key, synthesize
+from app.services.text_normalizer import get_text_normalizer
+from app.services.voice_catalog import get_voice_catalog
+from app.services.scheduler import scheduling
+
+logger = logging.getLogger(__name__)
+
+class WarmupJob:
+    """
+    Fills the audio cache with the high-frequency phrases listed per voice
+    under "warmup" in config.json, e.g.
+
+        "warmup": {"minimax": {"audiobook_male_1": ["Welcome back!", ...]}}
+
+    Phrases go through the same normalization and synthesize() path as
+    /api/generate with default params, so they are later served as cache
+    hits. Calls are paced at WARMUP_RATE per second; already cached phrases
+    are skipped without calling the provider. One job runs at a time.
+    """
+
+    def __init__(self, app: Any = None) -> None:
+        self.app = app
+        self.rate: float = 1.0
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._startup_done = False
+        self._progress: Dict[str, Any] = {'status': 'idle'}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        self.app = app
+        self.rate = app.config.get('WARMUP_RATE', 1.0)
+        # create_app also runs in background tasks; only the first app warms up
+        if app.config.get('WARMUP_ON_STARTUP') and not self._startup_done:
+            self._startup_done = True
+            self.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def progress(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._progress)
+
+    def phrases(self) -> List[Tuple[str, str]]:
+        """(voice_id, phrase) pairs for the active provider."""
+        config = config_manager.get_all()
+        by_voice = config.get('warmup', {}).get(config.get('active_provider', 'minimax'), {})
+        return [(voice_id, phrase) for voice_id, phrases in by_voice.items() for phrase in phrases if phrase]
+
+    def start(self) -> bool:
+        """Start a warmup run in the background; False if one is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self._cancel.clear()
+            self._progress = {'status': 'starting'}
+            self._thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+            self._thread.start()
+        return True
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def _update(self, **fields: Any) -> None:
+        with self._lock:
+            self._progress.update(fields)
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._progress[field] += 1
+            self._progress['done'] += 1
+
+    def _run(self) -> None:
+        with self.app.app_context(), scheduling('bulk', 'warmup'):
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"Warmup failed: {e}", exc_info=True)
+                self._update(status='failed', error=str(e), finished_at=datetime.utcnow().isoformat())
+
+    def run(self) -> None:
+        """Warm every configured phrase; needs an app context."""
+        items = self.phrases()
+        with self._lock:
+            self._progress = {'status': 'running', 'total': len(items), 'done': 0, 'cached': 0, 'synthesized': 0,
+                              'failed': 0, 'started_at': datetime.utcnow().isoformat(), 'finished_at': None}
+        provider = get_provider()
+        store = get_artifact_store()
+        normalize = get_text_normalizer()
+        catalog = get_voice_catalog()
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        next_call = time.monotonic()
+
+        for voice_id, phrase in items:
+            if self._cancel.is_set():
+                self._update(status='cancelled', finished_at=datetime.utcnow().isoformat())
+                return
+            if not catalog.is_known(provider, voice_id):
+                logger.warning(f"Warmup skipped phrase {phrase[:30]!r}: unknown voice {voice_id!r}")
+                self._count('failed')
+                continue
+            text = normalize(phrase)
+            if store.resolve(request_key(provider, text, voice_id, {})):
+                self._count('cached')
+                continue
+
+            # Pace provider calls only; cache hits above cost nothing
+            delay = next_call - time.monotonic()
+            if delay > 0 and self._cancel.wait(delay):
+                continue
+            next_call = time.monotonic() + interval
+            try:
+                # Warmup isn't latency sensitive; the hedge budget is left to user requests
+                synthesize(provider, store, text, voice_id, {}, hedge=False)
+                self._count('synthesized')
+            except Exception as e:
+                logger.warning(f"Warmup of {voice_id!r} phrase {phrase[:30]!r} failed: {e}")
+                self._count('failed')
+
+        self._update(status='done', finished_at=datetime.utcnow().isoformat())
+        logger.info(f"Warmup finished: {self.progress()}")
+
+warmup_job = WarmupJob()
@@ -0,0 +1,285 @@
+"""
+Completion callbacks for async tasks, delivered through an outbox table.
+Finishing a task only inserts a WebhookDelivery row; a background worker
+POSTs due rows with an HMAC signature and reschedules failures with
+exponential backoff, so callbacks survive restarts and slow receivers
+never hold up a poll loop.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Collection, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, urlunparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import update
+from app.extensions import db
+from app.metrics import WEBHOOK_DELIVERIES
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-TTS-Signature'
+# Prefix of callback_url_error() results worth retrying: DNS may be back later
+UNRESOLVED = 'Cannot resolve callback host'
+
+def resolve_callback_url(url: Any, allowed_hosts: Collection[str] = ()) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (error, address): why `url` may not be called back, or the address to
+    connect to. Hosts must resolve to public addresses only, so callbacks
+    can't be aimed at loopback, link-local (cloud metadata) or private
+    networks; `allowed_hosts` are exempt from that check. Delivering to the
+    returned address rather than resolving the host again keeps a DNS
+    rebind from slipping past the check.
+    """
+    if not isinstance(url, str) or len(url) > 512:
+        return 'callback_url must be an http(s) URL', None
+    parsed = urlparse(url)
+    try:
+        host, port = parsed.hostname, parsed.port
+    except ValueError:
+        host = port = None
+    if parsed.scheme not in ('http', 'https') or not host:
+        return 'callback_url must be an http(s) URL', None
+    try:
+        addresses = [ipaddress.ip_address(host)]
+    except ValueError:
+        try:
+            resolved = socket.getaddrinfo(host, port or (443 if parsed.scheme == 'https' else 80),
+                                          proto=socket.IPPROTO_TCP)
+        except (socket.gaierror, UnicodeError):
+            return f'{UNRESOLVED} {host}', None
+        addresses = [ipaddress.ip_address(sockaddr[0].split('%')[0]) for *_, sockaddr in resolved]
+    if host.lower() not in allowed_hosts:
+        for address in addresses:
+            if address.version == 6 and address.ipv4_mapped:
+                address = address.ipv4_mapped
+            if not address.is_global:
+                return f'Callback host {host} is not a public address', None
+    return None, str(addresses[0])
+
+def callback_url_error(url: Any, allowed_hosts: Collection[str] = ()) -> Optional[str]:
+    """Why `url` may not be called back, or None; see resolve_callback_url."""
+    return resolve_callback_url(url, allowed_hosts)[0]
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """
+    Sends every request to one IP address, keeping the URL's host name for
+    the Host header, SNI and certificate checks.
+    """
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        super().__init__()
+
+    def send(self, request: Any, **kwargs: Any) -> Any:
+        parsed = urlparse(request.url)
+        host = f"[{self.address}]" if ':' in self.address else self.address
+        request.headers['Host'] = parsed.netloc.rpartition('@')[2]
+        request.url = urlunparse(parsed._replace(netloc=f"{host}:{parsed.port}" if parsed.port else host))
+        if parsed.scheme == 'https':
+            self.poolmanager.connection_pool_kw.update(server_hostname=parsed.hostname,
+                                                       assert_hostname=parsed.hostname)
+        return super().send(request, **kwargs)
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """Signature header value: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">."""
+    digest = hmac.new(secret.encode('utf-8'), f"{timestamp}.".encode('ascii') + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+def verify(secret: str, header: str, body: bytes, tolerance: Optional[float] = 300,
+           now: Optional[float] = None) -> bool:
+    """Check a signature header as a receiver would, rejecting stale timestamps."""
+    try:
+        fields = dict(part.split('=', 1) for part in header.split(','))
+        timestamp = int(fields['t'])
+    except (KeyError, ValueError):
+        return False
+    if tolerance is not None and abs((now or time.time()) - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), header)
+
+class WebhookDispatcher:
+    """
+    Delivery worker for the webhook outbox. Every WEBHOOK_INTERVAL
+    seconds, and right after a task finishes, due deliveries are claimed
+    and POSTed. A claim pushes next_attempt_at past the request timeout
+    in one conditional UPDATE, so nodes sharing the database never send
+    the same attempt twice. Non-2xx answers and connection errors are
+    retried after WEBHOOK_BACKOFF_BASE * 2^(attempt - 1) seconds (capped
+    at WEBHOOK_BACKOFF_MAX, with jitter) until WEBHOOK_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, app: Any = None) -> None:
+        self.app = app
+        self.secret = ''
+        self.allowed_hosts: Collection[str] = frozenset()
+        self.public_url: Optional[str] = None
+        self.timeout = 10.0
+        self.max_attempts = 8
+        self.backoff_base = 5.0
+        self.backoff_max = 3600.0
+        self.interval = 5.0
+        self.batch = 50
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Any) -> None:
+        self.app = app
+        config = app.config
+        self.secret = config.get('WEBHOOK_SECRET') or config['SECRET_KEY']
+        self.allowed_hosts = frozenset(host.lower() for host in config.get('WEBHOOK_ALLOWED_HOSTS') or ())
+        self.public_url = config.get('WEBHOOK_PUBLIC_URL')
+        self.timeout = config.get('WEBHOOK_TIMEOUT', 10.0)
+        self.max_attempts = config.get('WEBHOOK_MAX_ATTEMPTS', 8)
+        self.backoff_base = config.get('WEBHOOK_BACKOFF_BASE', 5.0)
+        self.backoff_max = config.get('WEBHOOK_BACKOFF_MAX', 3600.0)
+        self.interval = config.get('WEBHOOK_INTERVAL', 5.0)
+        self.batch = config.get('WEBHOOK_BATCH', 50)
+        # create_app also runs in background tasks; one delivery loop per process
+        if self.interval > 0:
+            self._ensure_thread()
+
+    def check_url(self, url: Any) -> Optional[str]:
+        return callback_url_error(url, self.allowed_hosts)
+
+    def post(self, url: str, address: str, body: bytes, headers: Dict[str, str]) -> Any:
+        """POST to `url` over a connection to `address`, the one resolve_callback_url checked."""
+        with requests.Session() as session:
+            session.mount(f"{urlparse(url).scheme}://", PinnedAddressAdapter(address))
+            return session.post(url, data=body, headers=headers, timeout=self.timeout, allow_redirects=False)
+
+    def enqueue(self, history: Any, event: str, download_url: Optional[str] = None) -> Any:
+        """Add the completion callback of `history` to the outbox; needs an app context."""
+        from app.models import WebhookDelivery
+        if download_url and download_url.startswith('/') and self.public_url:
+            download_url = self.public_url.rstrip('/') + download_url
+        payload = {
+            'event': event,
+            'task_id': history.task_id,
+            'status': 'success' if event == 'task.succeeded' else 'failed',
+            'download_url': download_url,
+            'voice_name': history.voice_name,
+            'characters': history.characters,
+            'created_at': history.created_at.isoformat() if history.created_at else None,
+            'completed_at': datetime.utcnow().isoformat(),
+        }
+        delivery = WebhookDelivery(task_id=history.task_id, url=history.callback_url, event=event,
+                                   payload=json.dumps(payload), status='pending', attempts=0,
+                                   next_attempt_at=datetime.utcnow())
+        db.session.add(delivery)
+        db.session.commit()
+        self._wakeup.set()
+        return delivery
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        # Up to 10% jitter so receivers coming back up aren't hit by every retry at once
+        return delay * (1 + random.random() * 0.1)
+
+    def claim(self, delivery_id: int, now: datetime) -> bool:
+        from app.models import WebhookDelivery
+        result = db.session.execute(
+            update(WebhookDelivery)
+            .where(WebhookDelivery.id == delivery_id, WebhookDelivery.status == 'pending',
+                   WebhookDelivery.next_attempt_at <= now)
+            .values(next_attempt_at=now + timedelta(seconds=self.timeout * 2))
+            .execution_options(synchronize_session=False))
+        db.session.commit()
+        return result.rowcount > 0
+
+    def send(self, delivery: Any) -> None:
+        """One delivery attempt; records the outcome on `delivery`."""
+        body = delivery.payload.encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'minimaxtts-webhooks',
+            'X-TTS-Event': delivery.event,
+            'X-TTS-Delivery': str(delivery.id),
+            SIGNATURE_HEADER: sign(self.secret, int(time.time()), body),
+        }
+        delivery.attempts = (delivery.attempts or 0) + 1
+        # Checked on every attempt: DNS may point somewhere else by now
+        error, address = resolve_callback_url(delivery.url, self.allowed_hosts)
+        if error and not error.startswith(UNRESOLVED):
+            delivery.status = 'failed'
+            delivery.last_error = error[:256]
+            WEBHOOK_DELIVERIES.inc(result='refused')
+            logger.warning(f"Not delivering webhook {delivery.id} for task {delivery.task_id}: {error}")
+            return
+        if error is None:
+            try:
+                resp = self.post(delivery.url, address, body, headers)
+                error = None if 200 <= resp.status_code < 300 else f"HTTP {resp.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+
+        if error is None:
+            delivery.status = 'delivered'
+            delivery.delivered_at = datetime.utcnow()
+            delivery.last_error = None
+            WEBHOOK_DELIVERIES.inc(result='delivered')
+            return
+        delivery.last_error = error[:256]
+        if delivery.attempts >= self.max_attempts:
+            delivery.status = 'failed'
+            WEBHOOK_DELIVERIES.inc(result='failed')
+            logger.warning(f"Giving up on webhook {delivery.id} for task {delivery.task_id}: {error}")
+        else:
+            delivery.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.backoff(delivery.attempts))
+            WEBHOOK_DELIVERIES.inc(result='retry')
+            logger.info(f"Webhook {delivery.id} attempt {delivery.attempts} failed, retrying: {error}")
+
+    def deliver_due(self) -> List[int]:
+        """Send every due delivery this node manages to claim; returns their ids. Needs an app context."""
+        from app.models import WebhookDelivery
+        now = datetime.utcnow()
+        due = WebhookDelivery.query \
+            .filter(WebhookDelivery.status == 'pending', WebhookDelivery.next_attempt_at <= now) \
+            .order_by(WebhookDelivery.next_attempt_at) \
+            .limit(self.batch).all()
+        sent = []
+        for delivery in due:
+            if not self.claim(delivery.id, now):
+                continue
+            self.send(delivery)
+            db.session.commit()
+            sent.append(delivery.id)
+        return sent
+
+    def status(self, task_id: str, user_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Deliveries of `user_id`'s task, or None if the task isn't theirs."""
+        from app.models import History, WebhookDelivery
+        if History.query.filter_by(task_id=str(task_id), user_id=user_id).first() is None:
+            return None
+        return [d.to_dict() for d in WebhookDelivery.query.filter_by(task_id=str(task_id))
+                .order_by(WebhookDelivery.id)]
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='webhook-delivery', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.deliver_due()
+            except Exception as e:
+                logger.error(f"Webhook delivery failed: {e}", exc_info=True)
+
+webhooks = WebhookDispatcher()
@@ -1,16 +1,113 @@
-from app import create_app, db, socketio, executor
-from app.services.minimax import minimax_client
-from app.models import History
+import requests
+from app import create_app
+from app.extensions import db, socketio, executor
+from app.services.factory import get_provider
+from app.services.artifact_store import get_artifact_store
+from app.services.history_writer import history_writer
+from app.models import History, Audiobook, AudiobookChapter
+from app.services.artifact_store import cache_key
+from app.services.audiobook import assemble_mp3
+from app.services.scheduler import scheduling
+from app.services.usage import usage_tracker
+from app.services.cache import layered_cache
+from app.services.task_leases import task_leases
+from app.services.eta import estimator
+from app.services.webhooks import webhooks
+from app.services.text_normalizer import get_text_normalizer
+from app.services.uploads import ProgressReader, spool_text
+from app.extractors import registry as extractors
+from app.metrics import ASYNC_TASKS_IN_FLIGHT, POLL_LOOP_LAG, INGESTION_JOBS, EXTRACTION_SECONDS
+from app import tracing
 from datetime import datetime
+import json
+import threading
 import time
+import logging
+import uuid
 from flask import current_app
 
-def process_async_task(task_id, user_id, voice_name, text_preview):
+# Separate logger so its per-poll debug output can be sampled
+poll_logger = logging.getLogger('app.tasks.poll')
+
+FAILED_STATUSES = ('Failed', 'Expired', 'Unknown')
+
+# Tasks polled by this process, so a recovered task never gets a second poller here
+_polling_tasks = set()
+_polling_lock = threading.Lock()
+
+def _task_status(resp):
+    # MiniMax reports status at the top level, normalized providers under 'data'
+    return resp.get('status') or resp.get('data', {}).get('status')
+
+def _task_progress(resp):
+    """Completed fraction (0-1) if the provider reports one, as a fraction or a percentage."""
+    progress = resp.get('progress', resp.get('data', {}).get('progress'))
+    if not isinstance(progress, (int, float)) or progress <= 0:
+        return None
+    return progress / 100 if progress > 1 else progress
+
+def _task_completed_at(resp):
+    """Completion time reported by the provider (Unix seconds or milliseconds), as naive UTC, if any."""
+    data = resp.get('data') or {}
+    for key in ('completed_at', 'finished_at'):
+        value = resp.get(key, data.get(key))
+        if isinstance(value, (int, float)) and value > 0:
+            return datetime.utcfromtimestamp(value / 1000 if value > 1e11 else value)
+    return None
+
+def file_characters(provider_name, file_id):
+    """Length of the text behind an uploaded file_id, as recorded by remember_file_characters."""
+    return layered_cache.get(f"file_characters:{provider_name}:{file_id}")
+
+def remember_file_characters(provider_name, file_id, characters):
+    """Keep the length of an uploaded text so tasks synthesizing it get an ETA."""
+    if file_id:
+        layered_cache.set(f"file_characters:{provider_name}:{file_id}", characters,
+                          current_app.config.get('UPLOAD_CHARACTERS_TTL', 86400))
+
+def query_task(provider, task_id):
     """
-    Background task to poll MiniMax API for task status.
+    provider.query_async through the shared cache, so browsers polling
+    /api/query and the background poll loop share one upstream query.
+    Final statuses are kept longer than in-progress ones.
     """
+    config = current_app.config
+
+    def timeout(resp):
+        status = _task_status(resp)
+        if status == 'Success' or status in FAILED_STATUSES:
+            return config.get('QUERY_STATUS_FINAL_CACHE_TIMEOUT', 300)
+        return config.get('QUERY_STATUS_CACHE_TIMEOUT', 2.0)
+
+    return layered_cache.get_or_set(f"query:{provider.NAME}:{task_id}",
+                                    lambda: provider.query_async(task_id), timeout)
+
+def _download_url(provider, resp):
+    download_url = resp.get('data', {}).get('download_url')
+    if not download_url:
+        file_resp = provider.retrieve_file(resp.get('file_id'))
+        download_url = file_resp.get('file', {}).get('download_url')
+    return download_url
+
+def process_async_task(task_id, user_id, voice_name, text_preview, trace_id=None):
+    """
+    Background task to poll the provider for task status and store the result locally.
+    trace_id ties the poll spans back to the request that submitted the task.
+    The task is only polled while this node holds its lease (see TaskLeases).
+    After the first poll, polls are timed around the task's expected
+    completion (see CompletionEstimator), which is pushed to clients.
+    """
+    with _polling_lock:
+        if str(task_id) in _polling_tasks:
+            return
+        _polling_tasks.add(str(task_id))
+
     app = create_app()
-    with app.app_context():
+    ASYNC_TASKS_IN_FLIGHT.inc()
+    with app.app_context(), scheduling('standard', user_id), \
+            tracing.traced('async_task', trace_id, app.config['TRACE_LOG_THRESHOLD_MS']) as trace:
+        trace.set_attribute('task_id', str(task_id))
+        history = None
         try:
             current_app.logger.info(f"Starting poll for task {task_id}")
 
@@ -22,63 +119,124 @@ def process_async_task(task_id, user_id, voice_name, text_preview):
                 # Or if the DB path is different (which we fixed by using abspath in config).
                 current_app.logger.warning(f"History not found for task {task_id}, creating new record in background thread.")
                 history = History(user_id=user_id, task_id=str(task_id), status='processing',
-                                  voice_name=voice_name, text_preview=text_preview)
+                                  voice_name=voice_name, text_preview=text_preview,
+                                  lease_owner=task_leases.node_id, lease_expires_at=task_leases.expiry())
                 db.session.add(history)
                 db.session.commit()
 
+            if not task_leases.claim(task_id):
+                current_app.logger.info(f"Task {task_id} is polled by another node")
+                return
+
+            provider = get_provider()
+            next_poll = None
+            last_poll = None
+            last_eta = history.eta
+
             while True:
-                resp = minimax_client.query_task(task_id)
-                status = resp.get('status')
+                if next_poll is not None:
+                    POLL_LOOP_LAG.observe(max(0.0, time.monotonic() - next_poll))
+                    # Heartbeat; stop if the lease expired and another node took over
+                    if not task_leases.renew(task_id):
+                        current_app.logger.warning(f"Lost the lease of task {task_id}, another node polls it now")
+                        return
+                resp = query_task(provider, task_id)
+                status = _task_status(resp)
 
-                current_app.logger.debug(f"Task {task_id} status: {status}")
+                poll_logger.debug("Task %s status: %s", task_id, status)
 
                 if status == 'Success':
-                    file_id = resp.get('file_id')
-                    file_resp = minimax_client.retrieve_file(file_id)
-                    download_url = file_resp.get('file', {}).get('download_url')
+                    # Without a provider timestamp the task finished between the last two polls; the
+                    # midpoint keeps learned durations from being biased towards the poll schedule
+                    seen_at = datetime.utcnow()
+                    completed_at = _task_completed_at(resp)
+                    if completed_at is None or not (history.created_at or completed_at) <= completed_at <= seen_at:
+                        completed_at = last_poll + (seen_at - last_poll) / 2 if last_poll else seen_at
+                    download_url = _download_url(provider, resp)
 
-                    history.status = 'success'
-                    history.file_path = download_url
-                    db.session.commit()
+                    try:
+                        # Provider URLs expire, keep our own copy
+                        with tracing.span('artifact.download'):
+                            artifact = get_artifact_store().download(download_url, ext=history.audio_format or 'mp3')
+                        history_writer.enqueue(task_id, status='success', file_path=artifact.path,
+                                               file_size=artifact.size, content_hash=artifact.digest,
+                                               completed_at=completed_at)
+                        download_url = f"/api/audio/{artifact.digest}"
+                    except (requests.RequestException, OSError) as e:
+                        current_app.logger.warning(f"Could not store audio for task {task_id}, keeping provider URL: {e}")
+                        history_writer.enqueue(task_id, status='success', file_path=download_url,
+                                               completed_at=completed_at)
 
                     socketio.emit('task_update', {
                         'task_id': task_id,
                         'status': 'success',
                         'download_url': download_url
                     }, namespace='/')
+                    if history.callback_url:
+                        webhooks.enqueue(history, 'task.succeeded', download_url)
                     current_app.logger.info(f"Task {task_id} success.")
                     break
 
-                elif status in ['Failed', 'Expired', 'Unknown']:
-                    history.status = 'failed'
-                    db.session.commit()
+                elif status in FAILED_STATUSES:
+                    history_writer.enqueue(task_id, status='failed')
                     socketio.emit('task_update', {'task_id': task_id, 'status': 'failed'}, namespace='/')
+                    if history.callback_url:
+                        webhooks.enqueue(history, 'task.failed')
                     current_app.logger.warning(f"Task {task_id} failed with status {status}")
                     break
 
-                time.sleep(10)
+                now = last_poll = datetime.utcnow()
+                eta = estimator.eta(history, now, _task_progress(resp))
+                if eta != last_eta:
+                    history_writer.enqueue(task_id, eta=eta)
+                    last_eta = eta
+                socketio.emit('task_update', {
+                    'task_id': task_id,
+                    'status': 'processing',
+                    'eta': eta.isoformat(),
+                    'eta_seconds': max(0, round((eta - now).total_seconds()))
+                }, namespace='/')
+
+                delay = estimator.next_delay(eta, now)
+                next_poll = time.monotonic() + delay
+                time.sleep(delay)
 
         except Exception as e:
             current_app.logger.error(f"Error in background task {task_id}: {e}", exc_info=True)
-            # Try to recover session to log error state if possible
-            try:
-                if history:
-                    history.status = 'error'
-                    db.session.commit()
-            except:
-                pass
+            history_writer.enqueue(task_id, status='error')
+            if history is not None:
+                try:
+                    db.session.rollback()
+                    if history.callback_url:
+                        webhooks.enqueue(history, 'task.failed')
+                except Exception as hook_error:
+                    current_app.logger.error(f"Could not queue the failure callback of task {task_id}: {hook_error}")
+        finally:
+            ASYNC_TASKS_IN_FLIGHT.dec()
+            with _polling_lock:
+                _polling_tasks.discard(str(task_id))
 
-def submit_async_generation(text, text_file_id, voice_id, voice_name, user_id, **kwargs):
+def resume_async_task(history):
+    """Poll a task claimed from another node (see TaskLeases.recover) on this one."""
+    executor.submit(process_async_task, history.task_id, history.user_id, history.voice_name,
+                    history.text_preview)
+
+def submit_async_generation(provider, text, text_file_id, voice_id, voice_name, user_id, callback_url=None,
+                            **kwargs):
     """
-    Submits the task to MiniMax and starts the polling background task.
+    Submits the task to the provider and starts the polling background task.
+    Returns the provider's response with the task's expected completion
+    added as eta (ISO 8601, UTC) and eta_seconds. callback_url is POSTed
+    the result when the task finishes (see WebhookDispatcher).
     """
     try:
         current_app.logger.info(f"Submitting async task for user {user_id}")
-        resp = minimax_client.generate_async(text=text, text_file_id=text_file_id, voice_id=voice_id, **kwargs)
+        resp = provider.submit_async(text, text_file_id, voice_id, **kwargs)
         task_id = resp.get('task_id')
 
         if not task_id:
             raise ValueError("No task_id returned from API")
+        usage_tracker.record(user_id, provider.NAME, len(text or ''))
 
         preview = (text[:30] + '...') if text else f"File ID: {text_file_id}"
         history = History(
@@ -86,15 +244,305 @@ def submit_async_generation(text, text_file_id, voice_id, voice_name, user_id, *
             task_id=str(task_id),
             status='processing',
             voice_name=voice_name,
-            text_preview=preview
+            text_preview=preview,
+            provider=provider.NAME,
+            characters=len(text) if text else file_characters(provider.NAME, text_file_id),
+            created_at=datetime.utcnow(),
+            callback_url=callback_url,
+            audio_format=kwargs.get('format') or 'mp3',
+            lease_owner=task_leases.node_id,
+            lease_expires_at=task_leases.expiry()
         )
+        history.eta = estimator.eta(history, history.created_at)
         db.session.add(history)
         db.session.commit()
 
         # Pass necessary data to background task so it can recreate the record if needed (redundancy)
-        executor.submit(process_async_task, task_id, user_id, voice_name, preview)
+        executor.submit(process_async_task, task_id, user_id, voice_name, preview, tracing.current_trace_id())
 
-        return task_id
+        return dict(resp, eta=history.eta.isoformat(),
+                    eta_seconds=round((history.eta - history.created_at).total_seconds()))
     except Exception as e:
         current_app.logger.error(f"Failed to submit async task: {e}", exc_info=True)
         raise e
+
+# Audiobooks being worked on in this process, so a retry never starts a second runner
+_running_audiobooks = set()
+_running_lock = threading.Lock()
+
+def _emit_audiobook_progress(book):
+    chapters = book.chapters
+    socketio.emit('audiobook_update', {
+        'audiobook_id': book.id,
+        'status': book.status,
+        'completed': sum(1 for c in chapters if c.status == 'success'),
+        'failed': sum(1 for c in chapters if c.status == 'failed'),
+        'total': len(chapters)
+    }, namespace='/')
+
+def _chapter_failed(chapter, error, max_attempts):
+    """Record a failed attempt; the chapter goes back to pending until it runs out of attempts."""
+    chapter.error = str(error)[:256]
+    chapter.task_id = None
+    chapter.status = 'pending' if chapter.attempts < max_attempts else 'failed'
+    current_app.logger.warning(f"Chapter {chapter.position} of audiobook {chapter.audiobook_id} "
+                               f"failed (attempt {chapter.attempts}): {error}")
+
+def _submit_chapter(provider, store, book, chapter, params, max_attempts):
+    # Chapters synthesized before (e.g. an identical re-upload) are reused
+    artifact = store.resolve(cache_key(type(provider).__name__, chapter.text, book.voice_id, params))
+    if artifact:
+        chapter.status = 'success'
+        chapter.content_hash = artifact.digest
+        return
+
+    chapter.attempts = (chapter.attempts or 0) + 1
+    try:
+        resp = provider.submit_async(chapter.text, None, book.voice_id, **params)
+        task_id = resp.get('task_id')
+        if not task_id:
+            raise ValueError("No task_id returned from API")
+    except Exception as e:
+        _chapter_failed(chapter, e, max_attempts)
+        return
+    usage_tracker.record(book.user_id, provider.NAME, len(chapter.text))
+    chapter.task_id = str(task_id)
+    chapter.status = 'processing'
+    chapter.error = None
+
+def _poll_chapter(provider, store, book, chapter, params, max_attempts):
+    try:
+        resp = provider.query_async(chapter.task_id)
+        status = _task_status(resp)
+        poll_logger.debug("Audiobook %s chapter %s status: %s", book.id, chapter.position, status)
+        if status == 'Success':
+            with tracing.span('artifact.download'):
+                artifact = store.download(_download_url(provider, resp))
+            store.link(cache_key(type(provider).__name__, chapter.text, book.voice_id, params), artifact)
+            chapter.status = 'success'
+            chapter.content_hash = artifact.digest
+        elif status in FAILED_STATUSES:
+            _chapter_failed(chapter, f"Provider status {status}", max_attempts)
+    except Exception as e:
+        _chapter_failed(chapter, e, max_attempts)
+
+def _assemble_audiobook(store, book):
+    chapters = []
+    for chapter in book.chapters:
+        artifact = store.get(chapter.content_hash)
+        if artifact is None:
+            raise FileNotFoundError(f"Audio for chapter {chapter.position} is missing")
+        chapters.append((chapter.title, artifact))
+
+    with tracing.span('audiobook.assemble'):
+        artifact, markers = assemble_mp3(store, book.title, chapters)
+    for chapter, marker in zip(book.chapters, markers):
+        chapter.duration_ms = marker.end_ms - marker.start_ms
+    book.file_path = artifact.path
+    book.file_size = artifact.size
+    book.content_hash = artifact.digest
+
+def run_audiobook(audiobook_id):
+    """
+    Drive every chapter of an audiobook to completion: keep at most
+    AUDIOBOOK_MAX_PARALLEL_CHAPTERS provider tasks in flight, retry failed
+    chapters up to AUDIOBOOK_CHAPTER_MAX_ATTEMPTS times, then assemble the
+    chaptered MP3. State lives in the database, so a later run resumes
+    where this one stopped (in-flight tasks are polled, not resubmitted).
+    Runs only while this node holds the audiobook's lease; if the node
+    dies, TaskLeases.recover_audiobooks starts that later run elsewhere.
+    """
+    config = current_app.config
+    max_parallel = config.get('AUDIOBOOK_MAX_PARALLEL_CHAPTERS', 3)
+    max_attempts = config.get('AUDIOBOOK_CHAPTER_MAX_ATTEMPTS', 3)
+    interval = config.get('AUDIOBOOK_POLL_INTERVAL', 10)
+
+    book = db.session.get(Audiobook, audiobook_id)
+    if book is None:
+        current_app.logger.warning(f"Audiobook {audiobook_id} not found")
+        return
+    if not task_leases.claim_audiobook(audiobook_id):
+        current_app.logger.info(f"Audiobook {audiobook_id} is run by another node")
+        return
+    params = json.loads(book.params or '{}')
+    provider = get_provider()
+    store = get_artifact_store()
+
+    book.status = 'processing'
+    db.session.commit()
+
+    first = True
+    while True:
+        # Heartbeat; stop if the lease expired and another node took over
+        if not first and not task_leases.renew_audiobook(audiobook_id):
+            current_app.logger.warning(f"Lost the lease of audiobook {audiobook_id}, another node runs it now")
+            return
+        first = False
+        chapters = book.chapters
+        in_flight = [c for c in chapters if c.status == 'processing']
+        free_slots = max_parallel - len(in_flight)
+        for chapter in chapters:
+            if free_slots <= 0:
+                break
+            if chapter.status == 'pending':
+                _submit_chapter(provider, store, book, chapter, params, max_attempts)
+                if chapter.status == 'processing':
+                    free_slots -= 1
+        for chapter in in_flight:
+            _poll_chapter(provider, store, book, chapter, params, max_attempts)
+        db.session.commit()
+        _emit_audiobook_progress(book)
+
+        if all(c.status in ('success', 'failed') for c in book.chapters):
+            break
+        time.sleep(interval)
+
+    if any(c.status == 'failed' for c in book.chapters):
+        book.status = 'failed'
+    else:
+        book.status = 'assembling'
+        db.session.commit()
+        _assemble_audiobook(store, book)
+        book.status = 'success'
+    db.session.commit()
+    _emit_audiobook_progress(book)
+    current_app.logger.info(f"Audiobook {audiobook_id} finished with status {book.status}")
+
+def process_audiobook(audiobook_id, trace_id=None):
+    """Background entry point for run_audiobook; at most one runner per audiobook per process."""
+    with _running_lock:
+        if audiobook_id in _running_audiobooks:
+            return
+        _running_audiobooks.add(audiobook_id)
+
+    app = create_app()
+    try:
+        with app.app_context(), tracing.traced('audiobook', trace_id, app.config['TRACE_LOG_THRESHOLD_MS']) as trace:
+            trace.set_attribute('audiobook_id', str(audiobook_id))
+            book = db.session.get(Audiobook, audiobook_id)
+            try:
+                # Chapters are queued fairly against other users' books and never take interactive slots
+                with scheduling('bulk', book.user_id if book else None):
+                    run_audiobook(audiobook_id)
+            except Exception as e:
+                current_app.logger.error(f"Error in audiobook {audiobook_id}: {e}", exc_info=True)
+                db.session.rollback()
+                book = db.session.get(Audiobook, audiobook_id)
+                if book:
+                    book.status = 'failed'
+                    db.session.commit()
+    finally:
+        with _running_lock:
+            _running_audiobooks.discard(audiobook_id)
+
+def submit_audiobook(title, chapters, voice_id, voice_name, user_id, **kwargs):
+    """
+    Store an audiobook with one pending row per (title, text) chapter and
+    start synthesizing it in the background.
+    """
+    # Chapters are assembled into MP3, which every provider can produce asynchronously
+    kwargs['format'] = 'mp3'
+    book = Audiobook(user_id=user_id, title=title[:256], voice_id=voice_id, voice_name=voice_name,
+                     params=json.dumps(kwargs, sort_keys=True), status='processing',
+                     lease_owner=task_leases.node_id, lease_expires_at=task_leases.expiry())
+    book.chapters = [AudiobookChapter(position=i, title=chapter_title[:256], text=text, status='pending', attempts=0)
+                     for i, (chapter_title, text) in enumerate(chapters)]
+    db.session.add(book)
+    db.session.commit()
+
+    executor.submit(process_audiobook, book.id, tracing.current_trace_id())
+    return book
+
+def retry_audiobook(book):
+    """Resubmit only the failed chapters of an audiobook."""
+    for chapter in book.chapters:
+        if chapter.status == 'failed':
+            chapter.status = 'pending'
+            chapter.attempts = 0
+            chapter.error = None
+    book.status = 'processing'
+    book.lease_owner = task_leases.node_id
+    book.lease_expires_at = task_leases.expiry()
+    db.session.commit()
+
+    executor.submit(process_audiobook, book.id, tracing.current_trace_id())
+
+def resume_audiobook(book):
+    """Run an audiobook claimed from another node (see TaskLeases.recover_audiobooks) on this one."""
+    executor.submit(process_audiobook, book.id)
+
+def ingestion_status(job_id):
+    """Last known state of an ingestion job, from any worker process."""
+    return layered_cache.get(f"ingestion:{job_id}")
+
+def _update_ingestion(job, **fields):
+    job.update(fields)
+    state = dict(job)
+    layered_cache.set(f"ingestion:{job['job_id']}", state, current_app.config.get('INGESTION_JOB_TTL', 3600))
+    socketio.emit('upload_update', state, namespace='/')
+
+def run_ingestion(job, upload, extractor_name, normalize, user_id, username, trace_id=None):
+    """
+    Background part of a document upload: extract the text with the
+    registered extractor, normalize it, check the quota and upload it to
+    the provider. Progress (chapters or pages parsed, bytes uploaded) and
+    the final file_id are pushed as upload_update events. Takes ownership
+    of `upload`.
+    """
+    app = create_app()
+    config = app.config
+    with app.app_context(), scheduling('standard', user_id), \
+            tracing.traced('ingestion', trace_id, config['TRACE_LOG_THRESHOLD_MS']) as trace:
+        trace.set_attribute('job_id', job['job_id'])
+        try:
+            _update_ingestion(job, status='parsing')
+            with EXTRACTION_SECONDS.time(format=extractor_name):
+                blocks = extractors.get(extractor_name).extract(
+                    upload.file, progress=lambda parsed, total: _update_ingestion(job, chapters_parsed=parsed,
+                                                                                  chapters_total=total))
+                text = '\n'.join(blocks)
+            if not text.strip():
+                raise ValueError(f'No text found in {extractor_name} upload')
+            if normalize:
+                text = get_text_normalizer(document=True)(text)
+            message = usage_tracker.check(user_id, username, len(text))
+            if message:
+                raise ValueError(message)
+
+            upload.close()
+            upload = spool_text(text, config['UPLOAD_SPOOL_THRESHOLD'], config['UPLOAD_CHUNK_SIZE'])
+            del text
+            _update_ingestion(job, status='uploading', characters=upload.characters,
+                              bytes_uploaded=0, bytes_total=upload.size)
+
+            # One event per percent is plenty for a progress bar
+            step = max(upload.size // 100, 1)
+            def uploaded(position):
+                if position - job['bytes_uploaded'] >= step:
+                    _update_ingestion(job, bytes_uploaded=min(position, upload.size))
+
+            provider = get_provider()
+            result = provider.upload_file(job['filename'], ProgressReader(upload.file, uploaded), 'text/plain',
+                                          size=upload.size)
+            usage_tracker.record(user_id, provider.NAME, upload.characters, requests=0)
+            remember_file_characters(provider.NAME, (result.get('file') or {}).get('file_id'), upload.characters)
+            _update_ingestion(job, status='success', bytes_uploaded=upload.size,
+                              file_id=(result.get('file') or {}).get('file_id'), result=result)
+        except Exception as e:
+            current_app.logger.warning(f"Ingestion job {job['job_id']} failed: {e}")
+            _update_ingestion(job, status='failed', error=str(e))
+        finally:
+            upload.close()
+            INGESTION_JOBS.inc(status=job['status'])
+
+def submit_ingestion(upload, extractor_name, filename, normalize, user_id, username):
+    """Queue a document upload for background extraction and upload; returns the job state."""
+    job = {'job_id': uuid.uuid4().hex, 'status': 'queued', 'filename': filename,
+           'content_hash': upload.digest, 'bytes_received': upload.size,
+           'chapters_parsed': 0, 'chapters_total': None, 'bytes_uploaded': 0, 'bytes_total': None}
+    _update_ingestion(job)
+    # The job dict is updated by the worker thread from here on
+    state = dict(job)
+    executor.submit(run_ingestion, job, upload, extractor_name, normalize, user_id, username,
+                    tracing.current_trace_id())
+    return state
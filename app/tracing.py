@@ -0,0 +1,237 @@
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('app.tracing')
+
+# Incoming X-Request-ID values are reused in upstream request ids and logs
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Long poll loops would otherwise grow a trace without bound
+MAX_SPANS = 200
+
+_current: ContextVar[Optional['Trace']] = ContextVar('trace', default=None)
+# Innermost open span, per context: worker threads started with
+# copy_context().run share the Trace but nest their spans independently
+_open_span: ContextVar[Optional[Tuple['Trace', int]]] = ContextVar('open_span', default=None)
+
+class Span:
+    def __init__(self, name: str, start: float, parent: Optional[int], attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.parent = parent
+        self.attrs = attrs
+
+class Trace:
+    """
+    Per-request (or per-background-task) collection of timed spans.
+    Lives in a ContextVar, so code anywhere below the route can add spans
+    without threading the trace through every call. Threads running in a
+    copy of the context (hedged calls, sentence workers) add spans to the
+    same trace, each under the span that was open when it was started.
+    """
+
+    def __init__(self, name: str, trace_id: Optional[str] = None) -> None:
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.wall_start = time.time()
+        self.spans: List[Span] = [Span(name, time.perf_counter(), None, {})]
+        self.dropped = 0
+        self._children = 0
+        self._lock = threading.Lock()
+
+    def _open_index(self) -> int:
+        current = _open_span.get()
+        return current[1] if current is not None and current[0] is self else 0
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+        span = Span(name, time.perf_counter(), self._open_index(), attrs)
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped += 1
+                span = None
+            else:
+                self.spans.append(span)
+                index = len(self.spans) - 1
+        if span is None:
+            yield None
+            return
+
+        token = _open_span.set((self, index))
+        try:
+            yield span
+        except Exception as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _open_span.reset(token)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.spans[self._open_index()].attrs[key] = value
+
+    def child_request_id(self) -> str:
+        """
+        Id for an upstream call made within this trace: the trace id plus a
+        unique suffix, since client-supplied ids and the trace ids handed to
+        background tasks are reused across requests.
+        """
+        with self._lock:
+            self._children += 1
+            number = self._children
+        return f"{self.trace_id}-{number}-{uuid.uuid4().hex[:8]}"
+
+    def finish(self) -> None:
+        if self.spans[0].end is None:
+            self.spans[0].end = time.perf_counter()
+
+    @property
+    def duration_ms(self) -> float:
+        root = self.spans[0]
+        return ((root.end or time.perf_counter()) - root.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = self.spans[0].start
+        spans = []
+        for span in self.spans:
+            entry: Dict[str, Any] = {
+                'name': span.name,
+                'start_ms': round((span.start - origin) * 1000, 3),
+                'duration_ms': round(((span.end or time.perf_counter()) - span.start) * 1000, 3),
+            }
+            if span.parent is not None:
+                entry['parent'] = span.parent
+            entry.update(span.attrs)
+            spans.append(entry)
+        result: Dict[str, Any] = {'trace_id': self.trace_id, 'spans': spans}
+        if self.dropped:
+            result['dropped_spans'] = self.dropped
+        return result
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+def current_trace_id() -> Optional[str]:
+    trace = _current.get()
+    return trace.trace_id if trace else None
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Time a stage of the current trace; a no-op outside of one."""
+    trace = _current.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attrs) as s:
+        yield s
+
+def set_attribute(key: str, value: Any) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.set_attribute(key, value)
+
+def child_request_id() -> str:
+    trace = _current.get()
+    if trace is None:
+        return str(uuid.uuid4())
+    return trace.child_request_id()
+
+def start_trace(name: str, trace_id: Optional[str] = None) -> Trace:
+    trace = Trace(name, trace_id)
+    _current.set(trace)
+    return trace
+
+def finish_trace(trace: Trace, threshold_ms: float = 0, exporter: Any = None) -> None:
+    trace.finish()
+    if _current.get() is trace:
+        _current.set(None)
+
+    if trace.duration_ms < threshold_ms:
+        return
+    data = trace.to_dict()
+    logger.info(f"{trace.spans[0].name} took {trace.duration_ms:.1f} ms", extra={'trace': data})
+    if exporter is not None:
+        exporter.export(trace)
+
+@contextmanager
+def traced(name: str, trace_id: Optional[str] = None, threshold_ms: float = 0) -> Iterator[Trace]:
+    """Trace a unit of work outside a request, e.g. a background poll task."""
+    trace = start_trace(name, trace_id)
+    try:
+        yield trace
+    finally:
+        finish_trace(trace, threshold_ms, _exporter)
+
+class OTLPExporter:
+    """Re-emits finished traces as OpenTelemetry spans (optional dependency)."""
+
+    def __init__(self, endpoint: str, service_name: str = 'minimaxtts') -> None:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        provider = TracerProvider(resource=Resource.create({'service.name': service_name}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self._tracer = provider.get_tracer('app.tracing')
+
+    def export(self, trace: Trace) -> None:
+        from opentelemetry import trace as otel_trace
+
+        # perf_counter offsets -> wall-clock nanoseconds
+        origin = trace.spans[0].start
+        base_ns = int(trace.wall_start * 1e9)
+        created: List[Any] = []
+        for span in trace.spans:
+            context = otel_trace.set_span_in_context(created[span.parent]) if span.parent is not None else None
+            otel_span = self._tracer.start_span(
+                span.name, context=context,
+                start_time=base_ns + int((span.start - origin) * 1e9),
+                attributes={'trace_id': trace.trace_id, **{k: str(v) for k, v in span.attrs.items()}}
+            )
+            created.append(otel_span)
+        for span, otel_span in zip(trace.spans, created):
+            otel_span.end(end_time=base_ns + int(((span.end or span.start) - origin) * 1e9))
+
+_exporter: Optional[OTLPExporter] = None
+
+def init_app(app: Any) -> None:
+    global _exporter
+    from flask import request, g
+
+    threshold_ms = app.config.get('TRACE_LOG_THRESHOLD_MS', 0)
+    endpoint = app.config.get('OTEL_EXPORTER_OTLP_ENDPOINT')
+    if endpoint and _exporter is None:
+        try:
+            _exporter = OTLPExporter(endpoint)
+        except ImportError:
+            logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk is not installed")
+
+    @app.before_request
+    def _start_request_trace() -> None:
+        request_id = request.headers.get('X-Request-ID')
+        if request_id and not REQUEST_ID_PATTERN.match(request_id):
+            request_id = None
+        g.trace = start_trace('request', request_id)
+        g.trace.set_attribute('path', request.path)
+        g.trace.set_attribute('method', request.method)
+
+    @app.after_request
+    def _add_request_id(response: Any) -> Any:
+        trace = g.get('trace')
+        if trace is not None:
+            trace.set_attribute('status', response.status_code)
+            response.headers['X-Request-ID'] = trace.trace_id
+        return response
+
+    @app.teardown_request
+    def _finish_request_trace(_exc: Optional[BaseException]) -> None:
+        trace = g.pop('trace', None)
+        if trace is not None:
+            finish_trace(trace, threshold_ms, _exporter)
@@ -0,0 +1,84 @@
+from bs4 import BeautifulSoup
+from ebooklib import epub
+import ebooklib
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, BinaryIO, Tuple
+from app.metrics import EXTRACTION_SECONDS
+from app.extractors.html import BLOCK_TAGS
+
+logger = logging.getLogger(__name__)
+
+def spine_documents(book: Any, progress: Optional[Callable[[int, int], None]] = None) \
+        -> Iterator[Tuple[Any, BeautifulSoup]]:
+    # Iterate over the spine to ensure correct reading order
+    total = len(book.spine)
+    for position, (item_id, _linear) in enumerate(book.spine, 1):
+        item = book.get_item_with_id(item_id)
+        if item and item.get_type() == ebooklib.ITEM_DOCUMENT:
+            yield item, BeautifulSoup(item.get_content(), 'html.parser')
+        if progress:
+            progress(position, total)
+
+def document_text(soup: BeautifulSoup) -> str:
+    """
+    Text of a spine document with every block element (heading, paragraph,
+    list item...) on lines of its own, so a heading isn't read as one word
+    with the paragraph after it. Inline markup stays on its line.
+    """
+    for tag in soup(BLOCK_TAGS):
+        tag.insert_before('\n')
+        tag.insert_after('\n')
+    for tag in soup('br'):
+        tag.replace_with('\n')
+    return '\n'.join(line.strip() for line in soup.get_text().splitlines() if line.strip())
+
+def _toc_titles(toc: Any, titles: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Map document href -> first table-of-contents title pointing into it."""
+    titles = {} if titles is None else titles
+    for entry in toc or []:
+        if isinstance(entry, (tuple, list)):
+            section, children = entry[0], entry[1]
+            _toc_titles([section], titles)
+            _toc_titles(children, titles)
+            continue
+        href = getattr(entry, 'href', None)
+        title = getattr(entry, 'title', None)
+        if href and title:
+            titles.setdefault(href.split('#', 1)[0], title)
+    return titles
+
+@EXTRACTION_SECONDS.time(format='epub')
+def extract_text_from_epub(file_stream: BinaryIO | str,
+                           progress: Optional[Callable[[int, int], None]] = None) -> Optional[str]:
+    """Text of the book in reading order; progress(parsed, total) is called per spine document."""
+    try:
+        book = epub.read_epub(file_stream)
+        text_content = [document_text(soup) for _item, soup in spine_documents(book, progress)]
+        return "\n".join(text_content)
+    except Exception as e:
+        logger.error(f"Error parsing EPUB: {e}")
+        return None
+
+@EXTRACTION_SECONDS.time(format='epub')
+def extract_chapters_from_epub(file_stream: BinaryIO | str) -> Optional[List[Tuple[str, str]]]:
+    """
+    (title, text) per spine document that contains text. Titles come from
+    the table of contents, then the first heading, then the position.
+    """
+    try:
+        book = epub.read_epub(file_stream)
+        titles = _toc_titles(book.toc)
+        chapters = []
+        for item, soup in spine_documents(book):
+            text = document_text(soup)
+            if not text:
+                continue
+            heading = soup.find(['h1', 'h2', 'h3'])
+            title = (titles.get(item.get_name())
+                     or (heading.get_text(strip=True) if heading else None)
+                     or f"Chapter {len(chapters) + 1}")
+            chapters.append((title, text))
+        return chapters
+    except Exception as e:
+        logger.error(f"Error parsing EPUB: {e}")
+        return None
@@ -1,13 +1,16 @@
-import os
 from flask import current_app
-from werkzeug.utils import secure_filename
 from typing import List, Optional, Any
 
 def allowed_file(filename: str) -> bool:
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
-def validate_input(text: Optional[str] = None, file: Any = None) -> List[str]:
+def validate_input(text: Optional[str] = None, file: Any = None, size: Optional[int] = None) -> List[str]:
+    """
+    Problems with a request's text or uploaded file. `size` is the upload's
+    byte count as measured while spooling it; the stream itself is never
+    read or seeked here.
+    """
     errors = []
 
     # Text validation
@@ -18,13 +21,11 @@ def validate_input(text: Optional[str] = None, file: Any = None) -> List[str]:
     # File validation
     if file:
         if not allowed_file(file.filename):
-            errors.append("Invalid file type. Only .txt and .epub are allowed.")
+            allowed = ', '.join(f'.{ext}' for ext in sorted(current_app.config['ALLOWED_EXTENSIONS']))
+            errors.append(f"Invalid file type. Allowed types: {allowed}.")
 
-        file.seek(0, os.SEEK_END)
-        size = file.tell()
-        file.seek(0)
-
-        if size > current_app.config['MAX_CONTENT_LENGTH']:
-            errors.append(f"File too large. Max size is {current_app.config['MAX_CONTENT_LENGTH']/(1024*1024)}MB.")
+    max_size = current_app.config['UPLOAD_MAX_SIZE']
+    if size is not None and size > max_size:
+        errors.append(f"File too large. Max size is {max_size/(1024*1024):g}MB.")
 
     return errors
@@ -0,0 +1,70 @@
+"""
+Memory and time of decoding sync synthesis responses.
+
+    python benchmarks/bench_decode.py --minutes 10
+
+Serves a clip of the given length (128 kbps MP3-sized) from the mock
+provider API and compares peak Python heap usage (tracemalloc) of the old
+path (response.json() + unhexlify/b64decode + BytesIO copy) with the
+providers' current raw-buffer decoding.
+"""
+import argparse
+import base64
+import binascii
+import io
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import requests
+from app.services.minimax import MinimaxProvider
+from app.services.volcengine_tts import VolcengineProvider
+from mock_providers import MockProviderServer, MockSettings
+
+def measure(name: str, fn: Callable[[], object], audio_bytes: int) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"{name:<34} peak {peak / 1e6:8.1f} MB ({peak / audio_bytes:4.1f}x audio)   {elapsed * 1000:8.1f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=float, default=10)
+    parser.add_argument('--kbps', type=int, default=128)
+    args = parser.parse_args()
+
+    audio_bytes = int(args.minutes * 60 * args.kbps * 1000 / 8)
+    settings = MockSettings(latency=0, jitter=0, audio_bytes=audio_bytes)
+
+    with MockProviderServer(settings) as mock:
+        print(f"{args.minutes:g} min clip at {args.kbps} kbps = {audio_bytes / 1e6:.1f} MB audio")
+
+        def minimax_legacy():
+            response = requests.post(f"{mock.url}/v1/t2a_v2", json={'text': 'x'})
+            audio = binascii.unhexlify(response.json()['data']['audio'])
+            return io.BytesIO(audio)
+
+        def volcengine_legacy():
+            response = requests.post(f"{mock.url}/api/v1/tts", json={'request': {'text': 'x'}})
+            audio = base64.b64decode(response.json()['data'])
+            return io.BytesIO(audio)
+
+        minimax = MinimaxProvider(api_key='bench', base_url=mock.url)
+        volcengine = VolcengineProvider(app_id='bench', access_token='bench', base_url=mock.url)
+
+        measure('MiniMax hex, legacy', minimax_legacy, audio_bytes)
+        measure('MiniMax hex, raw buffer', lambda: minimax.generate_sync('x', 'voice'), audio_bytes)
+        measure('Volcengine base64, legacy', volcengine_legacy, audio_bytes)
+        measure('Volcengine base64, raw buffer', lambda: volcengine.generate_sync('x', 'voice'), audio_bytes)
+
+if __name__ == '__main__':
+    main()
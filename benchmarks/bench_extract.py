@@ -0,0 +1,151 @@
+"""
+Throughput of each registered document extractor.
+
+    python benchmarks/bench_extract.py --chars 2000000
+
+Renders the same synthetic book as plain text, Markdown, HTML, DOCX, EPUB
+and (when pypdf is installed) PDF, then times every extractor on it and
+reports input MB/s, extracted characters per second and the time until
+the first text block, which is what a streaming consumer waits for.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Callable, Dict, List
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ebooklib import epub
+from app.extractors import registry
+
+WORDS = ('time', 'machine', 'traveller', 'said', 'the', 'of', 'and', 'a', 'year', 'dimension', 'space',
+         'Filby', 'psychologist', 'was', 'in', 'medical', 'man', 'provincial', 'mayor', 'fire')
+
+def make_chapters(chars: int, seed: int = 1) -> List[List[str]]:
+    """Chapters of paragraphs, about `chars` characters in total."""
+    rng = random.Random(seed)
+    chapters: List[List[str]] = []
+    size = 0
+    while size < chars:
+        paragraphs = []
+        for _ in range(rng.randint(20, 40)):
+            sentences = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize() + '.'
+                         for _ in range(rng.randint(2, 6))]
+            paragraphs.append(' '.join(sentences))
+            size += len(paragraphs[-1])
+        chapters.append(paragraphs)
+    return chapters
+
+def as_text(chapters: List[List[str]]) -> bytes:
+    return '\n\n'.join(f"Chapter {i}\n\n" + '\n\n'.join(ps) for i, ps in enumerate(chapters, 1)).encode('utf-8')
+
+def as_markdown(chapters: List[List[str]]) -> bytes:
+    return '\n\n'.join(f"# Chapter {i}\n\n" + '\n\n'.join(f"Some *emphasis* and a [link](#x). {p}" for p in ps)
+                       for i, ps in enumerate(chapters, 1)).encode('utf-8')
+
+def as_html(chapters: List[List[str]]) -> bytes:
+    body = ''.join(f"<h1>Chapter {i}</h1>" + ''.join(f"<p>{escape(p)}</p>" for p in ps)
+                   for i, ps in enumerate(chapters, 1))
+    return f"<html><head><style>p {{}}</style></head><body>{body}</body></html>".encode('utf-8')
+
+def as_docx(chapters: List[List[str]]) -> bytes:
+    paragraphs = ''.join(f"<w:p><w:r><w:t>{escape(p)}</w:t></w:r></w:p>" for ps in chapters for p in ps)
+    document = ('<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{paragraphs}</w:body></w:document>')
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('word/document.xml', document)
+    return data.getvalue()
+
+def as_epub(chapters: List[List[str]]) -> bytes:
+    book = epub.EpubBook()
+    book.set_identifier('bench')
+    book.set_title('Bench')
+    items = []
+    for i, ps in enumerate(chapters, 1):
+        item = epub.EpubHtml(title=f'Chapter {i}', file_name=f'c{i}.xhtml')
+        item.content = f"<html><body><h1>Chapter {i}</h1>" + ''.join(f"<p>{escape(p)}</p>" for p in ps) + "</body></html>"
+        book.add_item(item)
+        items.append(item)
+    book.spine = items
+    book.add_item(epub.EpubNcx())
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.epub')
+        epub.write_epub(path, book)
+        with open(path, 'rb') as f:
+            return f.read()
+
+def as_pdf(chapters: List[List[str]]) -> bytes:
+    """One page per chapter, one text line per paragraph (Helvetica, no compression)."""
+    def literal(text: str) -> str:
+        return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', b'',
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for ps in chapters:
+        lines = ' '.join(f"({literal(p)}) Tj T*" for p in ps)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {lines} ET".encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> '
+                       b'/Contents %d 0 R >>' % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (' '.join(f'{k} 0 R' for k in kids).encode(), len(kids))
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b'%010d 00000 n \n' % offset)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+RENDERERS: Dict[str, Callable[[List[List[str]]], bytes]] = {
+    'text': as_text, 'markdown': as_markdown, 'html': as_html, 'docx': as_docx, 'epub': as_epub, 'pdf': as_pdf,
+}
+
+def bench(name: str, data: bytes, rounds: int) -> None:
+    extractor = registry.get(name)
+    if not extractor.available():
+        print(f"{name:<10} skipped: needs {extractor.requires}")
+        return
+    extractor.load()
+
+    first_block = total = chars = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        blocks = iter(extractor.extract(io.BytesIO(data)))
+        first = next(blocks, '')
+        first_block += time.perf_counter() - start
+        chars = len(first) + sum(len(block) for block in blocks)
+        total += time.perf_counter() - start
+    total /= rounds
+    first_block /= rounds
+    print(f"{name:<10} {len(data) / 1e6:7.1f} MB {len(data) / total / 1e6:8.1f} MB/s "
+          f"{chars / total / 1e6:8.2f} Mchar/s   first block {first_block * 1000:8.1f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chars', type=int, default=2_000_000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--formats', default=','.join(RENDERERS))
+    args = parser.parse_args()
+
+    chapters = make_chapters(args.chars)
+    print(f"input: {sum(len(p) for ps in chapters for p in ps):,} characters in {len(chapters)} chapters")
+    for name in args.formats.split(','):
+        bench(name, RENDERERS[name](chapters), args.rounds)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark the /api/history keyset pagination on a seeded SQLite database.
+
+    python benchmarks/bench_history.py --rows 1000000
+
+Seeds ROWS history entries spread over USERS users (one user owns half of
+them), then times the first page, a deep page reached via cursor, and the
+equivalent OFFSET query for comparison.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app
+from app.extensions import db
+from app.models import User, History
+from config import Config
+
+def seed(rows: int, users: int) -> int:
+    user_ids = []
+    for i in range(users):
+        user = User(username=f'user{i}')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.flush()
+        user_ids.append(user.id)
+    db.session.commit()
+
+    heavy_user = user_ids[0]
+    base = datetime(2020, 1, 1)
+    batch = []
+    insert = History.__table__.insert()
+    for i in range(rows):
+        owner = heavy_user if i % 2 == 0 else user_ids[i % users]
+        batch.append({
+            'user_id': owner,
+            'task_id': f'task-{i}',
+            'status': ('success', 'failed', 'processing')[i % 3],
+            'voice_name': 'Audiobook Male 1',
+            'text_preview': 'Lorem ipsum dolor sit amet...',
+            'created_at': base + timedelta(seconds=i),
+        })
+        if len(batch) == 50000:
+            db.session.execute(insert, batch)
+            batch = []
+    if batch:
+        db.session.execute(insert, batch)
+    db.session.commit()
+    return heavy_user
+
+def timed(fn, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--depth', type=int, default=2000, help='page number for the deep-page measurement')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        user_id = seed(args.rows, args.users)
+        print(f"Seeded {args.rows} rows in {time.perf_counter() - start:.1f}s ({db_path})")
+
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM history WHERE user_id = :u "
+            "AND (created_at, id) < (:c, :i) ORDER BY created_at DESC, id DESC LIMIT 51"),
+            {'u': user_id, 'c': datetime(2021, 1, 1), 'i': 0}).all()
+        print("Query plan:", '; '.join(row[-1] for row in plan))
+
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+
+    def first_page():
+        return client.get('/api/history', query_string={'limit': args.limit}).get_json()
+
+    # Walk to the deep page once to get its cursor, then time fetching it
+    cursor = None
+    for _ in range(args.depth):
+        data = client.get('/api/history', query_string={'limit': args.limit, 'cursor': cursor or ''}).get_json()
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    def deep_page():
+        return client.get('/api/history', query_string={'limit': args.limit, 'cursor': cursor}).get_json()
+
+    def deep_offset():
+        with app.app_context():
+            db.session.execute(text(
+                "SELECT id, task_id, status, voice_name, text_preview, created_at FROM history "
+                "WHERE user_id = :u ORDER BY created_at DESC, id DESC LIMIT :l OFFSET :o"),
+                {'u': user_id, 'l': args.limit, 'o': args.depth * args.limit}).all()
+
+    print(f"first page (keyset):        {timed(first_page):8.2f} ms")
+    print(f"page {args.depth} (keyset):        {timed(deep_page):8.2f} ms")
+    print(f"page {args.depth} (OFFSET, for reference): {timed(deep_offset):8.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Load test the Flask app against the local mock provider API.
+
+    python benchmarks/bench_load.py --provider minimax --requests 200 --concurrency 16
+
+Starts benchmarks/mock_providers.py and the app (threaded werkzeug server,
+temporary database and artifact folder), drives each endpoint with
+concurrent clients and reports p50/p95/p99 latency and RPS per endpoint.
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import requests
+from werkzeug.serving import make_server
+from app import create_app
+from app.config import config_manager
+from app.extensions import db
+from config import Config
+from mock_providers import MockProviderServer, MockSettings
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def run_scenario(name: str, call: Callable[[int], requests.Response], total: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = call(i).status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    return {
+        'name': name,
+        'requests': total,
+        'errors': errors,
+        'rps': total / wall,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'mean': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--provider', choices=['minimax', 'volcengine'], default='minimax')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05, help='mock upstream latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--audio-bytes', type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='tts-load-')
+
+    class LoadConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'load.db')
+        ARTIFACT_FOLDER = os.path.join(workdir, 'artifacts')
+        LOG_LEVEL = 'WARNING'
+
+    settings = MockSettings(latency=args.latency, error_rate=args.error_rate, audio_bytes=args.audio_bytes)
+    with MockProviderServer(settings) as mock:
+        provider_config = {
+            'active_provider': args.provider,
+            'minimax': {'api_key': 'load-test', 'group_id': None, 'base_url': mock.url},
+            'volcengine': {'app_id': 'load-test', 'access_token': 'load-test', 'secret_key': None,
+                           'cluster': 'volcano_tts', 'base_url': mock.url},
+            'voices': {'minimax': [{'name': 'Mock', 'id': 'mock_voice'}],
+                       'volcengine': [{'name': 'Mock', 'id': 'mock_voice'}]},
+        }
+
+        # Keep the real config.json untouched
+        with patch.object(config_manager, 'get_all', return_value=provider_config):
+            app = create_app(LoadConfig)
+            with app.app_context():
+                db.create_all()
+
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base = f"http://127.0.0.1:{server.server_port}"
+            session = requests.Session()
+            session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+            unique = itertools.count()
+
+            def generate_sync(i: int) -> requests.Response:
+                # Unique text per request so every call reaches the provider
+                return session.post(f"{base}/api/generate", json={
+                    'mode': 'sync', 'voice_id': 'mock_voice', 'text': f"load test sentence {next(unique)}"})
+
+            def generate_sync_cached(i: int) -> requests.Response:
+                return session.post(f"{base}/api/generate", json={
+                    'mode': 'sync', 'voice_id': 'mock_voice', 'text': 'load test cached sentence'})
+
+            def submit_async(i: int) -> requests.Response:
+                return session.post(f"{base}/api/generate", json={
+                    'mode': 'async', 'voice_id': 'mock_voice', 'text': f"async load test {i}"})
+
+            def query(i: int) -> requests.Response:
+                return session.get(f"{base}/api/query", params={'task_id': str(i + 1)})
+
+            def upload(i: int) -> requests.Response:
+                files = {'file': (f'doc{i}.txt', b'Some text to synthesize. ' * 400, 'text/plain')}
+                return session.post(f"{base}/api/upload", files=files)
+
+            scenarios: List[Tuple[str, Callable[[int], requests.Response]]] = [
+                ('POST /api/generate (sync)', generate_sync),
+                ('POST /api/generate (sync, cached)', generate_sync_cached),
+                ('POST /api/generate (async)', submit_async),
+                ('GET /api/query', query),
+                ('POST /api/upload', upload),
+            ]
+
+            print(f"provider={args.provider} requests={args.requests} concurrency={args.concurrency} "
+                  f"upstream_latency={args.latency * 1000:.0f}ms audio={args.audio_bytes}B")
+            print(f"{'endpoint':<36}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+            for name, call in scenarios:
+                result = run_scenario(name, call, args.requests, args.concurrency)
+                print(f"{result['name']:<36}{result['rps']:>9.1f}{result['p50']:>10.1f}"
+                      f"{result['p95']:>10.1f}{result['p99']:>10.1f}{result['errors']:>8}")
+
+            server.shutdown()
+
+        print(f"upstream calls: {mock.request_counts}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark JSON log throughput (records/sec).
+
+    python benchmarks/bench_logging.py --records 200000
+
+Compares the original formatter (stdlib json + isoformat per record) with
+the current JSONFormatter with and without orjson, and the time a request
+thread spends logging with a synchronous StreamHandler vs the queue handler.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import queue
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.logging_config import JSONFormatter, QueueLogHandler, orjson
+
+class BaselineFormatter(logging.Formatter):
+    """JSONFormatter as it was before the fast path."""
+
+    def format(self, record):
+        log_record = {
+            'timestamp': datetime.datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+            'module': record.module,
+            'line': record.lineno
+        }
+        if record.exc_info:
+            log_record['exception'] = self.formatException(record.exc_info)
+        return json.dumps(log_record, ensure_ascii=False)
+
+def make_records(n: int):
+    start = time.time()
+    records = []
+    for i in range(n):
+        record = logging.LogRecord('app.tasks', logging.INFO, __file__, 42,
+                                   'Task %s status: %s', (f'task-{i}', 'Processing'), None)
+        record.created = start + i * 0.0001
+        records.append(record)
+    return records
+
+def bench_formatter(name: str, formatter: logging.Formatter, records) -> None:
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {len(records) / elapsed:>12,.0f} records/s")
+
+def bench_handler(name: str, handler: logging.Handler, records) -> None:
+    start = time.perf_counter()
+    for record in records:
+        handler.handle(record)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {len(records) / elapsed:>12,.0f} records/s on the calling thread")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=200000)
+    args = parser.parse_args()
+    records = make_records(args.records)
+
+    bench_formatter('baseline (json + isoformat)', BaselineFormatter(), records)
+    bench_formatter('JSONFormatter (stdlib json)', JSONFormatter(use_orjson=False), records)
+    if orjson is not None:
+        bench_formatter('JSONFormatter (orjson)', JSONFormatter(), records)
+    else:
+        print("orjson not installed, skipping")
+
+    stream_handler = logging.StreamHandler(open(os.devnull, 'w'))
+    stream_handler.setFormatter(JSONFormatter())
+    bench_handler('StreamHandler (synchronous)', stream_handler, records)
+
+    queue_handler = QueueLogHandler(queue.Queue())
+    bench_handler('QueueLogHandler', queue_handler, records)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Local stand-in for the MiniMax and Volcengine TTS APIs.
+
+Emulates the endpoints our providers call, with configurable latency,
+error rate and audio size, so the app can be load-tested without
+credentials or upstream spend:
+
+    MiniMax:    POST /v1/t2a_v2, POST /v1/t2a_async_v2,
+                GET /v1/query/t2a_async_query_v2, POST /v1/files/upload,
+                GET /v1/files/retrieve, GET /download/<id>
+    Volcengine: POST /api/v1/tts, POST /api/v1/tts_async (submit and query)
+
+Run standalone with `python benchmarks/mock_providers.py --port 8900`, or
+use MockProviderServer from another script.
+"""
+import argparse
+import base64
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, parse_qs
+
+class MockSettings:
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0,
+                 audio_bytes: int = 64 * 1024, polls_until_done: int = 1) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.audio_bytes = audio_bytes
+        self.polls_until_done = polls_until_done
+
+class _State:
+    def __init__(self, settings: MockSettings) -> None:
+        self.settings = settings
+        self.audio = os.urandom(settings.audio_bytes)
+        # Sync responses are encoded once up front so serving large clips
+        # doesn't allocate per request (keeps in-process memory benchmarks clean)
+        self.minimax_sync_body = json.dumps({
+            'data': {'audio': self.audio.hex(), 'status': 2},
+            'trace_id': 'mock',
+            'base_resp': {'status_code': 0, 'status_msg': 'success'}
+        }).encode('utf-8')
+        self.volcengine_sync_body = json.dumps({
+            'code': 3000, 'message': 'Success', 'data': base64.b64encode(self.audio).decode('ascii')
+        }).encode('utf-8')
+        self.ids = itertools.count(1)
+        self.polls: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+
+    def next_id(self) -> str:
+        return str(next(self.ids))
+
+    def poll(self, task_id: str) -> bool:
+        """Returns True once the task has been polled enough times to be done."""
+        with self.lock:
+            self.polls[task_id] = self.polls.get(task_id, 0) + 1
+            return self.polls[task_id] >= self.settings.polls_until_done
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state: _State
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_bytes(self, body: bytes, content_type: str = 'audio/mpeg') -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _simulate(self, path: str) -> bool:
+        """Apply latency and failure injection; returns False if an error was sent."""
+        settings = self.state.settings
+        with self.state.lock:
+            self.state.requests[path] = self.state.requests.get(path, 0) + 1
+        delay = settings.latency + random.uniform(-settings.jitter, settings.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if settings.error_rate and random.random() < settings.error_rate:
+            self._send_json({'error': 'injected failure'}, status=500)
+            return False
+        return True
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if not self._simulate(url.path):
+            return
+
+        if url.path == '/v1/query/t2a_async_query_v2':
+            task_id = params.get('task_id', '')
+            done = self.state.poll(task_id)
+            self._send_json({
+                'task_id': task_id,
+                'status': 'Success' if done else 'Processing',
+                'file_id': task_id if done else None,
+                'base_resp': {'status_code': 0, 'status_msg': 'success'}
+            })
+        elif url.path == '/v1/files/retrieve':
+            file_id = params.get('file_id', '')
+            host = self.headers.get('Host')
+            self._send_json({
+                'file': {'file_id': file_id, 'download_url': f"http://{host}/download/{file_id}"},
+                'base_resp': {'status_code': 0}
+            })
+        elif url.path.startswith('/download/'):
+            self._send_bytes(self.state.audio)
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        body = self._read_body()
+        if not self._simulate(url.path):
+            return
+
+        if url.path == '/v1/t2a_v2':
+            self._send_bytes(self.state.minimax_sync_body, 'application/json')
+        elif url.path == '/v1/t2a_async_v2':
+            self._send_json({'task_id': self.state.next_id(), 'base_resp': {'status_code': 0}})
+        elif url.path == '/v1/files/upload':
+            self._send_json({
+                'file': {'file_id': self.state.next_id(), 'bytes': len(body)},
+                'base_resp': {'status_code': 0}
+            })
+        elif url.path == '/api/v1/tts':
+            self._send_bytes(self.state.volcengine_sync_body, 'application/json')
+        elif url.path == '/api/v1/tts_async':
+            payload = json.loads(body or b'{}')
+            request = payload.get('request', {})
+            if request.get('operation') == 'submit':
+                self._send_json({'code': 3000, 'data': {'task_id': self.state.next_id()}})
+            else:
+                task_id = request.get('task_id', '')
+                done = self.state.poll(task_id)
+                host = self.headers.get('Host')
+                data: Dict[str, Any] = {'task_status': 'Success' if done else 'Processing', 'reqid': task_id}
+                if done:
+                    data['audio_url'] = f"http://{host}/download/{task_id}"
+                self._send_json({'code': 3000, 'message': 'Success', 'data': data})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+class MockProviderServer:
+    """Runs the mock API on a background thread; usable as a context manager."""
+
+    def __init__(self, settings: Optional[MockSettings] = None, host: str = '127.0.0.1', port: int = 0) -> None:
+        self.state = _State(settings or MockSettings())
+        handler = type('Handler', (_Handler,), {'state': self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_counts(self) -> Dict[str, int]:
+        return dict(self.state.requests)
+
+    def start(self) -> 'MockProviderServer':
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'MockProviderServer':
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per upstream call')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--audio-bytes', type=int, default=64 * 1024)
+    parser.add_argument('--polls-until-done', type=int, default=1)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.jitter, args.error_rate, args.audio_bytes, args.polls_until_done)
+    server = MockProviderServer(settings, port=args.port)
+    print(f"Mock MiniMax/Volcengine API listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
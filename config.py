@@ -9,6 +9,45 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+
+    # Logged-in users allowed on the admin warmup and usage APIs; scripts/migrate_admin.py creates "admin"
+    ADMIN_USERNAMES = [u for u in (os.environ.get('ADMIN_USERNAMES') or 'admin').split(',') if u]
+
+    # Poll tasks batch History status updates, one transaction per interval
+    HISTORY_FLUSH_INTERVAL = 1.0  # seconds; 0 writes every update immediately
+    HISTORY_FLUSH_MAX_BATCH = 500
+
+    # Async task ownership across app instances sharing the database: a node
+    # polls a task while it holds its lease and renews it on every poll
+    NODE_ID = os.environ.get('NODE_ID')  # defaults to host:pid plus a random suffix
+    TASK_LEASE_TTL = 60  # seconds; at least twice ASYNC_POLL_MAX_INTERVAL
+    TASK_RECOVERY_INTERVAL = 30  # seconds between scans for expired leases; 0 disables
+    TASK_RECOVERY_BATCH = 50
+
+    # Async tasks are polled around their expected completion, learned per
+    # provider and voice from recent tasks (see app/services/eta.py)
+    ASYNC_ETA_DEFAULT_OVERHEAD = 20.0  # seconds per task until there are enough samples
+    ASYNC_ETA_DEFAULT_RATE = 0.01  # seconds per character until there are enough samples
+    ASYNC_ETA_MIN_SAMPLES = 5  # completed tasks before a provider or voice gets its own fit
+    ASYNC_ETA_WINDOW = 500  # most recent completed tasks fitted on
+    ASYNC_ETA_REFRESH_INTERVAL = 300  # seconds between refits
+    ASYNC_POLL_MIN_INTERVAL = 2.0
+    ASYNC_POLL_MAX_INTERVAL = 30.0  # also capped at half of TASK_LEASE_TTL
+    ASYNC_POLL_ETA_FRACTION = 0.5  # share of the time left until the ETA slept before the next poll
+
+    # Completion callbacks (callback_url of async /api/generate) go through an
+    # outbox table and are retried with exponential backoff
+    WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')  # HMAC key for X-TTS-Signature; defaults to SECRET_KEY
+    # Callbacks only go to hosts resolving to public addresses, except these
+    WEBHOOK_ALLOWED_HOSTS = [h for h in (os.environ.get('WEBHOOK_ALLOWED_HOSTS') or '').split(',') if h]
+    WEBHOOK_PUBLIC_URL = os.environ.get('WEBHOOK_PUBLIC_URL')  # makes /api/audio/... download URLs absolute
+    WEBHOOK_TIMEOUT = 10  # seconds per delivery attempt
+    WEBHOOK_MAX_ATTEMPTS = 8
+    WEBHOOK_BACKOFF_BASE = 5  # seconds before the first retry, doubling after each failure
+    WEBHOOK_BACKOFF_MAX = 3600
+    WEBHOOK_INTERVAL = 5  # seconds between scans for due deliveries; 0 disables the worker
+    WEBHOOK_BATCH = 50
 
     # MiniMax API Config
     MINIMAX_API_KEY = os.environ.get('MINIMAX_API_KEY')
@@ -17,9 +56,102 @@ class Config:
 
     # Uploads
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload
-    ALLOWED_EXTENSIONS = {'txt', 'epub'}
+    # Uploads are streamed through spooled files, so memory per upload stays
+    # constant and the limit only bounds disk use and upstream transfer
+    UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE') or 100 * 1024 * 1024)
+    UPLOAD_SPOOL_THRESHOLD = 1024 * 1024  # larger uploads are spooled to disk
+    UPLOAD_CHUNK_SIZE = 64 * 1024
+    MAX_CONTENT_LENGTH = UPLOAD_MAX_SIZE + 1024 * 1024  # the file plus the other form fields
+    INGESTION_JOB_TTL = 3600  # seconds the state of a background EPUB upload is kept
+    UPLOAD_CHARACTERS_TTL = 86400  # seconds the length of an uploaded file is kept for its task's ETA
+    # Formats with an extractor in app/extractors; PDF needs the optional pypdf package
+    ALLOWED_EXTENSIONS = {'txt', 'epub', 'pdf', 'docx', 'html', 'htm', 'xhtml', 'md', 'markdown'}
+
+    # Local audio artifacts
+    ARTIFACT_FOLDER = os.environ.get('ARTIFACT_FOLDER') or os.path.join(basedir, 'artifacts')
+    ARTIFACT_CHUNK_SIZE = 64 * 1024
+    # Let the front proxy serve files: X-Sendfile (Apache/lighttpd) or X-Accel-Redirect (nginx)
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE') == '1'
+    ARTIFACT_ACCEL_REDIRECT_PREFIX = os.environ.get('ARTIFACT_ACCEL_REDIRECT_PREFIX')
+
+    # Logging: records go through a bounded queue to a background writer
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_QUEUE_SIZE = 10000
+    LOG_POLL_DEBUG_SAMPLE_EVERY = 10  # keep 1 in N debug poll-status records
+
+    # Tracing: per-stage timings are logged for requests slower than this
+    TRACE_LOG_THRESHOLD_MS = float(os.environ.get('TRACE_LOG_THRESHOLD_MS') or 0)
+    OTEL_EXPORTER_OTLP_ENDPOINT = os.environ.get('OTEL_EXPORTER_OTLP_ENDPOINT')
+
+    # Transcoding for formats the provider can't produce
+    FFMPEG_PATH = os.environ.get('FFMPEG_PATH') or 'ffmpeg'
+    TRANSCODE_WORKERS = 2
+    TRANSCODE_MAX_PENDING = 16  # requests beyond this are rejected with 503
+    TRANSCODE_TIMEOUT = 300
+
+    # Text clean-up before synthesis (see app/services/text_normalizer.py).
+    # Uploaded documents also drop page numbers, copyright lines and running
+    # headers; add 'abbreviations' and 'numbers' for English text, 'ssml'
+    # when the provider receives SSML.
+    TEXT_NORMALIZATION_PASSES = ['markup', 'whitespace']
+    TEXT_NORMALIZATION_DOCUMENT_PASSES = ['markup', 'boilerplate', 'running_headers', 'whitespace']
+    TEXT_RUNNING_HEADER_MIN_REPEATS = 3
+
+    # Incremental sync rendering: per-sentence segments are memoized so an
+    # edited document only re-synthesizes the sentences that changed.
+    # Clients opt in per request with "incremental": true
+    SENTENCE_MEMO_DEFAULT = False
+    SENTENCE_MEMO_WORKERS = 4  # concurrent provider calls for missing sentences
+
+    # Per-user usage accounting. Limits are characters/requests per QUOTA_PERIOD
+    # ('month' or 'day'); None is unlimited. Per-user limits go under "quotas"
+    # in config.json, keyed by username
+    QUOTA_PERIOD = 'month'
+    QUOTA_CHARACTERS = int(os.environ['QUOTA_CHARACTERS']) if os.environ.get('QUOTA_CHARACTERS') else None
+    QUOTA_REQUESTS = int(os.environ['QUOTA_REQUESTS']) if os.environ.get('QUOTA_REQUESTS') else None
+    QUOTA_FLUSH_INTERVAL = 5.0  # seconds; 0 writes every request immediately
+
+    # Upstream provider calls share one quota: at most SCHEDULER_MAX_CONCURRENCY
+    # run at once, and the reserved slots only admit interactive calls
+    # (/api/generate). Async polls run as standard, audiobooks and warmup as bulk
+    SCHEDULER_MAX_CONCURRENCY = 8
+    SCHEDULER_INTERACTIVE_RESERVED = 2
+
+    # Hedged sync synthesis: a call slower than the HEDGE_PERCENTILE latency of
+    # recent calls of similar length is raced against an identical second call.
+    # Hedges cost at most HEDGE_BUDGET_RATIO extra upstream calls
+    HEDGE_ENABLED = os.environ.get('HEDGE_ENABLED') == '1'
+    HEDGE_PERCENTILE = 95
+    HEDGE_INITIAL_DELAY = 2.0  # seconds, until HEDGE_MIN_SAMPLES latencies are known
+    HEDGE_MIN_SAMPLES = 20
+    HEDGE_BUDGET_RATIO = 0.05
+    # Hedge to another provider for the voices mapped here
+    HEDGE_ALTERNATE_PROVIDER = os.environ.get('HEDGE_ALTERNATE_PROVIDER')
+    HEDGE_VOICE_MAP = {}  # our voice_id -> the alternate provider's voice_id
+
+    # Voice catalogue fetched from the provider's voice listing API
+    VOICE_CATALOG_TTL = 3600  # seconds before revalidating with the listing's ETag
+    VOICE_CATALOG_RETRY_INTERVAL = 60  # seconds between retries after a failed fetch
+
+    # Cache warmup of the per-voice phrases under "warmup" in config.json
+    WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP') == '1'
+    WARMUP_RATE = 1.0  # provider calls per second
+
+    # Audiobook mode: EPUB chapters are separate async tasks
+    AUDIOBOOK_MAX_PARALLEL_CHAPTERS = 3
+    AUDIOBOOK_CHAPTER_MAX_ATTEMPTS = 3  # automatic attempts before a chapter is marked failed
+    AUDIOBOOK_POLL_INTERVAL = 10  # seconds
 
-    # Cache
-    CACHE_TYPE = "SimpleCache"
+    # Cache: the shared tier is a Flask-Caching backend every worker process
+    # can reach (FileSystemCache on one host, RedisCache with CACHE_REDIS_URL
+    # across hosts), fronted by a per-process LRU whose entries live at most
+    # CACHE_LOCAL_TTL seconds
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or "FileSystemCache"
+    CACHE_DIR = os.environ.get('CACHE_DIR') or os.path.join(basedir, 'cache')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_LOCAL_SIZE = 1024
+    CACHE_LOCAL_TTL = 5.0
+    CACHE_LOCK_TIMEOUT = 60.0  # seconds a stampede lock is held at most
+    QUERY_STATUS_CACHE_TIMEOUT = 2.0  # seconds an in-progress task status is reused
+    QUERY_STATUS_FINAL_CACHE_TIMEOUT = 300
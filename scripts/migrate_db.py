@@ -0,0 +1,52 @@
+from app import create_app, db
+from sqlalchemy import inspect, text
+
+# Columns added to existing tables after the initial schema: (table, column, DDL type)
+NEW_COLUMNS = [
+    ('history', 'file_size', 'INTEGER'),
+    ('history', 'content_hash', 'VARCHAR(64)'),
+    ('history', 'lease_owner', 'VARCHAR(128)'),
+    ('history', 'lease_expires_at', 'TIMESTAMP'),
+    ('history', 'provider', 'VARCHAR(32)'),
+    ('history', 'characters', 'INTEGER'),
+    ('history', 'eta', 'TIMESTAMP'),
+    ('history', 'completed_at', 'TIMESTAMP'),
+    ('history', 'callback_url', 'VARCHAR(512)'),
+    ('history', 'audio_format', 'VARCHAR(8)'),
+    ('audiobook', 'lease_owner', 'VARCHAR(128)'),
+    ('audiobook', 'lease_expires_at', 'TIMESTAMP'),
+]
+
+# Indexes added after the initial schema: (table, index name, columns)
+NEW_INDEXES = [
+    ('history', 'ix_history_user_id_created_at', ('user_id', 'created_at')),
+    ('history', 'ix_history_status_lease_expires_at', ('status', 'lease_expires_at')),
+    ('history', 'ix_history_status_completed_at', ('status', 'completed_at')),
+]
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        # Creates any missing tables; existing tables are left untouched
+        db.create_all()
+
+        inspector = inspect(db.engine)
+        with db.engine.begin() as conn:
+            for table, column, ddl_type in NEW_COLUMNS:
+                existing = {c['name'] for c in inspector.get_columns(table)}
+                if column in existing:
+                    continue
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+                print(f"Added column {table}.{column}")
+
+            for table, name, columns in NEW_INDEXES:
+                existing = {i['name'] for i in inspector.get_indexes(table)}
+                if name in existing:
+                    continue
+                conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+                print(f"Added index {name}")
+
+        print("Database migrated.")
+
+if __name__ == '__main__':
+    migrate()
@@ -1,13 +1,65 @@
+import json
 import pytest
+import requests
 from app import create_app
+from app.extensions import db
+from app.services.cache import layered_cache
+from app.services.usage import usage_tracker
+from config import Config
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    HISTORY_FLUSH_INTERVAL = 0
+    QUOTA_FLUSH_INTERVAL = 0
+    TASK_RECOVERY_INTERVAL = 0
+    WEBHOOK_INTERVAL = 0
+    CACHE_TYPE = 'SimpleCache'
+
+@pytest.fixture(autouse=True)
+def fresh_local_cache():
+    # The in-process cache tier and usage totals outlive apps, like they outlive create_app() calls
+    # in a worker; each test's in-memory database starts empty
+    layered_cache.local.clear()
+    usage_tracker.reset()
 
 @pytest.fixture
-def app():
-    app = create_app()
+def app(tmp_path):
+    app = create_app(TestConfig)
     app.config.update({
-        "TESTING": True,
+        "ARTIFACT_FOLDER": str(tmp_path / 'artifacts'),
     })
+    with app.app_context():
+        db.create_all()
+    yield app
+
+@pytest.fixture
+def shared_db_app(tmp_path):
+    """An app on a database file, so threads get their own connections like separate nodes would."""
+    class SharedConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'shared.db'}"
+    app = create_app(SharedConfig)
+    with app.app_context():
+        db.create_all()
     yield app
+    with app.app_context():
+        db.engine.dispose()
+
+@pytest.fixture
+def login_admin(app):
+    """Log a test client in as the admin account."""
+    from app.models import User
+    with app.app_context():
+        admin = User(username='admin')
+        admin.set_password('pw')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+    def login(client):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+    return login
 
 @pytest.fixture
 def client(app):
@@ -16,3 +68,17 @@ def client(app):
 @pytest.fixture
 def runner(app):
     return app.test_cli_runner()
+
+def make_json_response(payload, status_code=200):
+    """A real requests.Response with a JSON body; providers read raw response bodies."""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(payload).encode('utf-8')
+    response._content_consumed = True
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['Content-Length'] = str(len(response._content))
+    return response
+
+@pytest.fixture
+def json_response():
+    return make_json_response
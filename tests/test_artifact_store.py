@@ -0,0 +1,144 @@
+import hashlib
+from unittest.mock import MagicMock
+from app.services.artifact_store import ArtifactStore
+from app.services.transcoder import AUDIO_FORMATS
+from app.models import History
+
+AUDIO = b'ID3' + bytes(range(256)) * 8
+
+def test_put_stream_is_content_addressed(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first = store.put_stream([AUDIO[:100], AUDIO[100:]])
+    second = store.put_bytes(AUDIO)
+
+    assert first.digest == hashlib.sha256(AUDIO).hexdigest()
+    assert first.path == second.path
+    assert first.size == len(AUDIO)
+    assert store.get(first.digest).path == first.path
+    # No temporary spool files left behind
+    assert not list(tmp_path.glob('*.part'))
+
+def test_get_rejects_invalid_ids(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    assert store.get('../../etc/passwd') is None
+    assert store.get('0' * 64) is None
+
+def test_download_streams_in_chunks(tmp_path, mocker):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = iter([AUDIO[:10], AUDIO[10:]])
+    mock_get = mocker.patch('requests.get', return_value=response)
+
+    store = ArtifactStore(str(tmp_path), chunk_size=1024)
+    artifact = store.download('https://example.com/audio.mp3')
+
+    assert mock_get.call_args.kwargs['stream'] is True
+    response.iter_content.assert_called_once_with(chunk_size=1024)
+    with open(artifact.path, 'rb') as f:
+        assert f.read() == AUDIO
+
+def test_get_audio_range_and_etag(app, client):
+    with app.app_context():
+        from app.services.artifact_store import get_artifact_store
+        artifact = get_artifact_store().put_bytes(AUDIO)
+
+    response = client.get(f'/api/audio/{artifact.digest}')
+    assert response.status_code == 200
+    assert response.mimetype == 'audio/mpeg'
+    assert response.headers['ETag'] == f'"{artifact.digest}"'
+
+    response = client.get(f'/api/audio/{artifact.digest}', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.data == AUDIO[:10]
+
+    response = client.get(f'/api/audio/{artifact.digest}', headers={'If-None-Match': f'"{artifact.digest}"'})
+    assert response.status_code == 304
+
+def test_get_audio_accel_redirect(app, client):
+    app.config['ARTIFACT_ACCEL_REDIRECT_PREFIX'] = '/protected/audio/'
+    with app.app_context():
+        from app.services.artifact_store import get_artifact_store
+        artifact = get_artifact_store().put_bytes(AUDIO)
+
+    response = client.get(f'/api/audio/{artifact.digest}')
+    assert response.headers['X-Accel-Redirect'] == f'/protected/audio/{artifact.digest[:2]}/{artifact.digest}.mp3'
+    assert response.data == b''
+
+def test_get_audio_not_found(client):
+    assert client.get('/api/audio/' + 'a' * 64).status_code == 404
+
+def test_process_async_task_stores_artifact(app, mocker):
+    from app import tasks
+
+    provider = MagicMock()
+    provider.query_async.return_value = {'status': 'Success', 'file_id': 'f1'}
+    provider.retrieve_file.return_value = {'file': {'download_url': 'https://example.com/a.mp3'}}
+    mocker.patch('app.tasks.create_app', return_value=app)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    mocker.patch('app.tasks.socketio')
+    mocker.patch('app.services.artifact_store.ArtifactStore.download',
+                 lambda self, url, ext='mp3', timeout=60: self.put_bytes(AUDIO, ext))
+
+    tasks.process_async_task('t1', None, 'voice', 'preview')
+
+    with app.app_context():
+        history = History.query.filter_by(task_id='t1').one()
+        assert history.status == 'success'
+        assert history.content_hash == hashlib.sha256(AUDIO).hexdigest()
+        assert history.file_size == len(AUDIO)
+
+def test_async_generate_ends_in_the_artifact_store(app, client, mocker):
+    provider = MagicMock(NAME='minimax')
+    provider.submit_async.return_value = {'task_id': 't2'}
+    provider.query_async.return_value = {'status': 'Success', 'file_id': 'f1'}
+    provider.retrieve_file.return_value = {'file': {'download_url': 'https://example.com/a.mp3'}}
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    mocker.patch('app.tasks.create_app', return_value=app)
+    emit = mocker.patch('app.tasks.socketio.emit')
+    submit = mocker.patch('app.tasks.executor.submit')
+    mocker.patch('app.services.artifact_store.ArtifactStore.download',
+                 lambda self, url, ext='mp3', timeout=60: self.put_bytes(AUDIO, ext))
+
+    response = client.post('/api/generate', json={'mode': 'async', 'voice_id': 'v', 'text': 'Long text'})
+    assert response.get_json()['task_id'] == 't2'
+    # The submission recorded the task and queued its poller
+    with app.app_context():
+        assert History.query.filter_by(task_id='t2').one().status == 'processing'
+    run, *args = submit.call_args.args
+    run(*args)
+
+    download_url = emit.call_args.args[1]['download_url']
+    assert download_url == f"/api/audio/{hashlib.sha256(AUDIO).hexdigest()}"
+    assert client.get(download_url).data == AUDIO
+
+def test_async_job_in_a_native_format_is_stored_and_served_as_that_format(app, client, mocker):
+    provider = MagicMock(NAME='minimax')
+    provider.supports_format.return_value = True
+    provider.submit_async.return_value = {'task_id': 't3'}
+    provider.query_async.return_value = {'status': 'Success', 'data': {'download_url': 'https://example.com/a.flac'}}
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    mocker.patch('app.tasks.create_app', return_value=app)
+    emit = mocker.patch('app.tasks.socketio.emit')
+    submit = mocker.patch('app.tasks.executor.submit')
+    download = mocker.patch('app.services.artifact_store.ArtifactStore.download', autospec=True,
+                            side_effect=lambda self, url, ext='mp3', timeout=60: self.put_bytes(b'fLaC', ext))
+
+    client.post('/api/generate', json={'mode': 'async', 'voice_id': 'v', 'text': 'Long text', 'format': 'flac'})
+    assert provider.submit_async.call_args.kwargs['format'] == 'flac'
+    run, *args = submit.call_args.args
+    run(*args)
+
+    assert download.call_args.kwargs['ext'] == 'flac'
+    response = client.get(emit.call_args.args[1]['download_url'])
+    assert response.mimetype == AUDIO_FORMATS['flac']['mimetype']
+    assert response.data == b'fLaC'
+
+def test_cache_key_ignores_param_spelling_and_defaults():
+    from app.services.artifact_store import cache_key
+    base = cache_key('P', 'hi', 'v', {})
+    assert cache_key('P', 'hi', 'v', {'mode': 'sync', 'format': 'mp3', 'speed': '1.0', 'vol': 1, 'pitch': '0'}) == base
+    assert cache_key('P', 'hi', 'v', {'speed': '1.5'}) == cache_key('P', 'hi', 'v', {'speed': 1.5})
+    assert cache_key('P', 'hi', 'v', {'speed': 1.5}) != base
+    assert cache_key('P', 'hi', 'v', {'format': 'wav'}) != base
@@ -0,0 +1,40 @@
+import json
+import requests
+from app.services.audio_payload import read_body, split_string_field
+
+def streamed_response(body, content_length=True, chunk_size=7):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response._content_consumed = True
+    if content_length:
+        response.headers['Content-Length'] = str(len(body))
+    return response
+
+def test_read_body_with_and_without_length():
+    body = b'{"data": {"audio": "' + b'ab' * 50 + b'"}}'
+    assert read_body(streamed_response(body)) == body
+    assert read_body(streamed_response(body, content_length=False)) == body
+
+def test_read_body_longer_than_announced():
+    response = streamed_response(b'0123456789')
+    response.headers['Content-Length'] = '4'
+    assert read_body(response) == b'0123456789'
+
+def test_split_string_field_returns_view_and_rest():
+    body = bytearray(b'{"base_resp": {"status_code": 0}, "data": {"audio" : "00ff", "status": 2}, "extra_info": {"audio_length": 5}}')
+    audio, rest = split_string_field(body, 'audio')
+    assert isinstance(audio, memoryview)
+    assert bytes(audio) == b'00ff'
+    assert rest == {'base_resp': {'status_code': 0}, 'data': {'audio': '', 'status': 2}, 'extra_info': {'audio_length': 5}}
+
+def test_split_string_field_falls_back_on_escapes():
+    body = bytearray(json.dumps({'data': 'ab\\/cd', 'code': 3000}).encode())
+    value, rest = split_string_field(body, 'data')
+    assert value is None
+    assert rest['data'] == 'ab\\/cd'
+
+def test_split_string_field_missing_key():
+    value, rest = split_string_field(bytearray(b'{"code": 3001, "message": "quota"}'), 'data')
+    assert value is None
+    assert rest == {'code': 3001, 'message': 'quota'}
@@ -0,0 +1,174 @@
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from unittest.mock import MagicMock
+from app.extensions import db
+from app.models import User, Audiobook, AudiobookChapter
+from app.services.artifact_store import ArtifactStore
+from app.services.audiobook import mp3_audio_span, chapter_tag, assemble_mp3, ChapterMarker
+from app.services.task_leases import task_leases
+from app.tasks import run_audiobook
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz: 417-byte frames of 1152 samples
+FRAME_HEADER = b'\xff\xfb\x90\x00'
+FRAME_LENGTH = 417
+
+def make_mp3(frames, fill=b'\x00'):
+    frame = FRAME_HEADER + fill * (FRAME_LENGTH - 4)
+    xing = FRAME_HEADER + b'\x00' * 32 + b'Xing' + b'\x00' * (FRAME_LENGTH - 40)
+    id3 = b'ID3\x04\x00\x00\x00\x00\x00\x05' + b'\x00' * 5
+    return id3 + xing + frame * frames + b'TAG' + b'\x00' * 125
+
+def test_mp3_audio_span_skips_tags_and_xing_frame():
+    data = make_mp3(10)
+    start, end, duration_ms = mp3_audio_span(data)
+    assert start == 15 + FRAME_LENGTH
+    assert end == len(data) - 128
+    assert duration_ms == round(10 * 1152 / 44100 * 1000)
+
+    with pytest.raises(ValueError):
+        mp3_audio_span(b'not audio at all')
+
+def test_assemble_mp3_writes_chapter_markers(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first = store.put_bytes(make_mp3(10, b'\x01'))
+    second = store.put_bytes(make_mp3(20, b'\x02'))
+
+    artifact, markers = assemble_mp3(store, 'Book', [('One', first), ('Two', second)])
+
+    one_ms = round(10 * 1152 / 44100 * 1000)
+    two_ms = round(20 * 1152 / 44100 * 1000)
+    assert markers == [ChapterMarker('One', 0, one_ms), ChapterMarker('Two', one_ms, one_ms + two_ms)]
+    with open(artifact.path, 'rb') as f:
+        data = f.read()
+    tag = chapter_tag('Book', markers)
+    assert data.startswith(tag)
+    assert tag.count(b'CHAP') == 2 and b'CTOC' in tag
+    # Only audio frames follow the tag: 30 frames, no per-chapter tags or Xing headers
+    assert len(data) - len(tag) == 30 * FRAME_LENGTH
+    assert b'Xing' not in data and b'TAG' not in data
+    assert mp3_audio_span(data)[2] == round(30 * 1152 / 44100 * 1000)
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(username='reader')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+def make_book(user_id, texts):
+    book = Audiobook(user_id=user_id, title='Book', voice_id='voice', voice_name='Voice',
+                     params=json.dumps({'format': 'mp3'}), status='processing')
+    book.chapters = [AudiobookChapter(position=i, title=f'Chapter {i + 1}', text=text, status='pending', attempts=0)
+                     for i, text in enumerate(texts)]
+    db.session.add(book)
+    db.session.commit()
+    return book.id
+
+def test_run_audiobook_retries_failed_chapter_and_assembles(app, user_id, mocker):
+    app.config.update(AUDIOBOOK_POLL_INTERVAL=0, AUDIOBOOK_MAX_PARALLEL_CHAPTERS=2)
+    mocker.patch('app.tasks.socketio')
+    audio = {f'https://cdn/{i}': make_mp3(5, bytes((i,))) for i in range(1, 5)}
+    mocker.patch.object(ArtifactStore, 'download', lambda self, url, ext='mp3', timeout=60: self.put_bytes(audio[url], ext))
+
+    provider = MagicMock()
+    provider.submit_async.side_effect = [{'task_id': 1}, {'task_id': 2}, {'task_id': 3}, {'task_id': 4}]
+    results = {
+        '1': [{'status': 'Processing'}, {'status': 'Success', 'data': {'download_url': 'https://cdn/1'}}],
+        '2': [{'status': 'Failed'}],
+        '3': [{'status': 'Success', 'data': {'download_url': 'https://cdn/3'}}],
+        '4': [{'status': 'Success', 'data': {'download_url': 'https://cdn/4'}}],
+    }
+    provider.query_async.side_effect = lambda task_id: results[task_id].pop(0)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+
+    with app.app_context():
+        book_id = make_book(user_id, ['first', 'second', 'third'])
+        run_audiobook(book_id)
+
+        book = db.session.get(Audiobook, book_id)
+        assert book.status == 'success'
+        assert [c.status for c in book.chapters] == ['success'] * 3
+        # Only the failed chapter was submitted again
+        assert [c.attempts for c in book.chapters] == [1, 2, 1]
+        assert provider.submit_async.call_count == 4
+        # Two in flight at a time; the failed chapter goes back to the front of the queue
+        assert [c.args[0] for c in provider.submit_async.call_args_list] == ['first', 'second', 'second', 'third']
+        assert book.content_hash and all(c.duration_ms for c in book.chapters)
+
+def test_run_audiobook_reuses_synthesized_chapters(app, user_id, mocker):
+    app.config.update(AUDIOBOOK_POLL_INTERVAL=0, AUDIOBOOK_CHAPTER_MAX_ATTEMPTS=1)
+    mocker.patch('app.tasks.socketio')
+    mocker.patch.object(ArtifactStore, 'download', lambda self, url, ext='mp3', timeout=60: self.put_bytes(make_mp3(3), ext))
+    provider = MagicMock()
+    provider.submit_async.return_value = {'task_id': 'a'}
+    provider.query_async.return_value = {'status': 'Success', 'data': {'download_url': 'https://cdn/a'}}
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+
+    with app.app_context():
+        run_audiobook(make_book(user_id, ['same text']))
+        run_audiobook(make_book(user_id, ['same text']))
+    provider.submit_async.assert_called_once()
+
+def test_audiobook_interrupted_by_a_restart_is_resumed(app, user_id, mocker):
+    app.config.update(AUDIOBOOK_POLL_INTERVAL=0)
+    mocker.patch('app.tasks.socketio')
+    mocker.patch('app.tasks.create_app', return_value=app)
+    mocker.patch('app.tasks.executor.submit', side_effect=lambda fn, *args: fn(*args))
+    mocker.patch.object(ArtifactStore, 'download', lambda self, url, ext='mp3', timeout=60: self.put_bytes(make_mp3(3), ext))
+    provider = MagicMock()
+    provider.submit_async.return_value = {'task_id': 'new'}
+    provider.query_async.side_effect = lambda task_id: {'status': 'Success', 'data': {'download_url': f'https://cdn/{task_id}'}}
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+
+    with app.app_context():
+        # The previous process submitted the first chapter, then died
+        book_id = make_book(user_id, ['first', 'second'])
+        book = db.session.get(Audiobook, book_id)
+        book.lease_owner, book.lease_expires_at = 'dead-node', datetime.utcnow() - timedelta(seconds=1)
+        book.chapters[0].status, book.chapters[0].task_id, book.chapters[0].attempts = 'processing', 'old', 1
+        # Still being run by a live node
+        running_id = make_book(user_id, ['third'])
+        running = db.session.get(Audiobook, running_id)
+        running.lease_owner, running.lease_expires_at = 'live-node', datetime.utcnow() + timedelta(seconds=60)
+        db.session.commit()
+
+        assert task_leases.recover_audiobooks() == [book_id]
+        db.session.expire_all()
+        book = db.session.get(Audiobook, book_id)
+        assert book.status == 'success' and book.lease_owner == task_leases.node_id
+        # The in-flight chapter was polled, not resubmitted
+        assert [c.args[0] for c in provider.submit_async.call_args_list] == ['second']
+        assert [c.attempts for c in book.chapters] == [1, 1]
+        assert db.session.get(Audiobook, running_id).status == 'processing'
+        assert task_leases.recover_audiobooks() == []
+
+def test_audiobook_routes(app, client, user_id, mocker):
+    mocker.patch('app.routes.extract_chapters_from_epub',
+                 return_value=[('Cover', '  '), ('One', 'Chapter  one text.'), ('Two', 'Chapter two.')])
+    mocker.patch('app.routes.get_provider', return_value=MagicMock(get_voices=lambda: [{'id': 'v1', 'name': 'Voice 1'}]))
+    submit = mocker.patch('app.tasks.executor.submit')
+
+    assert client.post('/api/audiobooks').status_code == 401
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+
+    response = client.post('/api/audiobooks', data={
+        'file': (io.BytesIO(b'epub'), 'My Book.epub'), 'voice_id': 'v1', 'speed': '1.2'})
+    assert response.status_code == 202
+    data = response.get_json()
+    assert data['title'] == 'My Book' and data['voice_name'] == 'Voice 1'
+    assert [c['title'] for c in data['chapters']] == ['One', 'Two']
+    submit.assert_called_once()
+
+    with app.app_context():
+        book = db.session.get(Audiobook, data['id'])
+        assert book.chapters[0].text == 'Chapter one text.'
+        assert json.loads(book.params) == {'format': 'mp3', 'speed': '1.2'}
+
+    assert client.get(f"/api/audiobooks/{data['id']}").get_json()['status'] == 'processing'
+    assert client.post(f"/api/audiobooks/{data['id']}/retry").status_code == 409
+    assert client.get('/api/audiobooks/999').status_code == 404
@@ -0,0 +1,117 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from flask_caching.backends import FileSystemCache, SimpleCache
+from app.services.cache import LRUCache, LayeredCache
+
+def make_cache(backend, local_ttl=5.0):
+    layered = LayeredCache()
+    layered.backend = backend
+    layered.local_ttl = local_ttl
+    layered.lock_poll_interval = 0.005
+    return layered
+
+def run_concurrently(n, target):
+    results = [None] * n
+    def run(i):
+        results[i] = target(i)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+def test_lru_evicts_least_recently_used_and_expires():
+    lru = LRUCache(maxsize=2)
+    lru.set('a', 1, 60)
+    lru.set('b', 2, 60)
+    assert lru.get('a') == 1
+    lru.set('c', 3, 60)
+    assert (lru.get('a'), lru.get('b'), lru.get('c')) == (1, None, 3)
+    lru.set('d', 4, -1)
+    assert lru.get('d') is None
+
+def test_processes_share_entries_through_the_backend():
+    shared = SimpleCache()
+    first, second = make_cache(shared), make_cache(shared)
+    first.set('k', {'v': 1}, timeout=60)
+    assert second.get('k') == {'v': 1}
+
+    # Local copies are only trusted for local_ttl
+    first.set('k', {'v': 2}, timeout=60)
+    assert second.get('k') == {'v': 1}
+    second.local.clear()
+    assert second.get('k') == {'v': 2}
+
+def test_get_or_set_runs_one_producer_per_key_across_processes():
+    shared = SimpleCache()
+    caches = [make_cache(shared), make_cache(shared)]
+    calls = []
+
+    def producer():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'value'
+
+    results = run_concurrently(8, lambda i: caches[i % 2].get_or_set('k', producer, timeout=60))
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+def test_get_or_set_timeout_can_depend_on_value():
+    layered = make_cache(SimpleCache(), local_ttl=0)
+    layered.get_or_set('done', lambda: {'status': 'Success'}, lambda v: 300 if v['status'] == 'Success' else 1)
+    assert layered.backend.get('done') == {'status': 'Success'}
+
+def test_sub_second_timeouts_still_expire():
+    backend = MagicMock()
+    make_cache(backend).set('k', 'v', timeout=0.5)
+    assert backend.set.call_args.kwargs['timeout'] == 1
+
+def test_reinit_keeps_the_local_tier(app):
+    from app.services.cache import layered_cache
+    layered_cache.set('kept', 'value', timeout=60)
+    local = layered_cache.local
+    layered_cache.init_app(app)
+    assert layered_cache.local is local
+    assert local.get('kept') == 'value'
+
+def test_expired_filesystem_lock_is_taken_over(tmp_path):
+    backend = FileSystemCache(str(tmp_path))
+    layered = make_cache(backend)
+    layered.lock_timeout = 1
+    backend.set('lock:k', 'dead-worker', timeout=1)
+    time.sleep(1.1)
+
+    start = time.monotonic()
+    assert layered.get_or_set('k', lambda: 'value') == 'value'
+    assert time.monotonic() - start < 0.5
+    assert backend.get('lock:k') is None
+
+def test_concurrent_identical_generate_requests_synthesize_once(app, mocker):
+    provider = MagicMock(NAME='minimax')
+
+    def generate_sync(text, voice_id, **kwargs):
+        time.sleep(0.05)
+        return b'audio'
+
+    provider.generate_sync.side_effect = generate_sync
+    mocker.patch('app.routes.get_provider', return_value=provider)
+
+    def post(_i):
+        return app.test_client().post('/api/generate', json={'mode': 'sync', 'voice_id': 'v', 'text': 'Same text'})
+
+    responses = run_concurrently(4, post)
+    assert [r.status_code for r in responses] == [200] * 4
+    assert {r.data for r in responses} == {b'audio'}
+    assert provider.generate_sync.call_count == 1
+    assert sorted(r.headers['X-Billed-Characters'] for r in responses) == ['0', '0', '0', '9']
+
+def test_query_status_is_shared_between_pollers(client, mocker):
+    provider = MagicMock(NAME='minimax')
+    provider.query_async.return_value = {'status': 'Processing'}
+    mocker.patch('app.routes.get_provider', return_value=provider)
+
+    assert client.get('/api/query?task_id=42').get_json() == {'status': 'Processing'}
+    assert client.get('/api/query?task_id=42').get_json() == {'status': 'Processing'}
+    assert provider.query_async.call_count == 1
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.extensions import db
+from app.models import History
+from app.services.eta import CompletionEstimator, Model, estimator
+
+def add_completed(task_id, provider, voice, characters, seconds):
+    created = datetime(2026, 1, 1)
+    db.session.add(History(task_id=task_id, status='success', provider=provider, voice_name=voice,
+                           characters=characters, created_at=created,
+                           completed_at=created + timedelta(seconds=seconds)))
+
+def test_durations_are_learned_per_provider_and_voice(app):
+    with app.app_context():
+        for i in range(6):
+            # 5 s overhead and 1 s per 100 characters for voice a, twice as slow for voice b
+            add_completed(f'a{i}', 'minimax', 'a', 1000 * (i + 1), 5 + 10 * (i + 1))
+        for i in range(3):
+            add_completed(f'b{i}', 'minimax', 'b', 1000 * (i + 1), 5 + 20 * (i + 1))
+        db.session.commit()
+
+        local = CompletionEstimator(app)
+        local.refresh()
+        voice = local.model('minimax', 'a')
+        assert (round(voice.overhead, 6), round(voice.rate, 6), voice.samples) == (5, 0.01, 6)
+        # Too few samples for voice b: the provider-wide fit
+        assert local.model('minimax', 'b').samples == 9
+        assert local.model('other', 'a') is local.default
+        # Uploaded files of unknown length are estimated as an average task
+        assert voice.predict(None) == voice.predict(3500)
+
+def test_equal_lengths_keep_the_default_overhead():
+    model = Model.fit([(100, 30.0)] * 3, Model(20.0, 0.5))
+    assert (model.overhead, model.rate) == (20.0, 0.1)
+
+def test_polls_are_timed_around_the_eta(app):
+    now = datetime(2026, 1, 1, 12)
+    local = CompletionEstimator(app)
+    local.min_interval, local.max_interval = 2, 30
+    # Half the time left, so a task finishing early isn't first seen at its ETA
+    assert local.next_delay(now + timedelta(seconds=12), now) == 6
+    assert local.next_delay(now + timedelta(seconds=600), now) == 30
+    assert local.next_delay(now + timedelta(seconds=1), now) == 2
+    # Late tasks are polled less and less often
+    assert local.next_delay(now - timedelta(seconds=20), now) == 10
+    assert local.next_delay(now - timedelta(seconds=200), now) == 30
+
+    # Provider-reported progress extrapolates the time spent so far
+    history = SimpleNamespace(created_at=now - timedelta(seconds=30), provider='minimax', voice_name='a',
+                              characters=10)
+    assert local.eta(history, now, progress=0.75) == now + timedelta(seconds=10)
+
+def test_poll_loop_sleeps_towards_the_eta_and_records_completion(app, mocker):
+    from app import tasks
+    provider = MagicMock(NAME='minimax')
+    provider.query_async.side_effect = [{'status': 'Processing'}, {'status': 'Processing', 'progress': 50},
+                                        {'status': 'Success', 'file_id': 1}]
+    provider.retrieve_file.return_value = {'file': {'download_url': 'http://x/a.mp3'}}
+    mocker.patch('app.tasks.create_app', return_value=app)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    mocker.patch('app.tasks.get_artifact_store').return_value.download.side_effect = OSError('offline')
+    mocker.patch('app.tasks.query_task', side_effect=lambda provider, task_id: provider.query_async(task_id))
+    sleep = mocker.patch('app.tasks.time.sleep')
+    emit = mocker.patch('app.tasks.socketio.emit')
+    app.config['ASYNC_POLL_MAX_INTERVAL'] = 30
+    estimator.init_app(app)
+    mocker.patch.object(estimator, 'model', return_value=Model(10.0, 0.01))
+
+    with app.app_context():
+        db.session.add(History(task_id='t1', status='processing', provider='minimax', characters=1000,
+                               created_at=datetime.utcnow()))
+        db.session.commit()
+
+    tasks.process_async_task('t1', None, 'voice', 'preview')
+
+    delays = [call.args[0] for call in sleep.call_args_list]
+    assert len(delays) == 2 and 9 <= delays[0] <= 10
+    updates = [call.args[1] for call in emit.call_args_list]
+    assert [u['status'] for u in updates] == ['processing', 'processing', 'success']
+    assert 18 <= updates[0]['eta_seconds'] <= 20
+    with app.app_context():
+        history = History.query.filter_by(task_id='t1').one()
+        assert history.status == 'success' and history.completed_at is not None
+        assert history.to_dict()['eta'] is not None
+
+def run_simulated_tasks(app, mocker, tasks_run):
+    """Poll tasks of (characters, true seconds) one after another on a simulated clock."""
+    from app import tasks
+    # A day per task so far, so these complete after every earlier task
+    clock = {'now': datetime(2026, 1, 1) + timedelta(days=History.query.count())}
+
+    class Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return clock['now']
+
+    def query(provider, task_id):
+        done = clock['now'] >= started[task_id] + timedelta(seconds=durations[task_id])
+        return {'status': 'Success', 'file_id': 1} if done else {'status': 'Processing'}
+
+    started, durations = {}, {}
+    provider = MagicMock(NAME='minimax')
+    provider.retrieve_file.return_value = {'file': {'download_url': 'http://x/a.mp3'}}
+    mocker.patch('app.tasks.datetime', Clock)
+    mocker.patch('app.tasks.time.sleep', side_effect=lambda s: clock.update(now=clock['now'] + timedelta(seconds=s)))
+    mocker.patch('app.tasks.create_app', return_value=app)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    mocker.patch('app.tasks.get_artifact_store').return_value.download.side_effect = OSError('offline')
+    mocker.patch('app.tasks.query_task', side_effect=query)
+    mocker.patch('app.tasks.socketio.emit')
+
+    for characters, duration in tasks_run:
+        task_id = f"t{History.query.count()}"
+        started[task_id], durations[task_id] = clock['now'], duration
+        db.session.add(History(task_id=task_id, status='processing', provider='minimax', voice_name='a',
+                               characters=characters, created_at=clock['now']))
+        db.session.commit()
+        tasks.process_async_task(task_id, None, 'a', 'preview')
+
+def test_estimates_learn_that_tasks_got_faster(app, mocker):
+    app.config.update(ASYNC_POLL_MAX_INTERVAL=120, TASK_LEASE_TTL=600, ASYNC_ETA_WINDOW=5)
+    estimator.init_app(app)
+    with app.app_context():
+        for i in range(5):
+            add_completed(f'old{i}', 'minimax', 'a', 1000 * (i + 1), 50 + 10 * (i + 1))
+        db.session.commit()
+        estimator.refresh()
+        estimates = [estimator.estimate('minimax', 'a', 3000)]
+        # Tasks are now 7x faster; polls landing on the ETA would keep recording the old durations
+        for _ in range(4):
+            run_simulated_tasks(app, mocker, [(1000 * (i + 1), 2 + 2 * (i + 1)) for i in range(5)])
+            estimator.refresh()
+            estimates.append(estimator.estimate('minimax', 'a', 3000))
+    # 3000 characters now take 8 s
+    assert estimates[0] == 80 and estimates[1] < 40
+    assert abs(estimates[-1] - 8) < 1
+
+def test_provider_completion_time_is_recorded(app, mocker):
+    from app import tasks
+    provider = MagicMock(NAME='minimax')
+    provider.retrieve_file.return_value = {'file': {'download_url': 'http://x/a.mp3'}}
+    created = datetime.utcnow() - timedelta(seconds=60)
+    finished = created + timedelta(seconds=12)
+    provider.query_async.return_value = {'status': 'Success', 'file_id': 1,
+                                         'completed_at': int(finished.replace(tzinfo=timezone.utc).timestamp() * 1000)}
+    mocker.patch('app.tasks.create_app', return_value=app)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    mocker.patch('app.tasks.get_artifact_store').return_value.download.side_effect = OSError('offline')
+    mocker.patch('app.tasks.socketio.emit')
+    with app.app_context():
+        db.session.add(History(task_id='t1', status='processing', provider='minimax', characters=10,
+                               created_at=created))
+        db.session.commit()
+        tasks.process_async_task('t1', None, 'a', 'preview')
+        history = History.query.filter_by(task_id='t1').one()
+        assert round((history.completed_at - history.created_at).total_seconds()) == 12
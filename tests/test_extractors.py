@@ -0,0 +1,118 @@
+import io
+import zipfile
+import pytest
+from ebooklib import epub
+from config import Config
+from app.extractors import ExtractorRegistry, iter_lines, registry
+
+def blocks(name, data, progress=None):
+    return list(registry.get(name).extract(io.BytesIO(data), progress))
+
+def test_registry_finds_extractors_by_extension_then_mimetype():
+    assert registry.find('Book.EPUB').name == 'epub'
+    assert registry.find('notes.md', 'application/octet-stream').name == 'markdown'
+    assert registry.find('download', 'text/html; charset=utf-8').name == 'html'
+    assert registry.find('image.png', 'image/png') is None
+
+def test_extractors_are_imported_on_first_use():
+    local = ExtractorRegistry()
+    extractor = local.register('fancy', 'no_such_module.fancy:extract', ('fancy',), requires='no_such_module')
+    assert local.find('a.fancy') is extractor
+    assert not extractor.available()
+    with pytest.raises(ModuleNotFoundError):
+        extractor.load()
+
+def test_text_lines_survive_chunk_boundaries():
+    assert list(iter_lines(['one\r', '\ntwo\n\nthr', 'ee'])) == ['one', 'two', '', 'three']
+    data = 'First paragraph\nstill first.\n\n\nSecond — ünïcode.\n'.encode('utf-8')
+    assert blocks('text', data) == ['First paragraph\nstill first.', 'Second — ünïcode.']
+
+def test_markdown_keeps_words_and_drops_syntax():
+    data = b'''---
+title: Notes
+---
+# The *Time* Machine
+
+Read [the book](https://example.com) or ![cover art](cover.png) **now**.
+> Quoted `words`
+
+- first item
+- [x] second item
+
+```python
+print("not read aloud")
+```
+
+| Name | Year |
+| ---- | ---- |
+| Wells | 1895 |
+'''
+    assert blocks('markdown', data) == [
+        'The Time Machine',
+        'Read the book or cover art now.\nQuoted words',
+        'first item\nsecond item',
+        'Name, Year\nWells, 1895',
+    ]
+
+@pytest.mark.parametrize('line, expected', [
+    ('call foo_bar_baz now and 2*3*4', 'call foo_bar_baz now and 2*3*4'),
+    ('snake_case_name and a*b', 'snake_case_name and a*b'),
+    ('_one_, *two*, __three__ and ~~four~~', 'one, two, three and four'),
+    ('(*aside*) and "**quoted**"', '(aside) and "quoted"'),
+])
+def test_markdown_emphasis_follows_flanking_rules(line, expected):
+    assert blocks('markdown', line.encode('utf-8')) == [expected]
+
+def test_html_skips_scripts_and_navigation():
+    data = b'''<html><head><title>T</title><style>p {}</style></head><body>
+<nav>Home | About</nav><h1>Chapter One</h1><p>It was a <b>dark</b> night.</p>
+<script>alert(1)</script><p>The end.</p></body></html>'''
+    assert blocks('html', data) == ['Chapter One', 'It was a dark night.', 'The end.']
+
+def test_docx_paragraphs_are_streamed_from_document_xml():
+    document = ('<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+                '<w:p><w:r><w:t>Hello </w:t></w:r><w:r><w:t>world</w:t><w:tab/><w:t>tabbed</w:t></w:r></w:p>'
+                '<w:p></w:p>'
+                '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>Cell</w:t><w:br/><w:t>text</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+                '</w:body></w:document>')
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        archive.writestr('word/document.xml', document)
+    assert blocks('docx', data.getvalue()) == ['Hello world\ttabbed', 'Cell\ntext']
+
+def test_epub_reports_progress_per_spine_document(tmp_path):
+    book = epub.EpubBook()
+    book.set_identifier('id')
+    book.set_title('Book')
+    chapters = []
+    for number in (1, 2):
+        chapter = epub.EpubHtml(title=f'C{number}', file_name=f'c{number}.xhtml')
+        chapter.content = f'<html><body><p>Chapter {number} text.</p></body></html>'
+        book.add_item(chapter)
+        chapters.append(chapter)
+    book.spine = chapters
+    book.add_item(epub.EpubNcx())
+    epub.write_epub(str(tmp_path / 'book.epub'), book)
+
+    progress = []
+    texts = blocks('epub', (tmp_path / 'book.epub').read_bytes(), lambda done, total: progress.append((done, total)))
+    assert [text.strip() for text in texts] == ['Chapter 1 text.', 'Chapter 2 text.']
+    assert progress == [(1, 2), (2, 2)]
+
+def test_upload_explains_missing_optional_parser(client, mocker):
+    mocker.patch.object(registry.get('pdf'), 'available', return_value=False)
+    submit = mocker.patch('app.tasks.executor.submit')
+    response = client.post('/api/upload', data={'file': (io.BytesIO(b'%PDF-1.4'), 'paper.pdf')})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'PDF uploads need the pypdf package'
+    submit.assert_not_called()
+
+def test_every_registered_extension_can_be_uploaded():
+    assert set(registry.extensions()) <= Config.ALLOWED_EXTENSIONS
+
+def test_xhtml_upload_is_ingested_as_html(client, mocker):
+    submit = mocker.patch('app.tasks.executor.submit')
+    page = b'<html xmlns="http://www.w3.org/1999/xhtml"><body><p>Hello.</p></body></html>'
+    response = client.post('/api/upload', data={'file': (io.BytesIO(page), 'chapter.xhtml')})
+    assert response.status_code == 202
+    assert submit.call_args.args[3] == 'html'
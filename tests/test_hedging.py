@@ -0,0 +1,111 @@
+import threading
+import time
+from unittest.mock import MagicMock
+import pytest
+from app import metrics
+from app.services.hedging import HedgeBudget, Hedger, LatencyTracker
+
+def slow_then_fast_provider(name='minimax', first_delay=1.0):
+    """The first call is slow, later ones return immediately."""
+    provider = MagicMock()
+    provider.NAME = name
+    calls = []
+    release = threading.Event()
+
+    def generate_sync(text, voice_id, **kwargs):
+        calls.append(voice_id)
+        if len(calls) == 1:
+            release.wait(first_delay)
+            return b'slow'
+        return b'fast'
+
+    provider.generate_sync.side_effect = generate_sync
+    return provider, calls, release
+
+def test_latency_tracker_percentile_by_text_length():
+    tracker = LatencyTracker()
+    for i in range(1, 101):
+        tracker.record('p', 'short', i / 100)
+    tracker.record('p', 'x' * 1000, 30.0)
+    assert tracker.percentile('p', 'other', 95) == pytest.approx(0.96)
+    assert tracker.percentile('p', 'y' * 1000, 95) == 30.0
+    assert tracker.percentile('p', 'y' * 1000, 95, min_samples=2) is None
+
+def test_hedge_budget_limits_extra_calls():
+    budget = HedgeBudget(ratio=0.5, burst=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    provider, calls, release = slow_then_fast_provider()
+    hedger = Hedger(initial_delay=0.05)
+    won = metrics.HEDGED_REQUESTS.value(provider='minimax', result='hedge_won')
+
+    start = time.perf_counter()
+    assert hedger.generate_sync(provider, 'Hello', 'voice', {}) == b'fast'
+    assert time.perf_counter() - start < 0.5
+    assert calls == ['voice', 'voice']
+    assert metrics.HEDGED_REQUESTS.value(provider='minimax', result='hedge_won') == won + 1
+    release.set()
+
+def test_fast_primary_is_not_hedged():
+    provider = MagicMock(NAME='minimax')
+    provider.generate_sync.return_value = b'audio'
+    hedger = Hedger(initial_delay=1.0)
+    assert hedger.generate_sync(provider, 'Hello', 'voice', {'speed': 1}) == b'audio'
+    provider.generate_sync.assert_called_once_with('Hello', 'voice', speed=1)
+
+def test_no_hedge_without_budget():
+    provider, calls, release = slow_then_fast_provider(first_delay=0.2)
+    hedger = Hedger(initial_delay=0.01, budget_burst=0)
+    assert hedger.generate_sync(provider, 'Hello', 'voice', {}) == b'slow'
+    assert calls == ['voice']
+
+def test_hedge_to_alternate_provider_for_mapped_voices(mocker):
+    provider, calls, release = slow_then_fast_provider()
+    alternate = MagicMock(NAME='volcengine')
+    alternate.generate_sync.return_value = b'alternate'
+    alternate.supports_format.return_value = True
+    get_provider = mocker.patch('app.services.hedging.get_provider', return_value=alternate)
+    hedger = Hedger(initial_delay=0.01, alternate_provider='volcengine', voice_map={'voice': 'BV001_streaming'})
+
+    assert hedger.generate_sync(provider, 'Hello', 'voice', {}) == b'alternate'
+    get_provider.assert_called_once_with('volcengine')
+    alternate.generate_sync.assert_called_once_with('Hello', 'BV001_streaming')
+    release.set()
+
+def test_generate_route_uses_hedging_when_enabled(app, client, mocker):
+    provider, calls, release = slow_then_fast_provider()
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    app.config.update(HEDGE_ENABLED=True, HEDGE_INITIAL_DELAY=0.01)
+
+    response = client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'voice', 'text': 'Hello'})
+    assert response.data == b'fast'
+    release.set()
+
+def test_alternate_audio_is_not_cached_as_the_primary_voice(app, tmp_path, mocker):
+    from app.services.artifact_store import ArtifactStore
+    from app.services.synthesis import request_key, synthesize
+    alternate = MagicMock(NAME='volcengine')
+    # An MP3 frame, so incremental rendering can splice it
+    alternate.generate_sync.return_value = b'\xff\xfb\x90\x00' + b'\x00' * 413
+    alternate.supports_format.return_value = True
+    mocker.patch('app.services.hedging.get_provider', return_value=alternate)
+    app.config.update(HEDGE_ENABLED=True, HEDGE_INITIAL_DELAY=0.01, HEDGE_ALTERNATE_PROVIDER='volcengine',
+                      HEDGE_VOICE_MAP={'voice': 'BV001_streaming'})
+    store = ArtifactStore(str(tmp_path))
+
+    with app.app_context():
+        for incremental in (False, True):
+            provider, calls, release = slow_then_fast_provider()
+            provider.supports_format.return_value = True
+            text = 'Hello there.'
+            artifact, _billing = synthesize(provider, store, text, 'voice', {}, incremental)
+            release.set()
+            assert store.resolve(request_key(provider, text, 'voice', {}, incremental)) is None
+        # The whole-text audio is kept under the provider and voice that produced it
+        assert store.resolve(request_key(alternate, 'Hello there.', 'BV001_streaming', {})) is not None
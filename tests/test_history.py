@@ -0,0 +1,92 @@
+import pytest
+from datetime import datetime, timedelta
+from app.extensions import db
+from app.models import User, History
+
+@pytest.fixture
+def user_client(app, client):
+    with app.app_context():
+        user = User(username='alice')
+        user.set_password('pw')
+        other = User(username='bob')
+        other.set_password('pw')
+        db.session.add_all([user, other])
+        db.session.commit()
+
+        base = datetime(2024, 1, 1)
+        for i in range(7):
+            db.session.add(History(user_id=user.id, task_id=f't{i}', voice_name='v',
+                                   status='success' if i % 2 else 'failed',
+                                   text_preview=f'text {i}',
+                                   # Two rows share a timestamp to exercise the id tie-breaker
+                                   created_at=base + timedelta(minutes=min(i, 5))))
+        db.session.add(History(user_id=other.id, task_id='other', status='success', created_at=base))
+        db.session.commit()
+        user_id = user.id
+
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
+
+def test_history_requires_login(client):
+    assert client.get('/api/history').status_code == 401
+
+def test_history_keyset_pagination(user_client):
+    seen = []
+    cursor = None
+    while True:
+        params = {'limit': 3}
+        if cursor:
+            params['cursor'] = cursor
+        data = user_client.get('/api/history', query_string=params).get_json()
+        seen.extend(item['task_id'] for item in data['items'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == ['t6', 't5', 't4', 't3', 't2', 't1', 't0']
+
+def test_history_status_filter(user_client):
+    data = user_client.get('/api/history', query_string={'status': 'success'}).get_json()
+    assert [item['task_id'] for item in data['items']] == ['t5', 't3', 't1']
+    assert data['next_cursor'] is None
+    assert 'file_path' not in data['items'][0]
+
+def test_history_invalid_cursor(user_client):
+    assert user_client.get('/api/history', query_string={'cursor': '!!'}).status_code == 400
+
+def test_history_page(user_client):
+    response = user_client.get('/history')
+    assert response.status_code == 200
+    assert b'text 6' in response.data
+
+def test_history_writer_batches_updates(app):
+    from app.services.history_writer import HistoryWriter
+    from sqlalchemy import event
+
+    with app.app_context():
+        db.session.add_all([History(task_id=f'b{i}', status='processing') for i in range(3)])
+        db.session.commit()
+
+    app.config['HISTORY_FLUSH_INTERVAL'] = 60
+    writer = HistoryWriter(app)
+    writer.enqueue('b0', status='failed')
+    writer.enqueue('b0', status='success', file_size=10)  # coalesced with the previous one
+    writer.enqueue('b1', status='success', file_size=20)
+    writer.enqueue('b2', status='failed')
+
+    with app.app_context():
+        assert {h.status for h in History.query.all()} == {'processing'}
+
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        assert writer.flush() == 3
+
+        by_task = {h.task_id: h for h in History.query.all()}
+        assert (by_task['b0'].status, by_task['b0'].file_size) == ('success', 10)
+        assert (by_task['b1'].status, by_task['b1'].file_size) == ('success', 20)
+        assert by_task['b2'].status == 'failed'
+        # One executemany per column set rather than one UPDATE per task
+        assert len([s for s in statements if s.startswith('UPDATE')]) == 2
+
+    assert writer.flush() == 0
@@ -0,0 +1,54 @@
+import datetime
+import json
+import logging
+import queue
+import pytest
+from app import tracing
+from app.logging_config import JSONFormatter, QueueLogHandler, SamplingFilter
+
+def make_record(msg='hello %s', args=('world',), level=logging.INFO, exc_info=None):
+    return logging.LogRecord('app.test', level, __file__, 10, msg, args, exc_info)
+
+@pytest.mark.parametrize('created', [1700000000.0, 1700000000.123456, 1700000001.5])
+def test_timestamp_matches_isoformat(created):
+    record = make_record()
+    record.created = created
+    output = json.loads(JSONFormatter().format(record))
+    assert output['timestamp'] == datetime.datetime.fromtimestamp(created).isoformat()
+
+def test_orjson_and_stdlib_output_agree():
+    record = make_record('中文 %s', ('ok',))
+    fast = json.loads(JSONFormatter(use_orjson=True).format(record))
+    slow = json.loads(JSONFormatter(use_orjson=False).format(record))
+    assert fast == slow
+    assert fast['message'] == '中文 ok'
+
+def test_queue_handler_keeps_exception_and_trace():
+    log_queue = queue.Queue()
+    handler = QueueLogHandler(log_queue)
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        import sys
+        record = make_record(exc_info=sys.exc_info())
+
+    with tracing.traced('test', 'trace-q'):
+        handler.emit(record)
+
+    # Formatted later on the listener thread, outside the trace context
+    output = json.loads(JSONFormatter().format(log_queue.get_nowait()))
+    assert output['message'] == 'hello world'
+    assert output['trace_id'] == 'trace-q'
+    assert 'ValueError: boom' in output['exception']
+
+def test_queue_handler_drops_when_full():
+    handler = QueueLogHandler(queue.Queue(maxsize=1))
+    handler.emit(make_record())
+    handler.emit(make_record())
+    assert handler.dropped == 1
+
+def test_sampling_filter():
+    sampler = SamplingFilter(every=3)
+    kept = [sampler.filter(make_record(level=logging.DEBUG)) for _ in range(6)]
+    assert kept == [True, False, False, True, False, False]
+    assert sampler.filter(make_record(level=logging.WARNING))
@@ -0,0 +1,52 @@
+import pytest
+import requests
+from unittest.mock import MagicMock
+from app import metrics
+from app.services.minimax import MinimaxProvider
+
+def test_histogram_and_counter_render():
+    histogram = metrics.Histogram('test_latency_seconds', 'Test latency.', ('op',), buckets=(0.1, 1))
+    histogram.observe(0.05, op='a')
+    histogram.observe(0.5, op='a')
+    counter = metrics.Counter('test_events_total', 'Test events.', ('kind',))
+    counter.inc(kind='x"y')
+
+    text = metrics.render()
+    assert 'test_latency_seconds_bucket{op="a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{op="a",le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count{op="a"} 2' in text
+    assert 'test_events_total{kind="x\\"y"} 1' in text
+
+def test_provider_methods_are_instrumented(mocker, json_response):
+    mock_post = mocker.patch('requests.post')
+    mock_post.return_value = json_response({'base_resp': {'status_code': 0}, 'data': {'audio': '0011'}})
+    labels = {'provider': 'minimax', 'method': 'generate_sync'}
+    before_ok = metrics.PROVIDER_REQUESTS.value(status='ok', **labels)
+    before_calls = metrics.PROVIDER_LATENCY.count(**labels)
+    before_in = metrics.PROVIDER_BYTES_RECEIVED.value(**labels)
+    before_out = metrics.PROVIDER_BYTES_SENT.value(**labels)
+
+    MinimaxProvider(api_key='key').generate_sync('hello', 'voice')
+
+    assert metrics.PROVIDER_REQUESTS.value(status='ok', **labels) == before_ok + 1
+    assert metrics.PROVIDER_LATENCY.count(**labels) == before_calls + 1
+    assert metrics.PROVIDER_BYTES_RECEIVED.value(**labels) == before_in + 2
+    assert metrics.PROVIDER_BYTES_SENT.value(**labels) == before_out + 5
+
+def test_provider_http_errors_counted_by_status(mocker):
+    response = MagicMock(status_code=429)
+    mock_get = mocker.patch('requests.get')
+    mock_get.return_value.raise_for_status.side_effect = requests.HTTPError(response=response)
+    labels = {'provider': 'minimax', 'method': 'query_async'}
+    before = metrics.PROVIDER_REQUESTS.value(status='429', **labels)
+
+    with pytest.raises(requests.HTTPError):
+        MinimaxProvider(api_key='key').query_async('task')
+
+    assert metrics.PROVIDER_REQUESTS.value(status='429', **labels) == before + 1
+
+def test_metrics_endpoint(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert b'# TYPE tts_provider_request_seconds histogram' in response.data
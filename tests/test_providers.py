@@ -3,6 +3,7 @@ from unittest.mock import MagicMock, patch
 from app.services.minimax import MinimaxProvider
 from app.services.volcengine_tts import VolcengineProvider
 import io
+from conftest import make_json_response
 
 class TestTTSProviders(unittest.TestCase):
 
@@ -16,12 +17,10 @@ class TestTTSProviders(unittest.TestCase):
         provider = MinimaxProvider(api_key="test_key")
 
         # Mock successful response
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response = make_json_response({
             'base_resp': {'status_code': 0},
             'data': {'audio': '001122'} # Hex audio
-        }
+        })
         mock_post.return_value = mock_response
 
         audio = provider.generate_sync("hello", "voice_1")
@@ -42,12 +41,10 @@ class TestTTSProviders(unittest.TestCase):
         # Test without Secret Key (SaaS mode)
         provider = VolcengineProvider(app_id="app1", access_token="tok1")
 
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response = make_json_response({
             'code': 3000,
             'data': 'AQID' # Base64 for 010203
-        }
+        })
         mock_req.return_value = mock_response
 
         audio = provider.generate_sync("hello", "voice_1")
@@ -62,12 +59,10 @@ class TestTTSProviders(unittest.TestCase):
         # Test with Secret Key (Signed mode)
         provider = VolcengineProvider(app_id="app1", access_token="tok1", secret_key="sec1")
 
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response = make_json_response({
             'code': 3000,
             'data': 'AQID'
-        }
+        })
         mock_req.return_value = mock_response
 
         audio = provider.generate_sync("hello", "voice_1")
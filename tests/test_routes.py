@@ -1,3 +1,4 @@
+import io
 import json
 import pytest
 from unittest.mock import MagicMock
@@ -38,11 +39,12 @@ def test_generate_sync_api(client, mocker):
     assert response.mimetype == 'audio/mpeg'
 
 def test_generate_async_api(client, mocker):
-    mock_provider = MagicMock()
+    mock_provider = MagicMock(NAME='minimax')
     mock_provider.submit_async.return_value = {'task_id': 'task-123'}
 
     # Same fix here: patch app.routes.get_provider
     mocker.patch('app.routes.get_provider', return_value=mock_provider)
+    submit = mocker.patch('app.tasks.executor.submit')
 
     data = {
         'mode': 'async',
@@ -59,9 +61,75 @@ def test_generate_async_api(client, mocker):
     assert response.status_code == 200
     json_data = response.get_json()
     assert json_data['task_id'] == 'task-123'
+    assert json_data['eta_seconds'] > 0
+    # The task is polled in the background
+    assert submit.call_args.args[1] == 'task-123'
 
 def test_generate_validation_error(client):
     # Missing voice_id
     response = client.post('/api/generate',
                            json={'text': 'hi'})
     assert response.status_code == 400
+
+def test_generate_sync_reuses_stored_audio(client, mocker):
+    mock_provider = MagicMock()
+    mock_provider.generate_sync.return_value = b'audio_content'
+    mocker.patch('app.routes.get_provider', return_value=mock_provider)
+
+    data = {'mode': 'sync', 'voice_id': 'voice-1', 'text': 'Hello world'}
+    first = client.post('/api/generate', json=data)
+    second = client.post('/api/generate', json=data)
+
+    assert first.data == second.data == b'audio_content'
+    assert first.headers['ETag'] == second.headers['ETag']
+    mock_provider.generate_sync.assert_called_once()
+
+    # Conditional request for audio the client already has
+    response = client.post('/api/generate', json=data, headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+
+    # The stable location supports byte ranges for seeking
+    response = client.get(first.headers['Content-Location'], headers={'Range': 'bytes=6-'})
+    assert response.status_code == 206
+    assert response.data == b'content'
+
+def test_generate_sync_params_change_cache_key(client, mocker):
+    mock_provider = MagicMock()
+    mock_provider.generate_sync.return_value = b'audio_content'
+    mocker.patch('app.routes.get_provider', return_value=mock_provider)
+
+    client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'voice-1', 'text': 'Hi', 'speed': 1})
+    client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'voice-1', 'text': 'Hi', 'speed': 2})
+
+    assert mock_provider.generate_sync.call_count == 2
+
+def test_generate_normalizes_text_before_synthesis(client, mocker):
+    mock_provider = MagicMock()
+    mock_provider.generate_sync.return_value = b'audio_content'
+    mocker.patch('app.routes.get_provider', return_value=mock_provider)
+
+    client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'voice-1', 'text': '  Hello&nbsp;\n\n\n\n world  '})
+    # Same text after normalization reuses the stored audio
+    client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'voice-1', 'text': 'Hello \n\nworld'})
+
+    mock_provider.generate_sync.assert_called_once()
+    args, kwargs = mock_provider.generate_sync.call_args
+    assert args[0] == 'Hello\n\nworld'
+    assert 'normalize' not in kwargs
+
+    client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'voice-1', 'text': 'a  b', 'normalize': False})
+    assert mock_provider.generate_sync.call_args[0][0] == 'a  b'
+
+def test_upload_normalizes_text_files(client, mocker):
+    mock_provider = MagicMock()
+    uploaded = []
+    # The spooled upload is closed once the request is done, so read it during the call
+    mock_provider.upload_file.side_effect = lambda filename, stream, mimetype, size: \
+        uploaded.append((stream.read(), size)) or {'file': {'file_id': 1}}
+    mocker.patch('app.routes.get_provider', return_value=mock_provider)
+
+    body = ('Book Title\nFirst line.\n' * 3).encode('utf-8')
+    response = client.post('/api/upload', data={'file': (io.BytesIO(body), 'book.txt')})
+
+    assert response.status_code == 200
+    assert uploaded == [(b'First line.\nFirst line.\nFirst line.', 35)]
@@ -0,0 +1,87 @@
+import threading
+import time
+import pytest
+from app.services.scheduler import ProviderScheduler, scheduling
+
+def make_scheduler(max_concurrency, interactive_reserved):
+    s = ProviderScheduler()
+    s.max_concurrency = max_concurrency
+    s.interactive_reserved = interactive_reserved
+    return s
+
+def queue_call(s, order, name, priority, user):
+    """Start a thread that waits for a slot, records its name and releases it."""
+    queued = sum(s.stats()['queued'].values())
+
+    def run():
+        with s.slot(priority, user):
+            order.append(name)
+    thread = threading.Thread(target=run)
+    thread.start()
+    # Wait until it is queued, so arrival order is deterministic
+    while sum(s.stats()['queued'].values()) == queued:
+        time.sleep(0.001)
+    return thread
+
+def test_reserved_slots_only_admit_interactive_calls():
+    s = make_scheduler(2, 1)
+    s.acquire('bulk', 'a')
+    admitted = threading.Event()
+    thread = threading.Thread(target=lambda: (s.acquire('standard', 'b'), admitted.set()))
+    thread.start()
+    assert not admitted.wait(0.05)
+
+    s.acquire('interactive', 'c')
+    assert s.stats() == {'active': 2, 'queued': {'interactive': 0, 'standard': 1, 'bulk': 0}}
+    s.release()
+    s.release()
+    assert admitted.wait(1)
+    thread.join()
+    s.release()
+    assert s.stats()['active'] == 0
+
+def test_waiters_are_served_by_priority_then_round_robin_per_user():
+    s = make_scheduler(1, 0)
+    order = []
+    s.acquire('standard', 'holder')
+    threads = [
+        queue_call(s, order, 'a1', 'bulk', 'a'),
+        queue_call(s, order, 'a2', 'bulk', 'a'),
+        queue_call(s, order, 'a3', 'bulk', 'a'),
+        queue_call(s, order, 'b1', 'bulk', 'b'),
+        queue_call(s, order, 's1', 'standard', 'a'),
+        queue_call(s, order, 'i1', 'interactive', 'c'),
+    ]
+    s.release()
+    for thread in threads:
+        thread.join(1)
+    assert order == ['i1', 's1', 'a1', 'b1', 'a2', 'a3']
+
+def test_scheduling_context_sets_priority_and_user():
+    s = make_scheduler(2, 1)
+    s.acquire('bulk', 'a')
+    with scheduling('interactive', 'u1'):
+        # Only an interactive call fits in the reserved slot
+        s.acquire()
+    assert s.stats()['active'] == 2
+    s.release()
+    s.release()
+
+    with pytest.raises(ValueError):
+        with scheduling('urgent'):
+            pass
+
+def test_provider_calls_hold_a_slot(mocker, json_response):
+    from app.services.minimax import MinimaxProvider
+    from app.services.scheduler import scheduler
+    seen = []
+
+    def post(*args, **kwargs):
+        seen.append(scheduler.stats()['active'])
+        return json_response({'base_resp': {'status_code': 0}, 'data': {'audio': '00'}})
+
+    mocker.patch('requests.post', side_effect=post)
+    active = scheduler.stats()['active']
+    MinimaxProvider(api_key='key').generate_sync('hi', 'voice')
+    assert seen == [active + 1]
+    assert scheduler.stats()['active'] == active
@@ -0,0 +1,70 @@
+from unittest.mock import MagicMock
+from app.services.artifact_store import ArtifactStore
+from app.services.audiobook import mp3_audio_span
+from app.services.sentence_memo import split_sentences, render_incremental
+
+FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+
+def fake_provider():
+    provider = MagicMock()
+    # One frame per 10 characters so segments are distinguishable by length
+    provider.generate_sync.side_effect = lambda text, voice_id, **kwargs: FRAME * (len(text) // 10 + 1)
+    return provider
+
+def test_split_sentences():
+    text = 'Hello there. Dr. Smith said "hi!" and left.\n\nNew   para? Yes. 你好，世界。这是一个测试。'
+    assert split_sentences(text) == [
+        'Hello there.', 'Dr. Smith said "hi!"', 'and left. New para?', 'Yes. 你好，世界。这是一个测试。'
+    ]
+    assert split_sentences('Short.') == ['Short.']
+    assert split_sentences('  \n ') == []
+
+def test_render_incremental_only_bills_changed_sentences(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    provider = fake_provider()
+    original = 'The first sentence is here. The second sentence follows. The third one ends it.'
+    edited = 'The first sentence is here. The second sentence was edited. The third one ends it.'
+
+    first, report = render_incremental(provider, store, original, 'voice', {'speed': 1})
+    assert provider.generate_sync.call_count == 3
+    assert report.billed_characters == report.total_characters == len(original) - 2
+    assert report.reused_segments == 0
+
+    provider.generate_sync.reset_mock()
+    second, report = render_incremental(provider, store, edited, 'voice', {'speed': 1})
+    provider.generate_sync.assert_called_once()
+    assert provider.generate_sync.call_args.args[0] == 'The second sentence was edited.'
+    assert provider.generate_sync.call_args.kwargs['format'] == 'mp3'
+    assert report.billed_characters == len('The second sentence was edited.')
+    assert (report.segments, report.reused_segments) == (3, 2)
+
+    # The clip is the segments spliced in order
+    with open(second.path, 'rb') as f:
+        data = f.read()
+    assert data == FRAME * (3 + 4 + 3)
+    assert mp3_audio_span(data)[1] == len(data)
+
+    # Different params are separate segments
+    provider.generate_sync.reset_mock()
+    render_incremental(provider, store, edited, 'voice', {'speed': 2})
+    assert provider.generate_sync.call_count == 3
+
+def test_generate_incremental_reports_billed_characters(client, mocker):
+    provider = fake_provider()
+    mocker.patch('app.routes.get_provider', return_value=provider)
+
+    data = {'mode': 'sync', 'voice_id': 'v', 'text': 'One sentence here. Another sentence there.', 'incremental': True}
+    first = client.post('/api/generate', json=data)
+    assert first.status_code == 200
+    assert first.headers['X-Billed-Characters'] == first.headers['X-Total-Characters'] == '41'
+
+    data['text'] = 'One sentence here. A changed sentence now.'
+    second = client.post('/api/generate', json=data)
+    assert second.headers['X-Billed-Characters'] == str(len('A changed sentence now.'))
+    assert second.headers['X-Reused-Segments'] == '1'
+    assert 'incremental' not in provider.generate_sync.call_args.kwargs
+
+    # Repeating the whole request is a plain cache hit
+    third = client.post('/api/generate', json=data)
+    assert third.headers['X-Billed-Characters'] == '0'
+    assert third.data == second.data
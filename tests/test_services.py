@@ -7,12 +7,12 @@ def test_minimax_generate_sync_missing_key():
     with pytest.raises(ValueError, match="Missing API Key"):
         provider.generate_sync("test", "voice")
 
-def test_minimax_generate_sync(mocker):
+def test_minimax_generate_sync(mocker, json_response):
     mock_post = mocker.patch('requests.post')
-    mock_post.return_value.json.return_value = {
+    mock_post.return_value = json_response({
         'base_resp': {'status_code': 0},
         'data': {'audio': '48656c6c6f'} # "Hello" in hex
-    }
+    })
 
     provider = MinimaxProvider(api_key="test_key")
     result = provider.generate_sync("text", "voice_id")
@@ -20,15 +20,38 @@ def test_minimax_generate_sync(mocker):
     assert result == b'Hello'
     mock_post.assert_called_once()
 
-def test_volcengine_generate_sync(mocker):
+def test_volcengine_generate_sync(mocker, json_response):
     mock_request = mocker.patch('requests.request')
-    mock_request.return_value.json.return_value = {
+    mock_request.return_value = json_response({
         'code': 3000,
         'data': 'SGVsbG8=' # "Hello" in base64
-    }
+    })
 
     provider = VolcengineProvider(app_id="id", access_token="token")
     result = provider.generate_sync("text", "voice_id")
 
     assert result == b'Hello'
     mock_request.assert_called_once()
+
+def test_minimax_passes_native_format(mocker, json_response):
+    mock_post = mocker.patch('requests.post')
+    mock_post.return_value = json_response({'base_resp': {'status_code': 0}, 'data': {'audio': '00'}})
+
+    provider = MinimaxProvider(api_key="test_key")
+    assert provider.supports_format('flac')
+    assert not provider.supports_format('opus')
+    provider.generate_sync("text", "voice_id", format='flac', bitrate=64000)
+
+    audio_setting = mock_post.call_args.kwargs['json']['audio_setting']
+    assert audio_setting['format'] == 'flac'
+    assert audio_setting['bitrate'] == 64000
+
+def test_volcengine_maps_opus_encoding(mocker, json_response):
+    mock_request = mocker.patch('requests.request')
+    mock_request.return_value = json_response({'code': 3000, 'data': 'SGVsbG8='})
+
+    provider = VolcengineProvider(app_id="id", access_token="token")
+    assert provider.supports_format('opus')
+    provider.generate_sync("text", "voice_id", format='opus')
+
+    assert mock_request.call_args.kwargs['json']['audio']['encoding'] == 'ogg_opus'
@@ -0,0 +1,85 @@
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from app.extensions import db
+from app.models import History
+from app.services.task_leases import TaskLeases
+
+def node(node_id, ttl=60):
+    leases = TaskLeases()
+    leases.node_id = node_id
+    leases.ttl = ttl
+    return leases
+
+def add_task(task_id, status='processing', owner=None, expires_in=None):
+    db.session.add(History(task_id=task_id, status=status, lease_owner=owner,
+                           lease_expires_at=datetime.utcnow() + timedelta(seconds=expires_in)
+                           if expires_in is not None else None))
+    db.session.commit()
+
+def test_racing_nodes_claim_a_task_exactly_once(shared_db_app):
+    with shared_db_app.app_context():
+        add_task('t1')
+    nodes = [node(f'node-{i}') for i in range(4)]
+    results = {}
+    barrier = threading.Barrier(len(nodes))
+
+    def claim(leases):
+        with shared_db_app.app_context():
+            barrier.wait()
+            results[leases.node_id] = leases.claim('t1')
+
+    threads = [threading.Thread(target=claim, args=(leases,)) for leases in nodes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    winners = [node_id for node_id, claimed in results.items() if claimed]
+    assert len(results) == 4 and len(winners) == 1
+    with shared_db_app.app_context():
+        assert History.query.filter_by(task_id='t1').one().lease_owner == winners[0]
+
+def test_expired_lease_is_taken_over_and_the_old_owner_stops(shared_db_app):
+    first, second = node('a'), node('b')
+    with shared_db_app.app_context():
+        add_task('t1')
+        assert first.claim('t1')
+        assert not second.claim('t1')
+        assert first.renew('t1')
+
+        # The first node stops heartbeating
+        History.query.filter_by(task_id='t1').one().lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert second.claim('t1')
+        assert not first.renew('t1')
+        assert second.renew('t1')
+
+def test_recover_resumes_only_orphaned_processing_tasks(shared_db_app, mocker):
+    resume = mocker.patch('app.tasks.resume_async_task')
+    with shared_db_app.app_context():
+        add_task('no-owner')
+        add_task('dead-node', owner='dead', expires_in=-5)
+        add_task('live-node', owner='alive', expires_in=60)
+        add_task('finished', status='success', owner='dead', expires_in=-5)
+
+        assert sorted(node('b').recover()) == ['dead-node', 'no-owner']
+        assert sorted(call.args[0].task_id for call in resume.call_args_list) == ['dead-node', 'no-owner']
+        owners = {h.task_id: h.lease_owner for h in History.query}
+        assert owners == {'no-owner': 'b', 'dead-node': 'b', 'live-node': 'alive', 'finished': 'dead'}
+        assert node('c').recover() == []
+
+def test_poll_task_leaves_tasks_leased_by_other_nodes_alone(app, mocker):
+    from app import tasks
+    provider = MagicMock()
+    mocker.patch('app.tasks.create_app', return_value=app)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    with app.app_context():
+        add_task('t1', owner='other-node', expires_in=60)
+
+    tasks.process_async_task('t1', None, 'voice', 'preview')
+
+    provider.query_async.assert_not_called()
+    with app.app_context():
+        history = History.query.filter_by(task_id='t1').one()
+        assert (history.status, history.lease_owner) == ('processing', 'other-node')
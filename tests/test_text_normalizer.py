@@ -0,0 +1,63 @@
+import pytest
+from app import metrics
+from app.services.text_normalizer import TextNormalizer, PASS_ORDER, DEFAULT_DOCUMENT_PASSES, number_to_words
+
+def test_document_passes_clean_markup_page_numbers_and_whitespace():
+    normalizer = TextNormalizer(DEFAULT_DOCUMENT_PASSES)
+    text = '<p>Hello&nbsp;there,\u200b  world.</p>\r\n\r\n\r\n\r\n  - 12 -  \n\tNext   paragraph.\n中 文  测试'
+    assert normalizer(text) == 'Hello there, world.\n\nNext paragraph.\n中文测试'
+
+def test_default_passes_keep_number_only_lines():
+    assert TextNormalizer()('Step\n1\nthen') == 'Step\n1\nthen'
+    assert TextNormalizer()('Page 3') == 'Page 3'
+
+@pytest.mark.parametrize('text', ['42', '2024', 'Page 3', 'Step\n1\nthen'])
+def test_generate_reads_numeric_text_as_typed(client, mocker, text):
+    provider = mocker.MagicMock(NAME='minimax')
+    provider.generate_sync.return_value = b'audio'
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    response = client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'v', 'text': text})
+    assert response.status_code == 200
+    assert provider.generate_sync.call_args.args[0] == text
+
+def test_comparison_operators_are_not_treated_as_tags():
+    assert TextNormalizer()('a < b and c > d') == 'a < b and c > d'
+
+def test_running_headers_are_dropped_from_documents():
+    chapter = 'THE TIME MACHINE\nIt was a dark night.\nThe Traveller spoke.\n'
+    text = chapter * 3 + 'Yes.\nYes.\nYes.\n'
+    result = TextNormalizer(['running_headers', 'whitespace'])(text)
+    assert 'THE TIME MACHINE' not in result
+    # Repeated lines that read as sentences are kept
+    assert result.count('It was a dark night.') == 3
+    assert result.count('Yes.') == 3
+
+def test_abbreviations_and_numbers():
+    normalizer = TextNormalizer(['abbreviations', 'numbers'], abbreviations={'Co.': 'Company'})
+    text = 'Mrs. Smith of Acme Co. paid $1,250.50 on the 21st, i.e. 15% more than in 1984.'
+    assert normalizer(text) == ('Missus Smith of Acme Company paid one thousand two hundred fifty dollars and '
+                                'fifty cents on the twenty-first, that is fifteen percent more than in nineteen eighty-four.')
+    # Numbers inside words and CJK text are left to the provider
+    assert normalizer('v1.2 第3章') == 'v1.2 第3章'
+
+@pytest.mark.parametrize('n, words', [
+    (0, 'zero'), (15, 'fifteen'), (42, 'forty-two'), (100, 'one hundred'),
+    (1001, 'one thousand one'), (3_000_000, 'three million'),
+])
+def test_number_to_words(n, words):
+    assert number_to_words(n) == words
+
+def test_ssml_escaping_runs_last():
+    normalizer = TextNormalizer(['ssml', 'markup'])
+    assert normalizer('Tom &amp; <b>Jerry</b>') == 'Tom &amp;  Jerry '
+
+def test_unknown_pass_is_rejected():
+    with pytest.raises(ValueError):
+        TextNormalizer(['markup', 'spellcheck'])
+
+def test_character_counts_are_recorded():
+    before_in = metrics.TEXT_NORMALIZATION_CHARS.value(stage='input')
+    before_out = metrics.TEXT_NORMALIZATION_CHARS.value(stage='output')
+    TextNormalizer(PASS_ORDER)('a    b')
+    assert metrics.TEXT_NORMALIZATION_CHARS.value(stage='input') - before_in == 6
+    assert metrics.TEXT_NORMALIZATION_CHARS.value(stage='output') - before_out == 3
@@ -0,0 +1,101 @@
+import json
+import logging
+from datetime import timedelta
+from app import tracing
+from app.logging_config import JSONFormatter
+from app.services.volcengine_tts import VolcengineProvider
+
+def test_request_id_header_round_trip(client):
+    response = client.get('/metrics', headers={'X-Request-ID': 'abc-123'})
+    assert response.headers['X-Request-ID'] == 'abc-123'
+
+    response = client.get('/metrics', headers={'X-Request-ID': 'bad id; with spaces'})
+    assert response.headers['X-Request-ID'] != 'bad id; with spaces'
+
+def test_generate_records_stage_spans(client, mocker, caplog, json_response):
+    mocker.patch('app.config.config_manager.get_all', return_value={
+        'active_provider': 'minimax',
+        'minimax': {'api_key': 'key', 'group_id': None},
+        'voices': {'minimax': []}
+    })
+    mock_post = mocker.patch('requests.post')
+    mock_post.return_value = json_response({
+        'base_resp': {'status_code': 0}, 'data': {'audio': '0011'}, 'trace_id': 'mm-1'
+    })
+    mock_post.return_value.elapsed = timedelta(milliseconds=5)
+
+    with caplog.at_level(logging.INFO, logger='app.tracing'):
+        client.post('/api/generate', json={'voice_id': 'v', 'text': 'trace me'},
+                    headers={'X-Request-ID': 'req-1'})
+
+    record = [r for r in caplog.records if getattr(r, 'trace', None)][-1]
+    spans = {span['name']: span for span in record.trace['spans']}
+    assert record.trace['trace_id'] == 'req-1'
+    assert {'request', 'provider.construct', 'minimax.generate_sync', 'upstream', 'read_body', 'parse_json', 'decode'} <= set(spans)
+    assert spans['minimax.generate_sync']['minimax_trace_id'] == 'mm-1'
+    assert spans['upstream']['headers_ms'] == 5.0
+    # The request id is forwarded upstream, made unique per call
+    assert mock_post.call_args.kwargs['headers']['X-Request-ID'].startswith('req-1-1-')
+
+def test_volcengine_reqid_follows_trace(mocker, json_response):
+    mock_request = mocker.patch('requests.request')
+    mock_request.side_effect = lambda *args, **kwargs: json_response({'code': 3000, 'data': 'SGVsbG8='})
+    provider = VolcengineProvider(app_id='id', access_token='token')
+
+    with tracing.traced('test', 'trace-9'):
+        provider.generate_sync('one', 'voice')
+        first = mock_request.call_args.kwargs['json']['request']['reqid']
+        provider.generate_sync('two', 'voice')
+        second = mock_request.call_args.kwargs['json']['request']['reqid']
+
+    with tracing.traced('test', 'trace-9'):
+        provider.generate_sync('one', 'voice')
+        again = mock_request.call_args.kwargs['json']['request']['reqid']
+
+    assert first.startswith('trace-9-1-') and second.startswith('trace-9-2-')
+    # A second trace under the same id (e.g. a poll task) never repeats a reqid
+    assert again.startswith('trace-9-1-') and again != first
+
+def test_spans_from_worker_threads_nest_independently():
+    import contextvars
+    import threading
+    barrier = threading.Barrier(2)
+
+    def work(name):
+        with tracing.span(name):
+            barrier.wait()
+            tracing.set_attribute('worker', name)
+            with tracing.span(f'{name}.inner'):
+                barrier.wait()
+
+    with tracing.traced('test', 'trace-8') as trace:
+        with tracing.span('fan_out'):
+            threads = [threading.Thread(target=contextvars.copy_context().run, args=(work, name))
+                       for name in ('a', 'b')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            tracing.set_attribute('after', True)
+
+    spans = trace.to_dict()['spans']
+    index = {span['name']: i for i, span in enumerate(spans)}
+    assert spans[index['a']]['parent'] == spans[index['b']]['parent'] == index['fan_out']
+    assert spans[index['a.inner']]['parent'] == index['a']
+    assert spans[index['b.inner']]['parent'] == index['b']
+    assert (spans[index['a']]['worker'], spans[index['b']]['worker']) == ('a', 'b')
+    assert spans[index['fan_out']]['after'] is True
+
+def test_json_formatter_includes_trace():
+    formatter = JSONFormatter()
+    record = logging.LogRecord('x', logging.INFO, __file__, 1, 'hello', None, None)
+
+    with tracing.traced('test', 'trace-7') as trace:
+        with tracing.span('stage'):
+            pass
+        assert json.loads(formatter.format(record))['trace_id'] == 'trace-7'
+        record.trace = trace.to_dict()
+
+    output = json.loads(formatter.format(record))
+    assert [span['name'] for span in output['spans']] == ['test', 'stage']
+    assert output['spans'][1]['parent'] == 0
@@ -0,0 +1,154 @@
+import sys
+import pytest
+from unittest.mock import MagicMock
+from app.services.artifact_store import ArtifactStore
+from app.services.transcoder import Transcoder, TranscodeError
+
+FAKE_FFMPEG = '''
+import sys
+args = sys.argv[1:]
+with open(args[args.index('-i') + 1], 'rb') as f:
+    data = f.read()
+with open(sys.argv[0] + '.calls', 'a') as log:
+    log.write(' '.join(args) + '\\n')
+sys.stdout.buffer.write(b'OUT:' + args[args.index('-f') + 1].encode() + b':' + data)
+'''
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    script = tmp_path / 'ffmpeg.py'
+    script.write_text(FAKE_FFMPEG)
+    wrapper = tmp_path / 'ffmpeg'
+    wrapper.write_text(f'#!/bin/sh\nexec {sys.executable} {script} "$@"\n')
+    wrapper.chmod(0o755)
+    return wrapper, tmp_path / 'ffmpeg.py.calls'
+
+def make_transcoder(path, **config):
+    app = MagicMock()
+    app.config = {'FFMPEG_PATH': str(path), **config}
+    return Transcoder(app)
+
+def test_transcode_streams_and_caches_variant(tmp_path, fake_ffmpeg):
+    ffmpeg, calls = fake_ffmpeg
+    store = ArtifactStore(str(tmp_path / 'store'))
+    source = store.put_bytes(b'mp3data', 'mp3')
+    transcoder = make_transcoder(ffmpeg)
+
+    variant = transcoder.transcode(store, source, 'opus', bitrate=24000)
+    assert variant.ext == 'opus'
+    with open(variant.path, 'rb') as f:
+        assert f.read() == b'OUT:ogg:mp3data'
+    assert '-b:a 24000' in calls.read_text()
+
+    # Second request for the same variant is served from the store
+    assert transcoder.transcode(store, source, 'opus', bitrate=24000).digest == variant.digest
+    assert len(calls.read_text().splitlines()) == 1
+
+def test_transcode_same_format_is_noop(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    source = store.put_bytes(b'mp3data', 'mp3')
+    assert make_transcoder('/nonexistent').transcode(store, source, 'mp3') is source
+
+def test_transcode_missing_ffmpeg(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    source = store.put_bytes(b'mp3data', 'mp3')
+    with pytest.raises(TranscodeError, match='not found'):
+        make_transcoder(tmp_path / 'missing').transcode(store, source, 'wav')
+
+def test_transcode_rejects_when_queue_full(tmp_path, fake_ffmpeg):
+    store = ArtifactStore(str(tmp_path))
+    source = store.put_bytes(b'mp3data', 'mp3')
+    transcoder = make_transcoder(fake_ffmpeg[0], TRANSCODE_MAX_PENDING=1)
+    transcoder._slots.acquire()
+    with pytest.raises(TranscodeError, match='queue is full'):
+        transcoder.transcode(store, source, 'wav')
+
+def test_generate_transcodes_unsupported_format(app, client, mocker, fake_ffmpeg):
+    from app.services.transcoder import transcoder
+    mocker.patch.object(transcoder, 'ffmpeg_path', str(fake_ffmpeg[0]))
+
+    provider = MagicMock()
+    provider.supports_format.return_value = False
+    provider.generate_sync.return_value = b'mp3data'
+    mocker.patch('app.routes.get_provider', return_value=provider)
+
+    response = client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'v', 'text': 'hi', 'format': 'opus'})
+    assert response.status_code == 200
+    assert response.mimetype == 'audio/ogg'
+    assert response.data == b'OUT:ogg:mp3data'
+    assert provider.generate_sync.call_args.kwargs['format'] == 'mp3'
+
+def test_generate_rejects_unknown_format(client):
+    response = client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'v', 'text': 'hi', 'format': 'aac'})
+    assert response.status_code == 400
+
+def test_get_audio_variant(app, client, mocker, fake_ffmpeg):
+    from app.services.transcoder import transcoder
+    from app.services.artifact_store import get_artifact_store
+    mocker.patch.object(transcoder, 'ffmpeg_path', str(fake_ffmpeg[0]))
+    with app.app_context():
+        source = get_artifact_store().put_bytes(b'mp3data', 'mp3')
+
+    response = client.get(f'/api/audio/{source.digest}', query_string={'format': 'wav'})
+    assert response.mimetype == 'audio/wav'
+    assert response.data == b'OUT:wav:mp3data'
+
+def script_ffmpeg(tmp_path, body):
+    script = tmp_path / 'ffmpeg_script.py'
+    script.write_text(body)
+    wrapper = tmp_path / 'ffmpeg_script'
+    wrapper.write_text(f'#!/bin/sh\nexec {sys.executable} {script} "$@"\n')
+    wrapper.chmod(0o755)
+    return wrapper
+
+def test_reinit_during_transcode_keeps_slot_accounting(tmp_path, fake_ffmpeg):
+    store = ArtifactStore(str(tmp_path / 'store'))
+    source = store.put_bytes(b'mp3data', 'mp3')
+    transcoder = make_transcoder(fake_ffmpeg[0], TRANSCODE_MAX_PENDING=2)
+    run = transcoder._run
+
+    def reinit_then_run(*args):
+        # create_app() in a background task while this transcode holds a slot
+        transcoder.init_app(MagicMock(config={'FFMPEG_PATH': str(fake_ffmpeg[0]), 'TRANSCODE_MAX_PENDING': 3}))
+        return run(*args)
+
+    transcoder._run = reinit_then_run
+    assert transcoder.transcode(store, source, 'wav').ext == 'wav'
+    assert transcoder._slots.acquire(blocking=False)
+
+def test_timed_out_transcode_kills_ffmpeg_and_stores_nothing(tmp_path):
+    ffmpeg = script_ffmpeg(tmp_path, 'import sys, time\nsys.stdout.buffer.write(b"partial")\n'
+                                     'sys.stdout.flush()\ntime.sleep(30)\n')
+    store = ArtifactStore(str(tmp_path / 'store'))
+    source = store.put_bytes(b'mp3data', 'mp3')
+    transcoder = make_transcoder(ffmpeg, TRANSCODE_TIMEOUT=0.5)
+
+    with pytest.raises(TranscodeError, match='longer than'):
+        transcoder.transcode(store, source, 'wav')
+    transcoder._get_executor().shutdown(wait=True)
+    assert not list((tmp_path / 'store').glob('*.part'))
+    assert list((tmp_path / 'store').rglob('*.wav')) == []
+
+def test_failed_transcode_leaves_shared_artifacts_alone(tmp_path):
+    store = ArtifactStore(str(tmp_path / 'store'))
+    source = store.put_bytes(b'mp3data', 'mp3')
+    # Same bytes, hence same digest and path, as an artifact that is already stored
+    shared = store.put_bytes(b'shared', 'wav')
+    ffmpeg = script_ffmpeg(tmp_path, 'import sys\nsys.stdout.buffer.write(b"shared")\n'
+                                     'sys.stderr.write("boom")\nsys.exit(1)\n')
+
+    with pytest.raises(TranscodeError, match='boom'):
+        make_transcoder(ffmpeg).transcode(store, source, 'wav')
+    assert store.get(shared.digest) == shared
+    assert not list((tmp_path / 'store').glob('*.part'))
+
+def test_verbose_ffmpeg_does_not_deadlock(tmp_path):
+    # Far more stderr than a pipe buffer holds, written before any output
+    ffmpeg = script_ffmpeg(tmp_path, 'import sys\nsys.stderr.write("x" * 1000000)\nsys.stderr.flush()\n'
+                                     'sys.stdout.buffer.write(b"audio")\n')
+    store = ArtifactStore(str(tmp_path / 'store'))
+    source = store.put_bytes(b'mp3data', 'mp3')
+
+    variant = make_transcoder(ffmpeg, TRANSCODE_TIMEOUT=10).transcode(store, source, 'wav')
+    with open(variant.path, 'rb') as f:
+        assert f.read() == b'audio'
@@ -0,0 +1,132 @@
+import hashlib
+import io
+from unittest.mock import MagicMock
+import requests
+from werkzeug.wrappers import Request
+from app.extractors import registry as extractors
+from app.services.minimax import MinimaxProvider
+from app.services.uploads import MultipartBody, spool, spool_text
+from app.utils.validators import validate_input
+
+def test_spool_hashes_measures_and_counts_while_copying():
+    data = 'Grüße, 世界! '.encode('utf-8') * 50
+    # Tiny chunks split multi-byte characters across chunk boundaries
+    with spool(io.BytesIO(data), threshold=64, chunk_size=7) as upload:
+        assert (upload.size, upload.digest) == (len(data), hashlib.sha256(data).hexdigest())
+        assert upload.characters == len(data.decode('utf-8'))
+        assert upload.file._rolled
+        assert upload.file.read() == data
+
+    with spool(io.BytesIO(b'caf\xe9 latin-1'), chunk_size=4) as upload:
+        assert not upload.is_text and upload.text() is None
+
+def test_spool_stops_reading_past_the_limit():
+    stream = io.BytesIO(b'x' * 1000)
+    with spool(stream, limit=100, chunk_size=64) as upload:
+        assert upload.truncated
+        assert upload.size == 128
+        assert stream.tell() == 128
+
+def test_validate_input_uses_the_measured_size(app):
+    with app.app_context():
+        app.config['UPLOAD_MAX_SIZE'] = 1024 * 1024
+        assert validate_input(size=1024 * 1024) == []
+        assert validate_input(size=1024 * 1024 + 1) == ['File too large. Max size is 1MB.']
+
+def test_multipart_body_streams_with_a_known_length():
+    with spool_text('Hello "world"\n' * 1000, threshold=256, chunk_size=100) as upload:
+        body = MultipartBody({'purpose': 't2a_async_input'}, 'file', 'book "1".txt', upload.file,
+                             upload.size, 'text/plain', chunk_size=100)
+        prepared = requests.Request('POST', 'https://example.com/upload', data=body,
+                                    headers={'Content-Type': body.content_type}).prepare()
+        assert prepared.headers['Content-Length'] == str(len(body))
+        assert 'Transfer-Encoding' not in prepared.headers
+
+        payload = b''.join(body)
+        assert len(payload) == len(body)
+        parsed = Request.from_values(input_stream=io.BytesIO(payload), content_length=len(payload),
+                                     content_type=body.content_type, method='POST')
+        assert parsed.form['purpose'] == 't2a_async_input'
+        assert parsed.files['file'].filename == 'book "1".txt'
+        assert parsed.files['file'].read() == ('Hello "world"\n' * 1000).encode('utf-8')
+
+def test_minimax_upload_streams_sized_files(mocker, json_response):
+    post = mocker.patch('requests.post', return_value=json_response({'file': {'file_id': 7}}))
+    provider = MinimaxProvider(api_key='key')
+
+    assert provider.upload_file('a.txt', io.BytesIO(b'abc'), 'text/plain', size=3) == {'file': {'file_id': 7}}
+    kwargs = post.call_args.kwargs
+    assert 'files' not in kwargs and isinstance(kwargs['data'], MultipartBody)
+    assert kwargs['headers']['Content-Type'] == kwargs['data'].content_type
+
+def test_upload_rejects_oversized_and_unsupported_files(app, client, mocker):
+    provider = MagicMock()
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    app.config['UPLOAD_MAX_SIZE'] = 10
+
+    response = client.post('/api/upload', data={'file': (io.BytesIO(b'x' * 11), 'big.txt')})
+    assert response.status_code == 413
+    response = client.post('/api/upload', data={'file': (io.BytesIO(b'x'), 'image.png')})
+    assert response.status_code == 400
+    assert 'Invalid file type' in response.get_json()['error']
+    provider.upload_file.assert_not_called()
+
+def test_upload_forwards_undecodable_text_as_is(client, mocker):
+    provider = MagicMock(NAME='minimax')
+    uploaded = []
+    provider.upload_file.side_effect = lambda filename, stream, mimetype, size: \
+        uploaded.append(stream.read()) or {'file': {'file_id': 1}}
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    record = mocker.patch('app.routes.usage_tracker.record')
+
+    response = client.post('/api/upload', data={'file': (io.BytesIO(b'caf\xe9  au lait'), 'book.txt')})
+    assert response.status_code == 200
+    assert uploaded == [b'caf\xe9  au lait']
+    assert record.call_args.args[2] == 13
+
+def test_epub_upload_is_ingested_in_the_background(app, client, mocker):
+    submit = mocker.patch('app.tasks.executor.submit')
+    response = client.post('/api/upload', data={'file': (io.BytesIO(b'epub bytes'), 'Book.epub')})
+    assert response.status_code == 202
+    job = response.get_json()
+    assert (job['status'], job['filename'], job['bytes_received']) == ('queued', 'book.txt', 10)
+    assert client.get(f"/api/uploads/{job['job_id']}").get_json()['status'] == 'queued'
+    assert client.get('/api/uploads/unknown').status_code == 404
+
+    def extract(stream, progress):
+        assert stream.read() == b'epub bytes'
+        for parsed in (1, 2):
+            progress(parsed, 2)
+        return ['Chapter  one.\n\n', '\nChapter two.']
+
+    mocker.patch.object(extractors.get('epub'), 'extract', side_effect=extract)
+    mocker.patch('app.tasks.create_app', return_value=app)
+    emit = mocker.patch('app.tasks.socketio.emit')
+    provider = MagicMock(NAME='minimax')
+    uploaded = []
+    provider.upload_file.side_effect = lambda filename, stream, mimetype, size: \
+        uploaded.append((filename, stream.read(), size)) or {'file': {'file_id': 99}}
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+
+    run, *args = submit.call_args.args
+    run(*args)
+
+    assert uploaded == [('book.txt', b'Chapter one.\n\nChapter two.', 26)]
+    events = [call.args[1] for call in emit.call_args_list]
+    assert all(call.args[0] == 'upload_update' for call in emit.call_args_list)
+    assert [(e['status'], e['chapters_parsed']) for e in events[:3]] == [('parsing', 0), ('parsing', 1), ('parsing', 2)]
+    assert any(e['status'] == 'uploading' and 0 < e['bytes_uploaded'] for e in events)
+    assert (events[-1]['status'], events[-1]['file_id'], events[-1]['bytes_uploaded']) == ('success', 99, 26)
+    assert client.get(f"/api/uploads/{job['job_id']}").get_json()['file_id'] == 99
+
+def test_failed_ingestion_is_reported(app, mocker):
+    from app.tasks import run_ingestion
+    mocker.patch.object(extractors.get('epub'), 'extract', return_value=iter(['  ']))
+    mocker.patch('app.tasks.create_app', return_value=app)
+    emit = mocker.patch('app.tasks.socketio.emit')
+    with app.app_context():
+        upload = spool(io.BytesIO(b'not an epub'))
+        run_ingestion({'job_id': 'j1', 'filename': 'x.txt'}, upload, 'epub', True, None, None)
+    assert emit.call_args.args[1]['status'] == 'failed'
+    assert emit.call_args.args[1]['error'] == 'No text found in epub upload'
+    assert upload.file.closed
@@ -0,0 +1,130 @@
+from unittest.mock import MagicMock
+import pytest
+from app.config import config_manager
+from app.extensions import db
+from app.models import User, UsageCounter
+from app.services.usage import usage_tracker
+
+@pytest.fixture
+def user_client(app, client):
+    with app.app_context():
+        user = User(username='alice')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    client.user_id = user_id
+    return client
+
+@pytest.fixture
+def quotas(mocker):
+    limits = {}
+    real_get = config_manager.get
+    mocker.patch.object(config_manager, 'get',
+                        side_effect=lambda key, default=None: limits if key == 'quotas' else real_get(key, default))
+    return limits
+
+def fake_provider(mocker):
+    provider = MagicMock(NAME='minimax')
+    provider.generate_sync.return_value = b'audio'
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    return provider
+
+def test_usage_is_counted_per_period_and_flushed(app):
+    with app.app_context():
+        usage_tracker.record(7, 'minimax', 100)
+        usage_tracker.record(7, 'volcengine', 20)
+        usage_tracker.record(7, 'minimax', 5)
+        assert usage_tracker.usage(7) == (125, 3)
+
+        rows = {row.provider: (row.characters, row.requests) for row in UsageCounter.query.filter_by(user_id=7)}
+        assert rows == {'minimax': (105, 2), 'volcengine': (20, 1)}
+        assert {row.period for row in UsageCounter.query} == {usage_tracker.current_period()}
+
+def test_usage_from_other_processes_is_picked_up_on_flush(app):
+    with app.app_context():
+        assert usage_tracker.usage(8) == (0, 0)
+        # Another worker process writes to the shared database
+        db.session.add(UsageCounter(user_id=8, provider='minimax', period=usage_tracker.current_period(),
+                                    characters=500, requests=4))
+        db.session.commit()
+        assert usage_tracker.usage(8) == (0, 0)
+        usage_tracker.flush()
+        assert usage_tracker.usage(8) == (500, 4)
+
+def test_check_uses_defaults_and_per_user_overrides(app, quotas):
+    with app.app_context():
+        usage_tracker.record(9, 'minimax', 90)
+        assert usage_tracker.check(9, 'carol', 50) is None
+
+        usage_tracker.default_characters = 100
+        assert 'Character quota exceeded' in usage_tracker.check(9, 'carol', 50)
+        assert usage_tracker.check(9, 'carol', 10) is None
+
+        quotas['carol'] = {'characters': None, 'requests': 1}
+        assert 'Request quota exceeded' in usage_tracker.check(9, 'carol', 50)
+    usage_tracker.default_characters = None
+
+def test_generate_enforces_quota_before_calling_provider(user_client, quotas, mocker, login_admin):
+    provider = fake_provider(mocker)
+    quotas['alice'] = {'characters': 15}
+
+    response = user_client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'v', 'text': 'Hello world'})
+    assert response.status_code == 200
+    # Served from the cache: nothing is billed, so nothing is counted
+    response = user_client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'v', 'text': 'Hello world'})
+    assert response.status_code == 200
+
+    response = user_client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'v', 'text': 'Another text'})
+    assert response.status_code == 429
+    assert 'quota' in response.get_json()['error']
+    assert provider.generate_sync.call_count == 1
+
+    # Per-user usage is for admins only
+    assert user_client.get('/api/admin/usage').status_code == 403
+    login_admin(user_client)
+    report = user_client.get('/api/admin/usage').get_json()
+    assert report['users'] == [{
+        'user_id': user_client.user_id, 'username': 'alice', 'period': report['period'],
+        'characters': 11, 'requests': 1, 'providers': {'minimax': {'characters': 11, 'requests': 1}},
+        'character_limit': 15, 'request_limit': None,
+    }]
+
+def test_totals_survive_reinit_unless_the_period_changes(app, mocker):
+    with app.app_context():
+        usage_tracker.record(10, 'minimax', 40)
+        assert usage_tracker.usage(10) == (40, 1)
+        # create_app() in every background task re-inits the tracker
+        usage_tracker.init_app(app)
+        stored = mocker.spy(usage_tracker, '_stored_totals')
+        assert usage_tracker.usage(10) == (40, 1)
+        stored.assert_not_called()
+
+        # Counted per day from now on, so reloaded
+        app.config['QUOTA_PERIOD'] = 'day'
+        usage_tracker.init_app(app)
+        assert usage_tracker.usage(10) == (0, 0)
+        stored.assert_called_once()
+
+def test_loading_totals_does_not_wait_for_a_flush(app, mocker):
+    with app.app_context():
+        usage_tracker.record(11, 'minimax', 30)
+        usage_tracker.reset()
+        with usage_tracker._flush_lock:
+            assert usage_tracker.usage(11) == (30, 1)
+
+        # A flush lands between reading the database and adding pending usage: read again
+        usage_tracker.reset()
+        real = usage_tracker._stored_totals
+        def racing(*key):
+            row = real(*key)
+            if not racing.raced:
+                racing.raced = True
+                usage_tracker._flush_generation += 1
+            return row
+        racing.raced = False
+        stored = mocker.patch.object(usage_tracker, '_stored_totals', side_effect=racing)
+        assert usage_tracker.usage(11) == (30, 1)
+        assert stored.call_count == 2
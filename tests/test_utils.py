@@ -1,5 +1,6 @@
 import pytest
 from app.utils import extract_text_from_epub
+from app.metrics import EXTRACTION_SECONDS
 import io
 import ebooklib
 from ebooklib import epub
@@ -18,9 +19,12 @@ def test_extract_text_from_epub_success(mocker):
     mock_book.get_item_with_id.return_value = mock_item
 
     mocker.patch('ebooklib.epub.read_epub', return_value=mock_book)
+    timed = EXTRACTION_SECONDS.count(format='epub')
 
     result = extract_text_from_epub(io.BytesIO(b'dummy'))
     assert result == 'Hello World'
+    # Timed in the same series as the other upload formats
+    assert EXTRACTION_SECONDS.count(format='epub') == timed + 1
 
 def test_extract_text_from_epub_failure(mocker):
     mocker.patch('ebooklib.epub.read_epub', side_effect=Exception("Read error"))
@@ -28,3 +32,28 @@ def test_extract_text_from_epub_failure(mocker):
     # We expect None and a log message (which we won't assert here but could)
     result = extract_text_from_epub(io.BytesIO(b'dummy'))
     assert result is None
+
+def test_extract_chapters_from_epub(mocker):
+    from app.utils import extract_chapters_from_epub
+
+    def document(name, html):
+        item = mocker.Mock()
+        item.get_type.return_value = ebooklib.ITEM_DOCUMENT
+        item.get_name.return_value = name
+        item.get_content.return_value = html
+        return item
+
+    items = {
+        'cover': document('cover.xhtml', b'<html><body><img src="c.jpg"/></body></html>'),
+        'c1': document('c1.xhtml', b'<html><body><h1>Heading</h1><p>One <em>more</em> line</p></body></html>'),
+        'c2': document('c2.xhtml', b'<html><body><h2>Second</h2><p>Two</p></body></html>'),
+        'c3': document('c3.xhtml', b'<html><body><p>Three</p></body></html>'),
+    }
+    mock_book = mocker.Mock()
+    mock_book.spine = [('cover', 'yes'), ('c1', 'yes'), ('c2', 'yes'), ('c3', 'yes')]
+    mock_book.get_item_with_id.side_effect = items.get
+    mock_book.toc = [(epub.Section('Part I'), [epub.Link('c1.xhtml#start', 'From TOC', 'c1')])]
+    mocker.patch('ebooklib.epub.read_epub', return_value=mock_book)
+
+    chapters = extract_chapters_from_epub(io.BytesIO(b'dummy'))
+    assert chapters == [('From TOC', 'Heading\nOne more line'), ('Second', 'Second\nTwo'), ('Chapter 3', 'Three')]
@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock, patch
+from conftest import make_json_response
+from app.services.minimax import MinimaxProvider
+from app.services.voice_catalog import VoiceCatalog
+
+LISTING = {
+    'system_voice': [{'voice_id': 'male-qn-qingse', 'voice_name': 'Qingse'}, {'voice_id': 'audiobook_male_1'}],
+    'voice_cloning': [{'voice_id': 'my-clone'}],
+    'base_resp': {'status_code': 0},
+}
+
+def listing_response(etag='"v1"'):
+    response = make_json_response(LISTING)
+    response.headers['ETag'] = etag
+    return response
+
+def not_modified():
+    response = make_json_response({})
+    response.status_code = 304
+    return response
+
+def make_provider():
+    return MinimaxProvider(api_key='key', voices=[{'name': 'Narrator', 'id': 'audiobook_male_1'}],
+                           base_url='http://mock-minimax')
+
+@patch('requests.post')
+def test_catalog_merges_configured_and_fetched_voices(mock_post):
+    mock_post.return_value = listing_response()
+    catalog = VoiceCatalog(ttl=60)
+    provider = make_provider()
+
+    voices = catalog.voices(provider)
+    assert voices == [{'name': 'Narrator', 'id': 'audiobook_male_1'}, {'name': 'Qingse', 'id': 'male-qn-qingse'},
+                      {'name': 'my-clone', 'id': 'my-clone'}]
+    assert mock_post.call_args[0][0] == 'http://mock-minimax/v1/get_voice'
+
+    # Fresh entries are served without another request
+    catalog.voices(make_provider())
+    assert mock_post.call_count == 1
+
+@patch('requests.post')
+def test_catalog_revalidates_with_etag_after_ttl(mock_post):
+    mock_post.return_value = listing_response()
+    catalog = VoiceCatalog(ttl=0)
+    provider = make_provider()
+    first = catalog.voices(provider)
+
+    mock_post.return_value = not_modified()
+    assert catalog.voices(provider) == first
+    assert mock_post.call_args[1]['headers']['If-None-Match'] == '"v1"'
+
+@patch('requests.post')
+def test_catalog_serves_last_known_voices_when_fetch_fails(mock_post):
+    mock_post.return_value = listing_response()
+    catalog = VoiceCatalog(ttl=0, retry_interval=60)
+    provider = make_provider()
+    first = catalog.voices(provider)
+
+    mock_post.side_effect = ConnectionError('down')
+    assert catalog.voices(provider) == first
+    # The failure is not retried before the retry interval
+    assert catalog.voices(provider) == first
+    assert mock_post.call_count == 2
+
+@patch('requests.post')
+def test_unknown_voice_revalidates_at_most_once_per_interval(mock_post):
+    mock_post.return_value = listing_response()
+    catalog = VoiceCatalog(ttl=3600, retry_interval=0)
+    provider = make_provider()
+    assert catalog.is_known(provider, 'my-clone')
+    assert not catalog.is_known(provider, 'nope')
+    assert mock_post.call_count == 2
+
+    catalog.retry_interval = 3600
+    assert not catalog.is_known(provider, 'nope')
+    assert mock_post.call_count == 2
+
+def test_generate_rejects_unknown_voice_before_calling_provider(client, mocker):
+    provider = MagicMock()
+    provider.get_voices.return_value = [{'name': 'Voice 1', 'id': 'voice-1'}]
+    provider.fetch_voices.return_value = ([{'name': 'Voice 2', 'id': 'voice-2'}], None)
+    provider.generate_sync.return_value = b'audio'
+    mocker.patch('app.routes.get_provider', return_value=provider)
+
+    response = client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'missing', 'text': 'Hi'})
+    assert response.status_code == 400
+    assert 'Unknown voice_id' in response.get_json()['error']
+    provider.generate_sync.assert_not_called()
+
+    response = client.post('/api/generate', json={'mode': 'sync', 'voice_id': 'voice-2', 'text': 'Hi'})
+    assert response.status_code == 200
+
+    response = client.get('/')
+    assert b'Voice 1' in response.data and b'Voice 2' in response.data
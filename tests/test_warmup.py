@@ -0,0 +1,83 @@
+from unittest.mock import MagicMock
+from app.config import config_manager
+from app.services.warmup import WarmupJob, warmup_job
+
+CONFIG = {
+    'active_provider': 'minimax',
+    'warmup': {
+        'minimax': {'voice-1': ['Welcome back!', 'Welcome   back!', 'Goodbye.'], 'voice-2': ['Hello.']},
+        'volcengine': {'other': ['Not used.']},
+    },
+}
+
+def fake_provider(mocker):
+    provider = MagicMock()
+    provider.generate_sync.side_effect = lambda text, voice_id, **kwargs: f'{voice_id}:{text}'.encode('utf-8')
+    mocker.patch('app.services.warmup.get_provider', return_value=provider)
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    mocker.patch.object(config_manager, 'get_all', return_value=CONFIG)
+    return provider
+
+def test_warmup_fills_cache_used_by_generate(app, client, mocker):
+    provider = fake_provider(mocker)
+    job = WarmupJob(app)
+    job.rate = 0
+
+    with app.app_context():
+        job.run()
+    # "Welcome   back!" normalizes to an already warmed phrase
+    assert provider.generate_sync.call_count == 3
+    progress = job.progress()
+    assert progress['status'] == 'done' and progress['finished_at']
+    assert (progress['total'], progress['cached'], progress['synthesized'], progress['failed']) == (4, 1, 3, 0)
+
+    # The UI sends default params as strings; the request is served from the warmed cache
+    provider.generate_sync.reset_mock()
+    response = client.post('/api/generate', json={
+        'mode': 'sync', 'voice_id': 'voice-1', 'text': 'Welcome back!',
+        'format': 'mp3', 'speed': '1.0', 'vol': '1.0', 'pitch': '0'})
+    assert response.data == b'voice-1:Welcome back!'
+    assert response.headers['X-Billed-Characters'] == '0'
+    provider.generate_sync.assert_not_called()
+
+    # A second run only finds cached phrases
+    with app.app_context():
+        job.run()
+    provider.generate_sync.assert_not_called()
+    assert job.progress()['cached'] == 4
+
+def test_warmup_counts_failures(app, mocker):
+    provider = fake_provider(mocker)
+    provider.generate_sync.side_effect = RuntimeError('upstream down')
+    job = WarmupJob(app)
+    job.rate = 0
+    with app.app_context():
+        job.run()
+    progress = job.progress()
+    assert (progress['status'], progress['failed'], progress['done']) == ('done', 4, 4)
+
+def test_admin_warmup_endpoint(app, client, mocker, login_admin):
+    fake_provider(mocker)
+    app.config['WARMUP_RATE'] = 0
+    warmup_job.init_app(app)
+
+    assert client.post('/api/admin/warmup').status_code == 401
+    login_admin(client)
+    response = client.post('/api/admin/warmup')
+    assert response.status_code == 202
+    warmup_job._thread.join(timeout=5)
+
+    data = client.get('/api/admin/warmup').get_json()
+    assert data['status'] == 'done'
+    assert data['synthesized'] == 3
+    assert data['phrases'] == 4
+
+def test_admin_password_login_opens_the_admin_apis(app, client, mocker, login_admin):
+    # login_admin created the admin account; the admin password logs into it
+    mocker.patch('app.routes.config_manager.get', side_effect=lambda key, default=None:
+                 'secret' if key == 'admin_password' else default)
+    assert client.get('/api/admin/warmup').status_code == 401
+    assert client.post('/api/admin/login', json={'password': 'wrong'}).status_code == 401
+    assert client.get('/api/admin/warmup').status_code == 401
+    assert client.post('/api/admin/login', json={'password': 'secret'}).status_code == 200
+    assert client.get('/api/admin/warmup').status_code == 200
@@ -0,0 +1,230 @@
+import json
+import socket
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+import pytest
+from app.extensions import db
+from app.models import History, User, WebhookDelivery
+from app.services.webhooks import SIGNATURE_HEADER, callback_url_error, sign, verify, webhooks
+
+@pytest.fixture
+def allow_local(mocker):
+    # Loopback callbacks are refused unless allow-listed
+    mocker.patch.object(webhooks, 'allowed_hosts', frozenset({'127.0.0.1'}))
+
+@pytest.fixture
+def sink(allow_local):
+    """Local HTTP receiver; answers with the queued status codes, then 200."""
+    received, statuses = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append((dict(self.headers), body))
+            self.send_response(statuses.pop(0) if statuses else 200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/hook", received, statuses
+    server.shutdown()
+    server.server_close()
+
+def public_dns(mocker, address='93.184.216.34'):
+    mocker.patch('app.services.webhooks.socket.getaddrinfo',
+                 return_value=[(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, 443))])
+
+def finish_task(app, mocker, callback_url, status='Success', user_id=None):
+    from app import tasks
+    provider = MagicMock(NAME='minimax')
+    provider.query_async.return_value = {'status': status, 'file_id': 1}
+    provider.retrieve_file.return_value = {'file': {'download_url': 'http://x/a.mp3'}}
+    mocker.patch('app.tasks.create_app', return_value=app)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    mocker.patch('app.tasks.get_artifact_store').return_value.download.side_effect = OSError('offline')
+    mocker.patch('app.tasks.socketio.emit')
+    with app.app_context():
+        db.session.add(History(task_id='t1', user_id=user_id, status='processing', voice_name='Voice',
+                               characters=42, callback_url=callback_url))
+        db.session.commit()
+    tasks.process_async_task('t1', None, 'Voice', 'preview')
+
+def make_due():
+    WebhookDelivery.query.update({'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+def test_finished_task_is_posted_signed_to_its_callback(app, mocker, sink):
+    url, received, _statuses = sink
+    finish_task(app, mocker, url)
+    assert received == []  # only written to the outbox by the poll loop
+
+    with app.app_context():
+        assert len(webhooks.deliver_due()) == 1
+        delivery = WebhookDelivery.query.one()
+        assert (delivery.status, delivery.attempts) == ('delivered', 1)
+
+    headers, body = received[0]
+    assert verify(app.config['SECRET_KEY'], headers[SIGNATURE_HEADER], body)
+    assert headers['X-TTS-Event'] == 'task.succeeded'
+    payload = json.loads(body)
+    assert (payload['task_id'], payload['status'], payload['download_url'], payload['characters']) == \
+        ('t1', 'success', 'http://x/a.mp3', 42)
+
+def test_failed_deliveries_back_off_exponentially_until_they_give_up(app, mocker, sink):
+    url, received, statuses = sink
+    finish_task(app, mocker, url, status='Failed')
+    statuses.extend([500, 503, 502])
+    mocker.patch('app.services.webhooks.random.random', return_value=0)
+
+    with app.app_context():
+        webhooks.max_attempts = 3
+        delays = []
+        for _ in range(3):
+            before = datetime.utcnow()
+            webhooks.deliver_due()
+            delivery = WebhookDelivery.query.one()
+            delays.append(round((delivery.next_attempt_at - before).total_seconds()))
+            # Not due yet: nothing is sent
+            assert webhooks.deliver_due() == []
+            make_due()
+
+        assert (delivery.status, delivery.attempts, delivery.last_error) == ('failed', 3, 'HTTP 502')
+        assert delays[:2] == [webhooks.backoff_base, webhooks.backoff_base * 2]
+        assert webhooks.deliver_due() == []
+    assert len(received) == 3
+    assert json.loads(received[0][1])['event'] == 'task.failed'
+
+def test_unreachable_receivers_are_retried(app, mocker, allow_local):
+    finish_task(app, mocker, 'http://127.0.0.1:9/closed')
+    with app.app_context():
+        webhooks.deliver_due()
+        delivery = WebhookDelivery.query.one()
+        assert (delivery.status, delivery.attempts) == ('pending', 1)
+        assert delivery.next_attempt_at > datetime.utcnow()
+
+def test_tasks_that_crash_are_reported_as_failed(app, mocker, allow_local):
+    from app import tasks
+    provider = MagicMock(NAME='minimax')
+    provider.query_async.side_effect = RuntimeError('provider exploded')
+    mocker.patch('app.tasks.create_app', return_value=app)
+    mocker.patch('app.tasks.get_provider', return_value=provider)
+    with app.app_context():
+        db.session.add(History(task_id='t1', status='processing', voice_name='Voice',
+                               callback_url='http://127.0.0.1:9/hook'))
+        db.session.commit()
+    tasks.process_async_task('t1', None, 'Voice', 'preview')
+
+    with app.app_context():
+        assert History.query.filter_by(task_id='t1').one().status == 'error'
+        delivery = WebhookDelivery.query.one()
+        assert (delivery.event, json.loads(delivery.payload)['status']) == ('task.failed', 'failed')
+
+@pytest.mark.parametrize('url', ['http://127.0.0.1/hook', 'http://localhost:8080/hook', 'http://[::1]/hook',
+                                 'http://169.254.169.254/latest/meta-data', 'https://10.0.0.7/hook',
+                                 'http://192.168.1.1/hook', 'http://[::ffff:127.0.0.1]/hook', 'http://0.0.0.0/'])
+def test_callbacks_to_non_public_addresses_are_refused(url):
+    assert 'not a public address' in callback_url_error(url)
+
+def test_callback_url_checks():
+    assert callback_url_error('https://93.184.216.34/hook') is None
+    assert callback_url_error('http://127.0.0.1:9/hook', {'127.0.0.1'}) is None
+    assert callback_url_error('ftp://93.184.216.34/') == 'callback_url must be an http(s) URL'
+    assert callback_url_error('http://host:port/') == 'callback_url must be an http(s) URL'
+
+def test_delivery_rechecks_the_address(app, mocker):
+    # Public when the task was submitted, private by the time it is delivered
+    public_dns(mocker, '10.1.2.3')
+    post = mocker.patch.object(webhooks, 'post')
+    finish_task(app, mocker, 'https://hooks.example.com/tts')
+    with app.app_context():
+        webhooks.deliver_due()
+        delivery = WebhookDelivery.query.one()
+        assert (delivery.status, delivery.last_error) == \
+            ('failed', 'Callback host hooks.example.com is not a public address')
+    post.assert_not_called()
+
+def test_delivery_connects_to_the_checked_address(app, mocker, sink):
+    url, received, _statuses = sink
+    port = int(url.rsplit(':', 1)[1].split('/')[0])
+    answers = ['127.0.0.1']
+    real_getaddrinfo = socket.getaddrinfo
+
+    def rebinding(host, *args, **kwargs):
+        # The first lookup passes the check, any later one is rebound elsewhere
+        if host == 'hooks.test':
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (answers.pop(0) if answers else '127.0.0.2', port))]
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    mocker.patch('socket.getaddrinfo', side_effect=rebinding)
+    mocker.patch.object(webhooks, 'allowed_hosts', frozenset({'hooks.test'}))
+    finish_task(app, mocker, f'http://hooks.test:{port}/hook')
+    with app.app_context():
+        webhooks.deliver_due()
+        assert WebhookDelivery.query.one().status == 'delivered'
+    assert received[0][0]['Host'] == f'hooks.test:{port}'
+
+def test_unresolvable_hosts_are_retried(app, mocker):
+    mocker.patch('app.services.webhooks.socket.getaddrinfo', side_effect=socket.gaierror('no dns'))
+    finish_task(app, mocker, 'https://hooks.example.com/tts')
+    with app.app_context():
+        webhooks.deliver_due()
+        delivery = WebhookDelivery.query.one()
+        assert (delivery.status, delivery.attempts) == ('pending', 1)
+
+def test_a_due_delivery_is_claimed_by_one_node(app):
+    with app.app_context():
+        db.session.add(WebhookDelivery(task_id='t1', url='http://example.com', event='task.failed', payload='{}'))
+        db.session.commit()
+        delivery_id = WebhookDelivery.query.one().id
+        now = datetime.utcnow()
+        assert webhooks.claim(delivery_id, now)
+        assert not webhooks.claim(delivery_id, now)
+
+def test_signatures_cover_body_and_timestamp():
+    header = sign('secret', 1000, b'{"a": 1}')
+    assert verify('secret', header, b'{"a": 1}', now=1100)
+    assert not verify('secret', header, b'{"a": 2}', now=1100)
+    assert not verify('other', header, b'{"a": 1}', now=1100)
+    assert not verify('secret', header, b'{"a": 1}', now=2000)
+    assert not verify('secret', 'garbage', b'')
+
+def test_generate_stores_the_callback_url(app, client, mocker):
+    provider = MagicMock(NAME='minimax')
+    provider.submit_async.return_value = {'task_id': 'task-1'}
+    mocker.patch('app.routes.get_provider', return_value=provider)
+    mocker.patch('app.tasks.executor.submit')
+    public_dns(mocker)
+    data = {'mode': 'async', 'voice_id': 'voice-1', 'text': 'Hello'}
+
+    for url in ('ftp://example.com/hook', 'http://169.254.169.254/latest/meta-data'):
+        assert client.post('/api/generate', json=dict(data, callback_url=url)).status_code == 400
+    response = client.post('/api/generate', json=dict(data, callback_url='https://example.com/hook'))
+    assert response.status_code == 200
+    assert 'callback_url' not in provider.submit_async.call_args.kwargs
+    with app.app_context():
+        assert History.query.filter_by(task_id='task-1').one().callback_url == 'https://example.com/hook'
+
+def test_delivery_state_is_only_shown_to_the_task_owner(app, client, mocker):
+    with app.app_context():
+        owner, other = User(username='owner'), User(username='other')
+        db.session.add_all([owner, other])
+        db.session.commit()
+        owner_id, other_id = owner.id, other.id
+    finish_task(app, mocker, 'http://127.0.0.1:9/hook', status='Failed', user_id=owner_id)
+
+    assert client.get('/api/webhooks?task_id=t1').status_code == 401
+    with client.session_transaction() as session:
+        session['_user_id'] = str(other_id)
+    assert client.get('/api/webhooks?task_id=t1').status_code == 404
+    with client.session_transaction() as session:
+        session['_user_id'] = str(owner_id)
+    deliveries = client.get('/api/webhooks?task_id=t1').get_json()['deliveries']
+    assert [(d['event'], d['status']) for d in deliveries] == [('task.failed', 'pending')]
+    assert 'url' not in deliveries[0]